@@ -1,15 +1,39 @@
+import os
+import hmac
+import time
 from fastapi import APIRouter, Depends, HTTPException, Header
 from pydantic import BaseModel, EmailStr, field_validator
 from typing import Optional
 from datetime import datetime
 from bson import ObjectId
+from bson.errors import InvalidId
 from pymongo.errors import DuplicateKeyError
 
+from app.core.cache import TTLLRUCache
 from app.core.database import db
-from app.core.security import hash_password, verify_password, create_access_token, decode_token
+from app.core.security import password_hasher, PasswordHasherBusy, create_access_token, decode_token
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
+# Shared secret for operator endpoints (exports); unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Only what authenticated handlers read; never load password_hash per request
+CURRENT_USER_PROJECTION = {"name": 1, "email": 1, "created_at": 1}
+
+# Per-process caches for get_current_user: decoded token payloads by token, and user
+# projections by user id. The TTL bounds staleness across workers; updates made by this
+# process call invalidate_user_cache immediately.
+token_cache = TTLLRUCache(max_items=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLLRUCache(max_items=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL_SECONDS)
+
+
+def invalidate_user_cache(user_id: str):
+    user_cache.pop(str(user_id))
+
 
 class SignUpRequest(BaseModel):
     name: str
@@ -52,26 +76,52 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
     scheme, _, token = authorization.partition(" ")
     if scheme.lower() != "bearer" or not token:
         raise HTTPException(status_code=401, detail="Invalid authorization header format")
-    try:
-        payload = decode_token(token)
-    except ValueError as e:
-        raise HTTPException(status_code=401, detail=str(e))
+    payload = token_cache.get(token)
+    if payload is None or payload.get("exp", 0) <= time.time():
+        try:
+            payload = decode_token(token)
+        except ValueError as e:
+            raise HTTPException(status_code=401, detail=str(e))
+        # Never serve a cached payload past the token's own expiry
+        token_cache.set(token, payload, ttl=min(AUTH_CACHE_TTL_SECONDS, payload.get("exp", 0) - time.time()))
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    user["_id"] = str(user["_id"])
-    return user
+    user = user_cache.get(user_id)
+    if user is None:
+        try:
+            user = await db.users.find_one({"_id": ObjectId(user_id)}, CURRENT_USER_PROJECTION)
+        except InvalidId:
+            raise HTTPException(status_code=401, detail="Invalid token payload")
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user["_id"] = str(user["_id"])
+        user_cache.set(user_id, user)
+    return dict(user)
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def _busy() -> HTTPException:
+    return HTTPException(status_code=429, detail="Too many authentication requests, retry shortly",
+                         headers={"Retry-After": "1"})
 
 
 @router.post("/signup", response_model=UserPublic)
 async def signup(data: SignUpRequest):
+    try:
+        password_hash = await password_hasher.hash(data.password)
+    except PasswordHasherBusy:
+        raise _busy()
     user_doc = {
         "name": data.name.strip(),
         "email": data.email.lower(),
-        "password_hash": hash_password(data.password),
+        "password_hash": password_hash,
         "created_at": datetime.utcnow(),
     }
     try:
@@ -90,8 +140,18 @@ async def signup(data: SignUpRequest):
 @router.post("/login", response_model=TokenResponse)
 async def login(data: LoginRequest):
     user = await db.users.find_one({"email": data.email.lower()})
-    if not user or not verify_password(data.password, user.get("password_hash", "")):
+    if not user or not user.get("password_hash"):
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    try:
+        ok, new_hash = await password_hasher.verify(data.password, user["password_hash"])
+    except PasswordHasherBusy:
+        raise _busy()
+    if not ok:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    if new_hash:
+        # Stored hash used an outdated cost factor; upgrade it transparently
+        await db.users.update_one({"_id": user["_id"]}, {"$set": {"password_hash": new_hash}})
+        invalidate_user_cache(user["_id"])
     token = create_access_token(str(user["_id"]), {"email": user["email"], "name": user.get("name")})
     return TokenResponse(access_token=token)
 
@@ -0,0 +1,98 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class TTLLRUCache:
+    """In-process LRU cache with an optional TTL, entry limit and byte budget.
+
+    `sizeof` estimates the footprint of a value; when the running total exceeds
+    `max_bytes` (or the entry count exceeds `max_items`) the least recently used
+    entries are evicted. Expired entries are dropped lazily on lookup.
+    """
+
+    def __init__(self, max_items: Optional[int] = None, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None, sizeof: Callable[[Any], int] = lambda v: 1):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and not self._expired(entry)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def _expired(self, entry) -> bool:
+        return entry[1] is not None and entry[1] <= time.monotonic()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        if self._expired(entry):
+            self._remove(key)
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        size = self._sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            self.pop(key)
+            return
+        if key in self._data:
+            self._remove(key)
+        expires = time.monotonic() + ttl if ttl is not None else None
+        self._data[key] = (value, expires, size)
+        self._bytes += size
+        self._evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self._data:
+            return default
+        return self._remove(key)
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def _remove(self, key: Hashable) -> Any:
+        value, _, size = self._data.pop(key)
+        self._bytes -= size
+        return value
+
+    def _evict(self):
+        while self._data and (
+            (self.max_items is not None and len(self._data) > self.max_items)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._data))
+            self._remove(key)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
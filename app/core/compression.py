@@ -0,0 +1,102 @@
+import os
+import gzip
+import zlib
+import importlib.util
+from typing import Dict, Optional
+
+# Payloads are compressed once when saved, so the slowest, densest settings are affordable
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "9"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "11"))
+ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "19"))
+# Streamed bodies (exports) are compressed while they are sent, so speed matters more
+STREAM_GZIP_LEVEL = int(os.getenv("COMPRESSION_STREAM_GZIP_LEVEL", "6"))
+STREAM_ZSTD_LEVEL = int(os.getenv("COMPRESSION_STREAM_ZSTD_LEVEL", "3"))
+# Smaller bodies are sent as-is; headers would eat most of the saving
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "512"))
+
+# Optional codecs: used when installed (see requirements.txt), skipped otherwise
+_zstd = importlib.import_module("zstandard") if importlib.util.find_spec("zstandard") else None
+_brotli = importlib.import_module("brotli") if importlib.util.find_spec("brotli") else None
+
+STORAGE_ENCODING: Optional[str] = "zstd" if _zstd is not None else None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        # mtime=0 keeps the output (and anything hashed from it) deterministic
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "br":
+        return _brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "zstd":
+        return _zstd.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: Optional[str]) -> bytes:
+    if not encoding:
+        return data
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "br":
+        return _brotli.decompress(data)
+    if encoding == "zstd":
+        return _zstd.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def available_encodings() -> list:
+    return ["gzip"] + (["br"] if _brotli is not None else []) + (["zstd"] if _zstd is not None else [])
+
+
+def stream_encodings() -> list:
+    return ["gzip"] + (["zstd"] if _zstd is not None else [])
+
+
+def compressobj(encoding: str):
+    """Incremental compressor (`compress(chunk)`, then `flush()`) for a streamed body."""
+    if encoding == "gzip":
+        return zlib.compressobj(STREAM_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if encoding == "zstd" and _zstd is not None:
+        return _zstd.ZstdCompressor(level=STREAM_ZSTD_LEVEL).compressobj()
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def encode_variants(data: bytes) -> Dict[str, bytes]:
+    """Every available Content-Encoding of `data` that is actually smaller than it."""
+    if len(data) < COMPRESSION_MIN_BYTES:
+        return {}
+    variants = {encoding: compress(data, encoding) for encoding in available_encodings()}
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+
+def negotiate(accept_encoding: Optional[str], variants: Dict[str, bytes]) -> Optional[str]:
+    """The encoding to send for an Accept-Encoding header, or None for the identity body.
+
+    Among the variants the client accepts with the highest q-value, the smallest wins.
+    """
+    if not accept_encoding or not variants:
+        return None
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    scored = [(accepted.get(encoding, wildcard), -len(body), encoding) for encoding, body in variants.items()]
+    q, _, encoding = max(scored)
+    return encoding if q > 0 else None
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """Representation-specific strong ETag: each encoding of a body needs its own."""
+    if not encoding:
+        return etag
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else f"{etag}-{encoding}"
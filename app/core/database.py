@@ -1,43 +1,269 @@
 import os
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
+import importlib.util
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+from urllib.parse import parse_qsl
 from dotenv import load_dotenv
-from pymongo import ASCENDING
-from pymongo.errors import PyMongoError
+from pymongo import ASCENDING, DESCENDING, ReadPreference
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from app.core.metrics import METRICS_ENABLED, MongoCommandMetrics
+from app.core.profiling import PROFILING_ENABLED, MongoCommandProfiler
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorClient
 
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME", "founders_ai_db")
 
-if not MONGO_URI:
-    raise RuntimeError("MONGO_URI not set in environment")
+# Wire compressors and the Python package each one needs (zlib ships with Python)
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+_READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def _uri_options(uri: Optional[str]) -> set:
+    """Lower-cased names of the options set in a connection string's query."""
+    if not uri or "?" not in uri:
+        return set()
+    return {name.lower() for name, _ in parse_qsl(uri.split("?", 1)[1], keep_blank_values=True)}
+
+
+@dataclass(frozen=True)
+class MongoSettings:
+    """Client options read from the environment; anything unset keeps the driver default.
+
+    Options given in MONGO_URI's query string still win: `client_kwargs` leaves out
+    every option the URI sets, since pymongo would let the keyword argument override it.
+    """
+
+    max_pool_size: Optional[int] = None
+    min_pool_size: Optional[int] = None
+    max_idle_time_ms: Optional[int] = None
+    wait_queue_timeout_ms: Optional[int] = None
+    server_selection_timeout_ms: Optional[int] = None
+    connect_timeout_ms: Optional[int] = None
+    compressors: Tuple[str, ...] = ("zstd", "snappy", "zlib")
+    # Read preference for read-only listings; "primary" keeps read-your-writes everywhere
+    readonly_read_preference: str = "primary"
+
+    @classmethod
+    def from_env(cls) -> "MongoSettings":
+        compressors = os.getenv("MONGO_COMPRESSORS", ",".join(cls.compressors))
+        readonly = os.getenv("MONGO_READONLY_READ_PREFERENCE", cls.readonly_read_preference)
+        if readonly not in _READ_PREFERENCES:
+            raise RuntimeError(f"MONGO_READONLY_READ_PREFERENCE must be one of {', '.join(_READ_PREFERENCES)}")
+        return cls(
+            max_pool_size=_optional_int("MONGO_MAX_POOL_SIZE"),
+            min_pool_size=_optional_int("MONGO_MIN_POOL_SIZE"),
+            max_idle_time_ms=_optional_int("MONGO_MAX_IDLE_TIME_MS"),
+            wait_queue_timeout_ms=_optional_int("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+            server_selection_timeout_ms=_optional_int("MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+            connect_timeout_ms=_optional_int("MONGO_CONNECT_TIMEOUT_MS"),
+            compressors=tuple(c.strip() for c in compressors.split(",") if c.strip()),
+            readonly_read_preference=readonly,
+        )
+
+    def available_compressors(self) -> List[str]:
+        """Requested compressors whose codec is installed; pymongo would only warn about the rest."""
+        return [
+            c for c in self.compressors
+            if c in _COMPRESSOR_MODULES and importlib.util.find_spec(_COMPRESSOR_MODULES[c]) is not None
+        ]
+
+    def client_kwargs(self, uri: Optional[str] = None) -> dict:
+        """Keyword arguments for the client, without the options `uri` already sets."""
+        kwargs = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "maxIdleTimeMS": self.max_idle_time_ms,
+            "waitQueueTimeoutMS": self.wait_queue_timeout_ms,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+            "connectTimeoutMS": self.connect_timeout_ms,
+            "compressors": ",".join(self.available_compressors()) or None,
+        }
+        in_uri = _uri_options(uri)
+        return {name: value for name, value in kwargs.items() if value is not None and name.lower() not in in_uri}
+
+
+mongo_settings = MongoSettings.from_env()
+
+_client: Optional["AsyncIOMotorClient"] = None
+_generation = 0
+
+
+def get_client() -> "AsyncIOMotorClient":
+    """The process-wide Motor client, created on first use rather than at import."""
+    global _client
+    if _client is None:
+        if not MONGO_URI:
+            raise RuntimeError("MONGO_URI not set in environment")
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        _client = AsyncIOMotorClient(
+            MONGO_URI,
+            event_listeners=[
+                *([MongoCommandMetrics()] if METRICS_ENABLED else []),
+                *([MongoCommandProfiler()] if PROFILING_ENABLED else []),
+            ],
+            **mongo_settings.client_kwargs(MONGO_URI),
+        )
+    return _client
+
+
+def close_client():
+    global _client, _generation
+    if _client is not None:
+        _client.close()
+        _client = None
+        _generation += 1
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
+
+class LazyDatabase:
+    """Stands in for a Motor database until the first real use.
+
+    `db["name"]` returns a LazyCollection, so module-level collection handles cost
+    nothing at import; attribute access (`db.users`, `db.command`) resolves the database,
+    creating the client if needed. Handles re-resolve after `close_client`.
+    """
+
+    def __init__(self, factory: Callable[[], object]):
+        self._factory = factory
+        self._resolved = None
+        self._resolved_generation = -1
+
+    def resolve(self):
+        if self._resolved is None or self._resolved_generation != _generation:
+            self._resolved = self._factory()
+            self._resolved_generation = _generation
+        return self._resolved
+
+    def __getitem__(self, name: str) -> "LazyCollection":
+        return LazyCollection(self, name)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+
+class LazyCollection:
+    def __init__(self, database: LazyDatabase, name: str):
+        self._database = database
+        self._name = name
+        self._resolved = None
+        self._resolved_from = None
+
+    def resolve(self):
+        database = self._database.resolve()
+        if self._resolved_from is not database:
+            self._resolved = database[self._name]
+            self._resolved_from = database
+        return self._resolved
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+
+db = LazyDatabase(lambda: get_client()[DB_NAME])
+# Same database, routed per MONGO_READONLY_READ_PREFERENCE; only for reads that tolerate replication lag
+read_db = LazyDatabase(lambda: get_client()[DB_NAME].with_options(
+    read_preference=_READ_PREFERENCES[mongo_settings.readonly_read_preference]))
 
 
 async def test_connection():
     try:
-        await client.server_info()
+        await get_client().server_info()
         print(f"Connected to MongoDB database '{DB_NAME}'")
     except Exception as e:
         print(f"Failed to connect to MongoDB: {e}")
 
 
+# (collection, keys, options) for every index the app relies on
+INDEX_SPECS = [
+    # Users: unique email
+    ("users", [("email", ASCENDING)], {"unique": True}),
+    # Users and chats: keyset pagination order
+    ("users", [("created_at", DESCENDING), ("_id", DESCENDING)], {}),
+    ("chats", [("timestamp", DESCENDING), ("_id", DESCENDING)], {}),
+    # Chats: /recommend exact-match cache lookups
+    ("chats", [("normalized_message", ASCENDING), ("timestamp", DESCENDING)], {}),
+    # Responses: index on userId + assessmentId + created_at
+    ("user_responses", [("userId", ASCENDING), ("assessmentId", ASCENDING)], {}),
+    ("user_responses", [("userId", ASCENDING), ("created_at", ASCENDING)], {}),
+    # Roadmaps cache: composite key
+    ("roadmaps", [("userId", ASCENDING), ("assessmentId", ASCENDING)], {"unique": True}),
+    # Shared roadmap cache: content address
+    ("roadmap_content", [("prompt_hash", ASCENDING)], {"unique": True}),
+    # Sectioned roadmap cache: one answer per section prompt
+    ("roadmap_sections", [("section_hash", ASCENDING)], {"unique": True}),
+    # Survey catalog: one immutable question set per version
+    ("survey_catalog", [("version", ASCENDING)], {"unique": True}),
+    # Roadmap jobs: claim order and per-assessment lookups
+    ("roadmap_jobs", [("status", ASCENDING), ("created_at", ASCENDING)], {}),
+    ("roadmap_jobs", [("userId", ASCENDING), ("assessmentId", ASCENDING), ("status", ASCENDING)], {}),
+]
+
+
+async def _existing_indexes(collection: str) -> dict:
+    """key tuple -> index document, for one collection (empty if it does not exist yet)."""
+    existing = {}
+    async for index in db[collection].list_indexes():
+        existing[tuple((k, v if isinstance(v, str) else int(v)) for k, v in index["key"].items())] = index
+    return existing
+
+
 async def ensure_indexes():
+    """Create the indexes in INDEX_SPECS that are missing, concurrently.
+
+    Existing indexes are read first (one listIndexes per collection, in parallel), so a
+    restart with unchanged specs sends no createIndexes commands at all.
+    """
     try:
-        # Users: unique email
-        await db.users.create_index("email", unique=True)
-        # Responses: index on userId + assessmentId + created_at
-        await db.user_responses.create_index([("userId", ASCENDING), ("assessmentId", ASCENDING)])
-        await db.user_responses.create_index([("userId", ASCENDING), ("created_at", ASCENDING)])
-        # Roadmaps cache: composite key
-        await db.roadmaps.create_index([("userId", ASCENDING), ("assessmentId", ASCENDING)], unique=True)
-        print("Indexes ensured")
+        collections = sorted({name for name, _, _ in INDEX_SPECS})
+        existing = dict(zip(collections, await asyncio.gather(*(_existing_indexes(c) for c in collections))))
+        missing = []
+        for name, keys, options in INDEX_SPECS:
+            index = existing[name].get(tuple(keys))
+            if index is None or bool(index.get("unique")) != bool(options.get("unique")):
+                missing.append((name, keys, options))
+        if not missing:
+            print("Indexes up to date")
+            return
+        results = await asyncio.gather(
+            *(db[name].create_index(keys, **options) for name, keys, options in missing), return_exceptions=True
+        )
+        errors = [r for r in results if isinstance(r, Exception)]
+        for error in errors:
+            print(f"Index creation error: {error}")
+        print(f"Indexes ensured ({len(missing) - len(errors)} created)")
     except PyMongoError as e:
         print(f"Index creation error: {e}")
 
 
+async def ensure_capped_collection(name: str, size_bytes: int):
+    """Create `name` as a capped collection of `size_bytes` unless it already exists."""
+    try:
+        await db.create_collection(name, capped=True, size=size_bytes)
+        print(f"Created capped collection {name} ({size_bytes} bytes)")
+    except CollectionInvalid:
+        pass
+
+
 if __name__ == "__main__":
     asyncio.run(test_connection())
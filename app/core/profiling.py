@@ -0,0 +1,269 @@
+"""Opt-in per-request profiling: a span breakdown plus a sampling profile of the event loop.
+
+A request is profiled when it carries a valid `X-Profile` header or is picked by
+PROFILING_SAMPLE_RATE. Header-triggered profiles are always kept (the response names
+them in `X-Profile-Id`); sampled ones only when slower than PROFILING_SLOW_MS. With
+PROFILING_ENABLED unset the middleware is not installed and `span` is one ContextVar
+lookup.
+
+    python -m app.core.profiling [--ttl 3600]    # prints an X-Profile header value
+"""
+import os
+import sys
+import hmac
+import time
+import random
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from bson import ObjectId
+from pymongo import monitoring
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_SLOW_MS = float(os.getenv("PROFILING_SLOW_MS", "1000"))
+# HMAC key for X-Profile headers; unset, only sampling can trigger a profile
+PROFILING_SECRET = os.getenv("PROFILING_SECRET", "")
+PROFILING_LOOP_INTERVAL_MS = float(os.getenv("PROFILING_LOOP_INTERVAL_MS", "5"))
+PROFILING_MAX_SPANS = int(os.getenv("PROFILING_MAX_SPANS", "500"))
+PROFILING_MAX_STACKS = int(os.getenv("PROFILING_MAX_STACKS", "50"))
+# Size of the capped request_profiles collection; the oldest profiles make room
+PROFILING_COLLECTION_BYTES = int(os.getenv("PROFILING_COLLECTION_BYTES", str(16 * 1024 * 1024)))
+_MAX_STACK_DEPTH = 64
+
+PROFILE_HEADER = b"x-profile"
+
+current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+_NO_SPAN = nullcontext()
+
+
+def profile_token(ttl_seconds: float = 3600, secret: str = PROFILING_SECRET) -> str:
+    """An `X-Profile` header value valid for `ttl_seconds`: `<expiry>.<hmac>`."""
+    expires = str(int(time.time() + ttl_seconds))
+    return f"{expires}.{hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()}"
+
+
+def verify_token(token: str, secret: str = PROFILING_SECRET) -> bool:
+    if not secret or not token:
+        return False
+    expires, _, signature = token.partition(".")
+    expected = hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(signature, expected):
+        return False
+    return expires.isdigit() and int(expires) > time.time()
+
+
+class RequestProfile:
+    def __init__(self, trigger: str):
+        self.id = ObjectId()
+        self.trigger = trigger
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        self.spans = []
+        self.dropped_spans = 0
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def add_span(self, name: str, started: float, duration: float):
+        # Also called from executor threads (Mongo monitoring); list.append is atomic
+        if len(self.spans) < PROFILING_MAX_SPANS:
+            self.spans.append((name, started - self.started, duration))
+        else:
+            self.dropped_spans += 1
+
+    def to_doc(self, method: str, path: str, url: str, status: int, duration: float) -> dict:
+        totals = {}
+        for name, _, span_duration in self.spans:
+            count, total = totals.get(name, (0, 0.0))
+            totals[name] = (count + 1, total + span_duration)
+        return {
+            "_id": self.id,
+            "method": method,
+            "path": path,
+            "url": url,
+            "status": status,
+            "trigger": self.trigger,
+            "started_at": self.started_at,
+            "duration_ms": round(duration * 1000, 3),
+            # Spans may overlap (concurrent calls), so totals can exceed duration_ms
+            "span_totals": [
+                {"name": name, "count": count, "ms": round(total * 1000, 3)}
+                for name, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1])
+            ],
+            "spans": [
+                {"name": name, "start_ms": round(start * 1000, 3), "duration_ms": round(d * 1000, 3)}
+                for name, start, d in self.spans
+            ],
+            "dropped_spans": self.dropped_spans,
+            # What the event loop thread was running while this request was in flight,
+            # whichever request it was working for; "select" frames mean it was idle
+            "loop": {
+                "samples": self.samples,
+                "interval_ms": PROFILING_LOOP_INTERVAL_MS,
+                "stacks": [{"stack": stack, "count": count}
+                           for stack, count in self.stacks.most_common(PROFILING_MAX_STACKS)],
+            },
+        }
+
+
+@contextmanager
+def _span(profile: RequestProfile, name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(name, started, time.perf_counter() - started)
+
+
+def span(name: str):
+    """Context manager timing a block into the current request's profile, if any."""
+    profile = current_profile.get()
+    return _NO_SPAN if profile is None else _span(profile, name)
+
+
+def record_span(name: str, started: float):
+    """Add a span that started at `started` (perf_counter) and ends now."""
+    profile = current_profile.get()
+    if profile is not None:
+        profile.add_span(name, started, time.perf_counter() - started)
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None and len(names) < _MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class LoopSampler:
+    """Samples the event loop thread's stack from a helper thread, only while at least
+    one profiled request is in flight; every active profile receives each sample."""
+
+    def __init__(self, interval_ms: float = PROFILING_LOOP_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self._lock = threading.Lock()
+        self._active = set()
+        self._stop: Optional[threading.Event] = None
+        self._loop_thread: Optional[int] = None
+
+    def add(self, profile: RequestProfile):
+        """Called on the event loop thread."""
+        with self._lock:
+            self._active.add(profile)
+            if self._stop is None:
+                self._loop_thread = threading.get_ident()
+                self._stop = threading.Event()
+                threading.Thread(target=self._run, args=(self._stop,), name="loop-sampler", daemon=True).start()
+
+    def discard(self, profile: RequestProfile):
+        with self._lock:
+            self._active.discard(profile)
+            if not self._active and self._stop is not None:
+                self._stop.set()
+                self._stop = None
+
+    def _run(self, stop: threading.Event):
+        while not stop.wait(self.interval):
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = _fold(frame)
+            del frame
+            with self._lock:
+                for profile in self._active:
+                    profile.stacks[stack] += 1
+                    profile.samples += 1
+
+
+loop_sampler = LoopSampler()
+
+
+class MongoCommandProfiler(monitoring.CommandListener):
+    """pymongo command monitoring → `mongo.<command>` spans. Motor runs commands on its
+    executor with the caller's context copied, so the current profile is visible here."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+    @staticmethod
+    def _record(event):
+        profile = current_profile.get()
+        if profile is not None:
+            duration = event.duration_micros / 1e6
+            profile.add_span(f"mongo.{event.command_name}", time.perf_counter() - duration, duration)
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware profiling triggered requests; kept profiles go to `sink`
+    (a write-behind buffer's `put`) once the response body has been sent."""
+
+    def __init__(self, app, sink: Callable[[dict], Awaitable], sample_rate: float = PROFILING_SAMPLE_RATE,
+                 slow_ms: float = PROFILING_SLOW_MS, secret: str = PROFILING_SECRET):
+        self.app = app
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.secret = secret
+
+    def _trigger(self, scope) -> Optional[str]:
+        if self.secret:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    if verify_token(value.decode("latin-1"), self.secret):
+                        return "header"
+                    break
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile(trigger)
+        token = current_profile.set(profile)
+        loop_sampler.add(profile)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if trigger == "header":
+                    message = {**message, "headers": [*message.get("headers", []),
+                                                      (b"x-profile-id", str(profile.id).encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            loop_sampler.discard(profile)
+            current_profile.reset(token)
+            duration = time.perf_counter() - profile.started
+            if trigger == "header" or duration * 1000 >= self.slow_ms:
+                route = scope.get("route")
+                path = getattr(route, "path", None) or "unmatched"
+                await self.sink(profile.to_doc(scope["method"], path, scope["path"], status["code"], duration))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ttl", type=float, default=3600, help="seconds the header stays valid")
+    args = parser.parse_args()
+    if not PROFILING_SECRET:
+        sys.exit("PROFILING_SECRET is not set")
+    print(profile_token(args.ttl))
@@ -0,0 +1,201 @@
+import os
+import math
+import time
+from datetime import datetime
+from ipaddress import IPv4Network, IPv6Network, ip_address, ip_network
+from typing import Awaitable, Callable, List, Optional, Union
+
+from fastapi import HTTPException, Request
+
+from app.core.cache import TTLLRUCache
+from app.core.security import decode_token
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# "memory" keeps buckets per worker; "mongo" shares them across workers via the rate_limits collection
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_USER_RATE = float(os.getenv("RATE_LIMIT_USER_RATE", "0.2"))      # tokens per second
+RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "5"))
+RATE_LIMIT_GLOBAL_RATE = float(os.getenv("RATE_LIMIT_GLOBAL_RATE", "5"))
+RATE_LIMIT_GLOBAL_BURST = float(os.getenv("RATE_LIMIT_GLOBAL_BURST", "50"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Comma-separated proxy addresses or CIDRs (e.g. "10.0.0.0/8") whose X-Forwarded-For is
+# believed; unset, the socket peer is the client, so behind a proxy set this
+RATE_LIMIT_TRUSTED_PROXIES = os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "")
+
+
+def _networks(spec: str) -> List[Union[IPv4Network, IPv6Network]]:
+    return [ip_network(part.strip(), strict=False) for part in spec.split(",") if part.strip()]
+
+
+trusted_proxies = _networks(RATE_LIMIT_TRUSTED_PROXIES)
+
+
+def _trusted(host: str, proxies) -> bool:
+    try:
+        address = ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in proxies)
+
+
+def client_ip(request: Request, proxies=None) -> str:
+    """The caller's address: the socket peer, or when that is a trusted proxy, the
+    right-most X-Forwarded-For entry that is not itself a trusted proxy (entries left of
+    it were written by the client and cannot be believed)."""
+    proxies = trusted_proxies if proxies is None else proxies
+    host = request.client.host if request.client else "unknown"
+    if not proxies or not _trusted(host, proxies):
+        return host
+    forwarded = [part.strip() for part in ",".join(request.headers.getlist("x-forwarded-for")).split(",")]
+    for hop in reversed([part for part in forwarded if part]):
+        if not _trusted(hop, proxies):
+            return hop
+    return host
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, rate: float, capacity: float, now: float, cost: float = 1.0) -> float:
+        """Consume `cost` tokens; returns 0 if granted, else seconds until it would be."""
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / rate if rate > 0 else math.inf
+
+
+class MemoryBuckets:
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        # Idle buckets refill to full anyway, so evicting the least recently used is harmless
+        self._buckets = TTLLRUCache(max_items=max_keys)
+
+    async def take(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(capacity, now)
+            self._buckets.set(key, bucket)
+        return bucket.take(rate, capacity, now, cost)
+
+
+class MongoBuckets:
+    """Token buckets shared by all workers, refilled and debited in one atomic update."""
+
+    def __init__(self, collection=None):
+        self._collection = collection
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            from app.core.database import db
+            self._collection = db["rate_limits"]
+        return self._collection
+
+    async def take(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        from pymongo import ReturnDocument
+
+        now = datetime.utcnow()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated", now]}]}, 1000]}
+        refilled = {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, {"$multiply": [elapsed, rate]}]}]}
+        doc = await self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated": now}},
+                {"$set": {"granted": {"$gte": ["$tokens", cost]}}},
+                {"$set": {"tokens": {"$cond": ["$granted", {"$subtract": ["$tokens", cost]}, "$tokens"]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc["granted"]:
+            return 0.0
+        return (cost - doc["tokens"]) / rate if rate > 0 else math.inf
+
+
+class RateLimiter:
+    """Per-user and global token buckets in front of Gemini calls.
+
+    A request is charged only when it is about to call Gemini (after its cache lookups
+    missed), so cache hits and ETag revalidations are free; a denied request gets 429
+    with a Retry-After header. The user bucket is checked first so an abusive client drains only
+    its own bucket, not the global one. Backend errors fail open.
+    """
+
+    def __init__(self, backend=None, enabled: bool = RATE_LIMIT_ENABLED,
+                 user_rate: float = RATE_LIMIT_USER_RATE, user_burst: float = RATE_LIMIT_USER_BURST,
+                 global_rate: float = RATE_LIMIT_GLOBAL_RATE, global_burst: float = RATE_LIMIT_GLOBAL_BURST):
+        self.backend = backend or (MongoBuckets() if RATE_LIMIT_BACKEND == "mongo" else MemoryBuckets())
+        self.enabled = enabled
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.allowed = 0
+        self.rejected = 0
+
+    async def retry_after(self, key: str, cost: float = 1.0) -> float:
+        """0 if the request may proceed, otherwise seconds the client should wait."""
+        if not self.enabled:
+            return 0.0
+        try:
+            wait = await self.backend.take(f"user:{key}", self.user_rate, self.user_burst, cost)
+            if not wait:
+                wait = await self.backend.take("global", self.global_rate, self.global_burst, cost)
+        except Exception as e:
+            print(f"Rate limiter backend error, allowing request: {e}")
+            return 0.0
+        if wait:
+            self.rejected += 1
+        else:
+            self.allowed += 1
+        return wait
+
+    async def check(self, key: str, cost: float = 1.0):
+        wait = await self.retry_after(key, cost)
+        if wait:
+            raise HTTPException(
+                status_code=429,
+                detail="Rate limit exceeded, retry later",
+                headers={"Retry-After": str(max(1, math.ceil(min(wait, 3600))))},
+            )
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "backend": type(self.backend).__name__,
+                "allowed": self.allowed, "rejected": self.rejected}
+
+
+def rate_limit_key(request: Request) -> str:
+    """Who a request is charged to: the bearer token's subject, else the client IP
+    (see client_ip and RATE_LIMIT_TRUSTED_PROXIES).
+
+    Never a path or body parameter, which a caller could vary to dodge its own bucket or
+    set to drain someone else's.
+    """
+    scheme, _, token = (request.headers.get("authorization") or "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            sub: Optional[str] = decode_token(token).get("sub")
+            if sub:
+                return sub
+        except ValueError:
+            pass
+    return f"ip:{client_ip(request)}"
+
+
+gemini_rate_limiter = RateLimiter()
+
+
+def gemini_charge(request: Request) -> Callable[[], Awaitable[None]]:
+    """Awaitable that charges `request` one Gemini call, raising 429 when over the limit.
+
+    Handed to the generation functions, which await it only on their cache-miss path.
+    """
+    key = rate_limit_key(request)
+    return lambda: gemini_rate_limiter.check(key)
+
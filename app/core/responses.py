@@ -0,0 +1,43 @@
+from functools import lru_cache
+from typing import Annotated, Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse, Response
+from pydantic import BeforeValidator, TypeAdapter
+
+# Mongo _id fields in response models: accepts an ObjectId (or str) and serializes as str
+ObjectIdStr = Annotated[str, BeforeValidator(str)]
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """orjson with Mongo types: what ORJSONResponse sends, also used for NDJSON lines."""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    """Default response class: orjson encodes datetimes natively (ISO 8601, as before)
+    and ObjectIds as strings, so handlers can return Mongo documents unconverted."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def _adapter(model: Any) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def model_response(model: Any, content: Any) -> Response:
+    """Validate `content` against a handler's `response_model` and let pydantic-core write
+    the body: the payload is exactly the documented shape (extra fields dropped, optional
+    ones null), without FastAPI's slower jsonable_encoder round trip."""
+    adapter = _adapter(model)
+    body = adapter.dump_json(adapter.validate_python(content), by_alias=True)
+    return Response(content=body, media_type="application/json")
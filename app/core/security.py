@@ -1,6 +1,8 @@
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
 import jwt
 from passlib.context import CryptContext
@@ -8,7 +10,14 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Rehash on login when a stored hash uses a different cost factor than BCRYPT_ROUNDS
+PASSWORD_REHASH = os.getenv("PASSWORD_REHASH", "true").lower() in ("1", "true", "yes")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+_rounds_policy = {"bcrypt__min_rounds": BCRYPT_ROUNDS, "bcrypt__max_rounds": BCRYPT_ROUNDS} if PASSWORD_REHASH else {}
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS, **_rounds_policy)
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
@@ -23,6 +32,62 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordHasherBusy(RuntimeError):
+    """Raised when too many hash/verify calls are already queued."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool instead of the event loop.
+
+    bcrypt releases the GIL, so hashing in threads keeps the loop responsive and uses
+    several cores. At most `max_pending` calls may be queued or running; beyond that
+    callers get PasswordHasherBusy (surfaced as 429) rather than an ever-growing queue.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self.rejected = 0
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy("Too many password operations in progress")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Created on first use and again after shutdown, so a later app lifespan in the
+        # same process (tests, reloads) gets a working pool
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Return (matches, new_hash); new_hash is set when the stored hash should be upgraded."""
+        return await self._run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "pending": self._pending, "max_pending": self.max_pending,
+                "rejected": self.rejected}
+
+    def shutdown(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
+
+
 def create_access_token(subject: str, additional_claims: Optional[Dict[str, Any]] = None,
                         expires_delta: Optional[timedelta] = None) -> str:
     if expires_delta is None:
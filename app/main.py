@@ -1,22 +1,49 @@
 import os
 import asyncio
-from fastapi import FastAPI, HTTPException,Body
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, HTTPException,Body, Header, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
-from typing import List, Any
-from app.core.database import db, ensure_indexes
-from app.services.gemini_service import query_gemini, build_prompt_from_responses
+from typing import List, Any, Optional
+from app.core.database import db
+from app.core.compression import available_encodings, encoded_etag, negotiate, stream_encodings
+from app.core.responses import ORJSONResponse, ObjectIdStr, model_response
+from app.core.rate_limit import gemini_charge, gemini_rate_limiter
+from app.core.metrics import METRICS_ENABLED, MetricsMiddleware, registry
+from app.core.profiling import PROFILING_ENABLED, ProfilingMiddleware
+from app.services.gemini_service import gemini_policy
+from app.services.model_router import SERVED_FROM_CACHE, model_router
+from app.services.call_policy import CircuitOpenError
 from app.services.mongodb_service import (
     save_user_responses,
     get_latest_assessment,
     get_assessment,
     list_assessments,
+    list_users,
+    list_chats,
     get_cached_roadmap,
-    save_cached_roadmap,
+    get_cached_roadmap_etag,
+    get_roadmap_job,
+    list_request_profiles,
+    get_request_profile,
 )
-from app.services.survey_data import steps
-from app.api.auth import router as auth_router
+from app.services.gemini_client import gemini_client, GeminiOverloaded
+from app.services.roadmap_cache import roadmap_content_cache
+from app.services.roadmap_sections import roadmap_section_cache
+from app.services.roadmap_speculation import roadmap_speculator
+from app.services.roadmap_service import cached_roadmap, generate_roadmap, roadmap_events, roadmap_prompt
+from app.services.roadmap_jobs import roadmap_job_queue
+from app.services.recommendation_cache import recommendation_cache
+from app.services.near_duplicate import normalize_message
+from app.services.write_behind import WriteBehindBuffer
+from app.services.container import ServiceContainer
+from app.services.pagination import DEFAULT_PAGE_SIZE, InvalidCursor, clamp_limit
+from app.services.export import (
+    EXPORT_BATCH_SIZE, EXPORT_KINDS, clamp_batch_size, compressed, export_ndjson, parse_after,
+)
+from app.api.auth import require_admin, router as auth_router
 
 class CreateUserRequest(BaseModel):
     name: str
@@ -44,7 +71,80 @@ class SaveResponsesRequest(BaseModel):
     # title: Optional[str] = None
 
 
-app = FastAPI()
+class RoadmapJobRequest(BaseModel):
+    userId: str
+    # Defaults to the user's latest assessment
+    assessmentId: Optional[str] = None
+    force: bool = False
+
+
+# Response models of the listing and assessment payloads. Handlers validate the Mongo
+# documents against them and serialize with pydantic-core through model_response
+# (see benchmarks/bench_serialization.py).
+class MongoDocument(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: ObjectIdStr = Field(alias="_id")
+
+
+class UserListItem(MongoDocument):
+    name: Optional[str] = None
+    email: str
+    created_at: Optional[datetime] = None
+
+
+class UserPage(BaseModel):
+    users: List[UserListItem]
+    next: Optional[str] = None
+
+
+class ChatRecord(MongoDocument):
+    user_message: str
+    ai_response: str
+    timestamp: datetime
+    model: Optional[str] = None
+    # "exact", "stored" or "similar" when the answer came from the recommendation cache,
+    # "fallback" when it was served from it because no model answered in time
+    cache_hit: Optional[str] = None
+
+
+class ChatPage(BaseModel):
+    chats: List[ChatRecord]
+    next: Optional[str] = None
+
+
+class AssessmentSummary(BaseModel):
+    assessmentId: str
+    created_at: Optional[datetime] = None
+    responses_count: int
+
+
+class AssessmentPage(BaseModel):
+    assessments: List[AssessmentSummary]
+    next: Optional[str] = None
+
+
+class StoredResponse(BaseModel):
+    id: int
+    type: str
+    question: str = ""
+    answer: Any = None
+
+
+class AssessmentDocument(MongoDocument):
+    userId: str
+    assessmentId: str
+    catalog_version: Optional[str] = None
+    responses: List[StoredResponse]
+    created_at: Optional[datetime] = None
+
+
+router = APIRouter()
+
+# Chat records are written in batches off the /recommend response path
+chat_log = WriteBehindBuffer(db["chats"], "chat_log")
+# Kept request profiles (PROFILING_ENABLED), written the same way after the response is sent
+profile_log = WriteBehindBuffer(db["request_profiles"], "request_profiles", batch_size=20)
 
 # Add CORS middleware
 raw_origins = os.getenv("FRONTEND_ORIGINS")
@@ -61,28 +161,52 @@ else:
         "https://founders-ai.vercel.app",
     ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=allow_origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include auth router
-app.include_router(auth_router)
 
-@app.on_event("startup")
-async def startup_event():
-    await ensure_indexes()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    services = ServiceContainer(chat_log, profile_log if PROFILING_ENABLED else None)
+    app.state.services = services
+    await services.start()
+    try:
+        yield
+    finally:
+        await services.stop()
+
+
+def create_app() -> FastAPI:
+    """Build the API. Importing this module connects to nothing; Mongo and the
+    background services start in `lifespan`, and Gemini on its first call."""
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=allow_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(MetricsMiddleware)
+    if PROFILING_ENABLED:
+        app.add_middleware(ProfilingMiddleware, sink=profile_log.put)
+    # Include auth router
+    app.include_router(auth_router)
+    app.include_router(router)
+    return app
 
 
-@app.get("/")
+@router.get("/")
 def read_root():
     return {"Hello": "World"}
 
 
-@app.get("/health")
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(require_admin)])
+def metrics():
+    """Prometheus text exposition of request, Gemini, cache, MongoDB and event-loop metrics."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/health")
 async def health():
     """Basic health and configuration check.
 
@@ -90,6 +214,16 @@ async def health():
     - status: always "ok" if handler runs
     - db: "ok" if MongoDB ping succeeds, otherwise error message
     - gemini_api_key_set: boolean indicating if GOOGLE_API_KEY is configured
+    - gemini: Gemini pool usage (running calls, queue depth, timeouts, rejections)
+    - gemini_breaker: circuit breaker state, retries and hedged calls
+    - model_router: models and latency budgets per route, responses served per model, fallbacks
+    - roadmap_cache: shared roadmap cache hits per tier and hit ratio
+    - roadmap_sections: sectioned generation (ROADMAP_SECTIONED) section cache hits
+    - roadmap_speculation: roadmaps generated right after /save-responses and how often they were used
+    - chat_log: write-behind chat logging counters (buffered, flushed, dropped)
+    - request_profiles: kept request profiles waiting / written (null unless PROFILING_ENABLED)
+    - recommend_cache: /recommend cache hits per stage and hit ratio
+    - rate_limit: Gemini admission control counters
     """
     # Check DB connectivity
     db_status = "ok"
@@ -102,22 +236,34 @@ async def health():
     import os as _os
     gemini_key_set = bool(_os.getenv("GOOGLE_API_KEY"))
 
-    return {"status": "ok", "db": db_status, "gemini_api_key_set": gemini_key_set}
+    return {
+        "status": "ok",
+        "db": db_status,
+        "gemini_api_key_set": gemini_key_set,
+        "gemini": gemini_client.stats(),
+        "gemini_breaker": gemini_policy.stats(),
+        "model_router": model_router.stats(),
+        "roadmap_cache": roadmap_content_cache.stats(),
+        "roadmap_sections": roadmap_section_cache.stats(),
+        "roadmap_speculation": roadmap_speculator.stats(),
+        "chat_log": chat_log.stats(),
+        "request_profiles": profile_log.stats() if PROFILING_ENABLED else None,
+        "recommend_cache": recommendation_cache.stats(),
+        "rate_limit": gemini_rate_limiter.stats(),
+    }
 
 
-@app.get("/users")
-async def get_users():
+@router.get("/users", response_model=UserPage)
+async def get_users(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None):
     try:
-        users = []
-        cursor = db.users.find({})
-        async for user in cursor:
-            user["_id"] = str(user["_id"])
-            users.append(user)
-        return users
+        users, next_cursor = await list_users(clamp_limit(limit), cursor)
+        return model_response(UserPage, {"users": users, "next": next_cursor})
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/create-user", response_model=UserResponse)
+@router.post("/create-user", response_model=UserResponse)
 async def create_user(user: CreateUserRequest = Body(...)):
     existing_user = await db.users.find_one({"email": user.email})
     if existing_user:
@@ -137,111 +283,267 @@ async def create_user(user: CreateUserRequest = Body(...)):
         email=created_user["email"],
     )
 #recommend
-@app.post("/recommend")
-async def get_recommendation(request: MessageRequest):
+@router.post("/recommend")
+async def get_recommendation(request: MessageRequest, http_request: Request):
+    charge = gemini_charge(http_request)
+
+    async def generate():
+        # Only cache misses are rate limited. Short messages go to the fast tier; if every
+        # model misses the deadline, the closest cached answer is served instead (and
+        # never indexed as a model answer)
+        await charge()
+        return await model_router.generate(
+            "recommend", request.message, cached=lambda: recommendation_cache.closest(request.message)
+        )
+
     try:
-        recommendation = await query_gemini(request.message)
+        recommendation, hit, model = await recommendation_cache.get_or_generate(
+            request.message, generate, index=lambda served_by: served_by != SERVED_FROM_CACHE,
+        )
 
         chat_record = {
             "user_message": request.message,
+            "normalized_message": normalize_message(request.message),
             "ai_response": recommendation,
             "timestamp": datetime.utcnow(),
-            "model": "gemini-flash-latest",
+            "model": model,
         }
-
-        await db.chats.insert_one(chat_record)
-
-        return {"recommendation": recommendation}
+        if hit:
+            chat_record["cache_hit"] = hit["match"]
+        elif model == SERVED_FROM_CACHE:
+            chat_record["cache_hit"] = "fallback"
+
+        await chat_log.put(chat_record)
+
+        if hit:
+            return {
+                "recommendation": recommendation,
+                "cached": True,
+                "model": model,
+                "cache": {k: hit[k] for k in ("match", "similarity", "matched_message")},
+            }
+        if model == SERVED_FROM_CACHE:
+            return {"recommendation": recommendation, "cached": True, "model": model, "cache": {"match": "fallback"}}
+        return {"recommendation": recommendation, "cached": False, "model": model}
+    except HTTPException:
+        raise
+    except GeminiOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, int(e.retry_after)))})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Gemini call timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/chat-history")
-async def get_chat_history():
+@router.get("/chat-history", response_model=ChatPage)
+async def get_chat_history(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None):
     try:
-        chats = []
-        cursor = db.chats.find({}).sort("timestamp", -1).limit(50)
-        async for chat in cursor:
-            chat["_id"] = str(chat["_id"])
-            chats.append(chat)
-        return {"chats": chats}
+        chats, next_cursor = await list_chats(clamp_limit(limit), cursor)
+        return model_response(ChatPage, {"chats": chats, "next": next_cursor})
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/save-responses")
-async def save_responses(data: SaveResponsesRequest):
+@router.post("/save-responses")
+async def save_responses(data: SaveResponsesRequest, request: Request):
     try:
-        assessment_id = await save_user_responses(data.userId, [resp.dict() for resp in data.responses], steps)
+        assessment_id = await save_user_responses(data.userId, [resp.dict() for resp in data.responses])
+        # The roadmap is almost always requested next; start it at background priority,
+        # charged to the caller's Gemini rate limit
+        roadmap_speculator.speculate(data.userId, assessment_id, charge=gemini_charge(request))
         return {"status": "success", "assessmentId": assessment_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/assessments/{user_id}")
-async def get_assessments(user_id: str):
+@router.get("/assessments/{user_id}", response_model=AssessmentPage)
+async def get_assessments(user_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None):
     try:
-        items = await list_assessments(user_id)
-        return {"assessments": items}
+        items, next_cursor = await list_assessments(user_id, clamp_limit(limit), cursor)
+        return model_response(AssessmentPage, {"assessments": items, "next": next_cursor})
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/get-responses/{user_id}/{assessment_id}")
+@router.get("/get-responses/{user_id}/{assessment_id}", response_model=AssessmentDocument)
 async def fetch_specific_assessment(user_id: str, assessment_id: str):
-    document = await get_assessment(user_id, assessment_id)
+    document = await get_assessment(user_id, assessment_id, allow_secondary=True)
     if document:
-        document["_id"] = str(document.get("_id"))
-        return document
+        return model_response(AssessmentDocument, document)
     raise HTTPException(status_code=404, detail="Assessment not found")
 
-@app.get("/get-responses/{user_id}")
+@router.get("/get-responses/{user_id}", response_model=AssessmentDocument)
 async def fetch_latest_assessment(user_id: str):
-    document = await get_latest_assessment(user_id)
+    document = await get_latest_assessment(user_id, allow_secondary=True)
     if document:
-        document["_id"] = str(document.get("_id"))
-        return document
+        return model_response(AssessmentDocument, document)
     raise HTTPException(status_code=404, detail="No assessments found")
 
 
-@app.get("/generate-roadmap/{user_id}")
-async def generate_roadmap_latest(user_id: str, force: bool = False):
+@router.get("/generate-roadmap/{user_id}")
+async def generate_roadmap_latest(user_id: str, request: Request, force: bool = False,
+                                  if_none_match: Optional[str] = Header(None),
+                                  accept_encoding: Optional[str] = Header(None)):
+    latest = await get_latest_assessment(user_id)
+    if not latest:
+        raise HTTPException(status_code=404, detail="No assessments found")
+    return await _generate_for_assessment(request, user_id, latest.get("assessmentId"), latest, force,
+                                          if_none_match, accept_encoding)
+
+@router.get("/generate-roadmap/{user_id}/{assessment_id}")
+async def generate_roadmap_specific(user_id: str, assessment_id: str, request: Request, force: bool = False,
+                                    if_none_match: Optional[str] = Header(None),
+                                    accept_encoding: Optional[str] = Header(None)):
+    doc = await get_assessment(user_id, assessment_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Assessment not found")
+    return await _generate_for_assessment(request, user_id, assessment_id, doc, force, if_none_match, accept_encoding)
+
+@router.get("/stream-roadmap/{user_id}")
+async def stream_roadmap_latest(user_id: str, request: Request, force: bool = False):
     latest = await get_latest_assessment(user_id)
     if not latest:
         raise HTTPException(status_code=404, detail="No assessments found")
-    return await _generate_for_assessment(user_id, latest.get("assessmentId"), latest, force)
+    return _stream_for_assessment(request, user_id, latest.get("assessmentId"), latest, force)
 
-@app.get("/generate-roadmap/{user_id}/{assessment_id}")
-async def generate_roadmap_specific(user_id: str, assessment_id: str, force: bool = False):
+@router.get("/stream-roadmap/{user_id}/{assessment_id}")
+async def stream_roadmap_specific(user_id: str, assessment_id: str, request: Request, force: bool = False):
     doc = await get_assessment(user_id, assessment_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Assessment not found")
-    return await _generate_for_assessment(user_id, assessment_id, doc, force)
-
-async def _generate_for_assessment(user_id: str, assessment_id: str, assessment_doc: dict, force: bool):
-    prompt = build_prompt_from_responses(assessment_doc)
-    import hashlib, re
-    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
-
-    if not force:
-        cached = await get_cached_roadmap(user_id, assessment_id)
-        if cached and cached.get("prompt_hash") == prompt_hash:
-            return {"roadmap": cached.get("raw", "")}
-
-    def sanitize(text: str) -> str:
-        return re.sub(r"\((?:sc|asc|xyz)\)", "", text)
-
-    attempts = 0
-    last_err = None
-    while attempts < 2:
-        attempts += 1
-        try:
-            roadmap_text = await query_gemini(prompt)
-            cleaned = sanitize(roadmap_text)
-            structured_ok = cleaned.strip().startswith('{') or cleaned.strip().startswith('[')
-            await save_cached_roadmap(user_id, assessment_id, prompt_hash, cleaned, structured_ok)
-            return {"roadmap": cleaned}
-        except Exception as e:
-            last_err = e
-            print(f">>> DEBUG: Gemini attempt {attempts} failed for assessment {assessment_id}: {e}")
-            await asyncio.sleep(0.5)
-    raise HTTPException(status_code=500, detail=f"Gemini generation failed: {last_err}")
+    return _stream_for_assessment(request, user_id, assessment_id, doc, force)
+
+@router.post("/roadmap-jobs", status_code=202)
+async def enqueue_roadmap_job(data: RoadmapJobRequest, request: Request):
+    if data.assessmentId:
+        doc = await get_assessment(data.userId, data.assessmentId)
+        if not doc:
+            raise HTTPException(status_code=404, detail="Assessment not found")
+    else:
+        doc = await get_latest_assessment(data.userId)
+        if not doc:
+            raise HTTPException(status_code=404, detail="No assessments found")
+    # Charged only when the job will call Gemini: not for an already cached roadmap (the
+    # job then just finds it) nor when an active job for the assessment is reused
+    charge = None
+    if data.force or await cached_roadmap(data.userId, doc.get("assessmentId"), roadmap_prompt(doc)[1]) is None:
+        charge = gemini_charge(request)
+    job = await roadmap_job_queue.enqueue(data.userId, doc.get("assessmentId"), data.force, charge=charge)
+    return {"jobId": job["_id"], "status": job["status"], "assessmentId": job["assessmentId"]}
+
+@router.get("/roadmap-jobs/{job_id}")
+async def get_roadmap_job_status(job_id: str):
+    job = await get_roadmap_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    result = {
+        "jobId": job["_id"],
+        "status": job["status"],
+        "userId": job["userId"],
+        "assessmentId": job["assessmentId"],
+        "attempts": job.get("attempts", 0),
+        "error": job.get("error"),
+        "created_at": job.get("created_at"),
+        "finished_at": job.get("finished_at"),
+    }
+    if job["status"] == "succeeded":
+        cached = await get_cached_roadmap(job["userId"], job["assessmentId"])
+        result["roadmap"] = cached.get("raw", "") if cached else None
+        result["structured"] = cached.get("structured") if cached else None
+        result["model"] = cached.get("model") if cached else None
+    return ORJSONResponse(result)
+
+@router.get("/export/{kind}", dependencies=[Depends(require_admin)])
+async def export_collection(kind: str, after: Optional[str] = None, batch_size: int = EXPORT_BATCH_SIZE,
+                            compression: Optional[str] = None):
+    """Stream `users` or `assessments` (with their roadmaps) as NDJSON in `_id` order.
+
+    Resume an interrupted export with `after` set to the last `_id` received.
+    `compression=gzip|zstd` sends a compressed file instead of plain NDJSON.
+    """
+    if kind not in EXPORT_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown export: {kind}")
+    if compression and compression not in stream_encodings():
+        raise HTTPException(status_code=400, detail=f"Unsupported compression: {compression}")
+    try:
+        start = parse_after(after)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = f"{kind}.ndjson" + {"gzip": ".gz", "zstd": ".zst"}.get(compression, "")
+    return StreamingResponse(
+        compressed(export_ndjson(kind, start, clamp_batch_size(batch_size)), compression),
+        media_type={"gzip": "application/gzip", "zstd": "application/zstd"}.get(compression, "application/x-ndjson"),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles(limit: int = DEFAULT_PAGE_SIZE, path: Optional[str] = None, min_ms: Optional[float] = None):
+    """Kept request profiles, newest first, without span detail or loop stacks.
+
+    Filter by route template (`path=/generate-roadmap/{user_id}`) or by `min_ms`.
+    """
+    profiles = await list_request_profiles(clamp_limit(limit), path, min_ms)
+    return ORJSONResponse({"profiles": profiles})
+
+@router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str):
+    profile = await get_request_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return ORJSONResponse(profile)
+
+def _matching_etag(if_none_match: str, etag: Optional[str]) -> Optional[str]:
+    """The representation ETag of `etag` (identity or one per encoding) named by If-None-Match."""
+    if not etag:
+        return None
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in candidates:
+        return etag
+    for encoding in (None, *available_encodings()):
+        if encoded_etag(etag, encoding) in candidates:
+            return encoded_etag(etag, encoding)
+    return None
+
+
+async def _generate_for_assessment(request: Request, user_id: str, assessment_id: str, assessment_doc: dict,
+                                   force: bool, if_none_match: Optional[str] = None,
+                                   accept_encoding: Optional[str] = None) -> Response:
+    # Revalidation only reads the stored validators, never the roadmap body
+    if if_none_match and not force:
+        _, prompt_hash = roadmap_prompt(assessment_doc)
+        validators = await get_cached_roadmap_etag(user_id, assessment_id)
+        if validators and validators.get("prompt_hash") == prompt_hash:
+            matched = _matching_etag(if_none_match, validators.get("etag"))
+            if matched:
+                return Response(status_code=304, headers={"ETag": matched, "Vary": "Accept-Encoding"})
+    joined = not force and roadmap_speculator.claim(user_id, assessment_id)
+    entry = await generate_roadmap(user_id, assessment_id, assessment_doc, force,
+                                   charge=None if joined else gemini_charge(request))
+    # Body was serialized and compressed once at generation time: {"roadmap": <raw text>, "structured": {...} | null}
+    encoding = negotiate(accept_encoding, entry["encoded"])
+    headers = {"ETag": encoded_etag(entry["etag"], encoding), "Vary": "Accept-Encoding"}
+    if entry.get("model"):
+        headers["X-Model"] = entry["model"]
+    if encoding is None:
+        return Response(content=entry["payload"], media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(content=entry["encoded"][encoding], media_type="application/json", headers=headers)
+
+
+def _stream_for_assessment(request: Request, user_id: str, assessment_id: str, assessment_doc: dict,
+                           force: bool) -> StreamingResponse:
+    joined = not force and roadmap_speculator.claim(user_id, assessment_id)
+    return StreamingResponse(
+        roadmap_events(user_id, assessment_id, assessment_doc, force,
+                       charge=None if joined else gemini_charge(request)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+app = create_app()
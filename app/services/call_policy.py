@@ -0,0 +1,174 @@
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+GEMINI_RETRY_ATTEMPTS = int(os.getenv("GEMINI_RETRY_ATTEMPTS", "3"))
+GEMINI_RETRY_BASE_SECONDS = float(os.getenv("GEMINI_RETRY_BASE_SECONDS", "0.5"))
+GEMINI_RETRY_MAX_SECONDS = float(os.getenv("GEMINI_RETRY_MAX_SECONDS", "8"))
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30"))
+# Start a second, concurrent attempt once the first is slower than this latency percentile (0 disables)
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "0"))
+GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is temporarily unavailable (circuit open)")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed → open after `failure_threshold` consecutive failures; after `reset_timeout`
+    a single half-open trial call decides whether to close again or reopen."""
+
+    def __init__(self, name: str, failure_threshold: int = GEMINI_BREAKER_FAILURES,
+                 reset_timeout: float = GEMINI_BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self.short_circuited = 0
+        self._trial_in_flight = False
+
+    def before_call(self):
+        if self.state == "open":
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self.short_circuited += 1
+                raise CircuitOpenError(self.name, remaining)
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._trial_in_flight:
+                self.short_circuited += 1
+                raise CircuitOpenError(self.name, 1.0)
+            self._trial_in_flight = True
+
+    def record_success(self):
+        self._trial_in_flight = False
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self._trial_in_flight = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Forget a call that ended without telling us anything about provider health."""
+        self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        retry_in = None
+        if self.state == "open":
+            retry_in = round(max(self.opened_at + self.reset_timeout - time.monotonic(), 0), 1)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+            "retry_in_seconds": retry_in,
+        }
+
+
+class CallPolicy:
+    """Retry with exponential backoff and full jitter, behind a circuit breaker,
+    with optional hedging once an attempt exceeds a latency percentile.
+
+    `retryable(exc)` decides which failures are worth retrying and count against the
+    breaker; anything else is raised straight away.
+    """
+
+    def __init__(self, name: str, retryable: Callable[[BaseException], bool] = lambda e: True,
+                 max_attempts: int = GEMINI_RETRY_ATTEMPTS, base_delay: float = GEMINI_RETRY_BASE_SECONDS,
+                 max_delay: float = GEMINI_RETRY_MAX_SECONDS, breaker: Optional[CircuitBreaker] = None,
+                 hedge_percentile: float = GEMINI_HEDGE_PERCENTILE, hedge_min_samples: int = GEMINI_HEDGE_MIN_SAMPLES):
+        self.name = name
+        self.retryable = retryable
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker(name)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies = deque(maxlen=256)
+        self.retries = 0
+        self.hedges = 0
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge_percentile or len(self._latencies) < self.hedge_min_samples:
+            return None
+        samples = sorted(self._latencies)
+        return samples[min(len(samples) - 1, int(len(samples) * self.hedge_percentile / 100))]
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            started = time.monotonic()
+            try:
+                result = await self._attempt(fn)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if not self.retryable(e):
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_attempts or self.breaker.state == "open":
+                    raise
+                self.retries += 1
+                delay = self.backoff(attempt)
+                print(f"{self.name} attempt {attempt} failed ({e!r}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self._latencies.append(time.monotonic() - started)
+            return result
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]]) -> T:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await fn()
+        first = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        self.hedges += 1
+        second = asyncio.ensure_future(fn())
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {**self.breaker.stats(), "retries": self.retries, "hedges": self.hedges,
+                "hedge_after_seconds": self.hedge_delay()}
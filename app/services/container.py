@@ -0,0 +1,74 @@
+import time
+import asyncio
+from typing import Optional
+
+from app.core.database import close_client, ensure_capped_collection, ensure_indexes
+from app.core.metrics import event_loop_monitor
+from app.core.profiling import PROFILING_COLLECTION_BYTES
+from app.core.security import password_hasher
+from app.services.gemini_client import gemini_client
+from app.services.roadmap_cache import roadmap_content_cache
+from app.services.roadmap_jobs import roadmap_job_queue
+from app.services.roadmap_speculation import roadmap_speculator
+from app.services.recommendation_cache import recommendation_cache
+from app.services.survey_catalog import survey_catalog
+from app.services.write_behind import WriteBehindBuffer
+
+
+class ServiceContainer:
+    """Background services of one API process, started and stopped from the app lifespan.
+
+    Nothing here runs at import: the Mongo client is created by the first query (index
+    sync, below) and the Gemini SDK on the first model call. Shutdown goes in reverse,
+    so buffered writes are flushed before the client is closed.
+    """
+
+    def __init__(self, chat_log: WriteBehindBuffer, profile_log: Optional[WriteBehindBuffer] = None):
+        self.chat_log = chat_log
+        self.profile_log = profile_log
+        self.job_queue = roadmap_job_queue
+        self.startup_seconds: Optional[float] = None
+        self._warmups: Optional[asyncio.Task] = None
+
+    async def start(self):
+        started = time.perf_counter()
+        await ensure_indexes()
+        try:
+            purged = await roadmap_content_cache.purge_stale()
+            if purged:
+                print(f"Purged {purged} shared roadmaps from an older prompt template")
+        except Exception as e:
+            print(f"Roadmap cache purge error: {e}")
+        try:
+            await survey_catalog.publish()
+        except Exception as e:
+            # save_user_responses retries it and refuses to store assessments until it succeeds
+            print(f"Survey catalog publish error: {e}")
+        if self.job_queue.concurrency > 0:
+            self.job_queue.start()
+        self.chat_log.start()
+        if self.profile_log is not None:
+            try:
+                await ensure_capped_collection(self.profile_log.collection.name, PROFILING_COLLECTION_BYTES)
+            except Exception as e:
+                print(f"Request profile collection error: {e}")
+            self.profile_log.start()
+        event_loop_monitor.start()
+        # Not awaited: the app can serve while the near-duplicate index fills in
+        self._warmups = asyncio.ensure_future(recommendation_cache.warm())
+        self.startup_seconds = round(time.perf_counter() - started, 3)
+        print(f"Services started in {self.startup_seconds}s")
+
+    async def stop(self):
+        if self._warmups is not None:
+            self._warmups.cancel()
+            await asyncio.gather(self._warmups, return_exceptions=True)
+        await event_loop_monitor.stop()
+        await roadmap_speculator.stop()
+        await self.job_queue.stop()
+        await self.chat_log.close()
+        if self.profile_log is not None:
+            await self.profile_log.close()
+        gemini_client.shutdown()
+        password_hasher.shutdown()
+        close_client()
@@ -0,0 +1,137 @@
+"""Streaming NDJSON export of users and assessments (joined with their roadmaps).
+
+    python -m app.services.export users|assessments [--after ID] [--batch-size 500]
+        [--compression gzip|zstd] [--output FILE]
+
+Documents are read in `_id` order from a cursor one batch at a time and written as one
+JSON object per line, so memory use does not grow with the collection. Every line
+carries its `_id`: pass the last one as `after` to resume an interrupted export.
+"""
+import os
+import sys
+import argparse
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app.core.compression import compressobj
+from app.core.database import read_db
+from app.core.responses import dumps
+from app.services.mongodb_service import USER_LIST_PROJECTION, collection_reads, roadmap_cache_reads
+from app.services.pagination import InvalidCursor
+from app.services.survey_catalog import survey_catalog
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+MAX_EXPORT_BATCH_SIZE = 5000
+
+EXPORT_KINDS = ("users", "assessments")
+
+# The stored response body (payload / encoded variants) is derived from these
+_ROADMAP_PROJECTION = {"_id": 0, "userId": 1, "assessmentId": 1, "prompt_hash": 1, "raw": 1,
+                       "structured": 1, "structured_ok": 1, "updated_at": 1}
+
+
+def parse_after(after: Optional[str]) -> Optional[ObjectId]:
+    if not after:
+        return None
+    try:
+        return ObjectId(after)
+    except (InvalidId, TypeError) as e:
+        raise InvalidCursor("Invalid export cursor: expected the _id of the last exported line") from e
+
+
+def clamp_batch_size(batch_size: Optional[int]) -> int:
+    if not batch_size or batch_size < 1:
+        return EXPORT_BATCH_SIZE
+    return min(batch_size, MAX_EXPORT_BATCH_SIZE)
+
+
+def _cursor(kind: str, after: Optional[ObjectId], batch_size: int):
+    source, projection = (read_db.users, USER_LIST_PROJECTION) if kind == "users" else (collection_reads, None)
+    query = {"_id": {"$gt": after}} if after else {}
+    return source.find(query, projection).sort("_id", 1).batch_size(batch_size)
+
+
+async def _batches(cursor, batch_size: int) -> AsyncIterator[List[dict]]:
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _with_roadmaps(assessments: List[dict]) -> List[dict]:
+    """Rehydrated assessments, each with its cached roadmap (or null): one query per batch."""
+    keys = [{"userId": doc.get("userId"), "assessmentId": doc.get("assessmentId")} for doc in assessments]
+    roadmaps = {}
+    async for roadmap in roadmap_cache_reads.find({"$or": keys}, _ROADMAP_PROJECTION):
+        roadmaps[(roadmap.pop("userId"), roadmap.pop("assessmentId"))] = roadmap
+    joined = []
+    for doc in assessments:
+        doc = await survey_catalog.rehydrate(doc)
+        joined.append({**doc, "roadmap": roadmaps.get((doc.get("userId"), doc.get("assessmentId")))})
+    return joined
+
+
+async def export_ndjson(kind: str, after: Optional[ObjectId] = None, batch_size: int = EXPORT_BATCH_SIZE,
+                        progress: Optional[dict] = None) -> AsyncIterator[bytes]:
+    """NDJSON for one collection, one chunk per batch. `progress` (if given) counts the
+    lines and records the last `_id` of each chunk as it is handed out."""
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"Unknown export: {kind}")
+    async for batch in _batches(_cursor(kind, after, batch_size), batch_size):
+        if kind == "assessments":
+            batch = await _with_roadmaps(batch)
+        if progress is not None:
+            progress["count"] = progress.get("count", 0) + len(batch)
+            progress["last_id"] = str(batch[-1]["_id"])
+        yield b"".join(dumps(doc) + b"\n" for doc in batch)
+
+
+async def compressed(chunks: AsyncIterator[bytes], encoding: Optional[str]) -> AsyncIterator[bytes]:
+    """`chunks` compressed as one gzip / zstd stream, or unchanged without an encoding."""
+    if not encoding:
+        async for chunk in chunks:
+            yield chunk
+        return
+    compressor = compressobj(encoding)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def _main(args):
+    progress = {"count": 0, "last_id": args.after}
+    after = parse_after(args.after)
+    compressor = compressobj(args.compression) if args.compression else None
+    # Resuming appends: gzip members and zstd frames concatenate into one valid stream
+    out = open(args.output, "ab" if after else "wb") if args.output else sys.stdout.buffer
+    try:
+        async for chunk in export_ndjson(args.kind, after, clamp_batch_size(args.batch_size), progress):
+            out.write(compressor.compress(chunk) if compressor else chunk)
+    finally:
+        # Also on interrupt, so the file ends with a complete stream holding exactly the
+        # lines up to the reported _id
+        if compressor:
+            out.write(compressor.flush())
+        if args.output:
+            out.close()
+        print(f"Exported {progress['count']} {args.kind}; last _id {progress['last_id']} "
+              f"(rerun with --after to continue from there)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("kind", choices=EXPORT_KINDS)
+    parser.add_argument("--after", default=None, help="resume after this _id")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--compression", choices=("gzip", "zstd"), default=None)
+    parser.add_argument("--output", default=None, help="file to write, appended to with --after (default: stdout)")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,258 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Optional
+
+from app.core.metrics import gemini_call_seconds, gemini_errors_total
+from app.core.profiling import record_span, span
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_MAX_QUEUE = int(os.getenv("GEMINI_MAX_QUEUE", "64"))
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60"))
+# Pool slots that background (speculative) calls may hold at once
+GEMINI_BACKGROUND_MAX_CONCURRENCY = int(os.getenv("GEMINI_BACKGROUND_MAX_CONCURRENCY", "2"))
+_BACKGROUND_POLL_SECONDS = 0.05
+
+
+_genai = None
+
+
+def _sdk():
+    """Import and configure google.generativeai on first use; the import alone takes
+    about a second (grpc, protobuf), which cold starts should not pay for."""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        _genai = genai
+    return _genai
+
+
+class GeminiOverloaded(RuntimeError):
+    """Raised when more calls are waiting for a Gemini slot than the queue allows."""
+
+
+class BackgroundPriority:
+    """Marks the Gemini calls of a task (and the tasks it spawns) as background work.
+
+    Set it in `background_priority` inside the task. Calls then yield the pool to
+    interactive callers until `promote()` is called, for example once a request starts
+    waiting on the result.
+    """
+
+    def __init__(self):
+        self.promoted = False
+
+    def promote(self):
+        self.promoted = True
+
+
+background_priority: ContextVar[Optional[BackgroundPriority]] = ContextVar("gemini_background_priority", default=None)
+
+
+class GeminiClient:
+    """Bounded execution pool for the blocking google.generativeai SDK.
+
+    Calls run on a dedicated thread pool rather than the loop's default executor, so a
+    burst of slow LLM calls cannot starve unrelated `run_in_executor` users. A semaphore
+    caps concurrent calls, callers beyond `max_queue` waiting for a slot are rejected,
+    and every call has a deadline: the caller gets `asyncio.TimeoutError` and its slot
+    back at the deadline, while the same deadline is passed to the SDK as the transport
+    timeout so the worker thread is released too. Model objects are built once per name.
+
+    Background calls (see BackgroundPriority) are capped at `max_background` slots, are
+    never rejected for queue depth, and only take a slot while no interactive call is
+    waiting for one.
+    """
+
+    def __init__(self, model_name: str = GEMINI_MODEL, max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+                 max_queue: int = GEMINI_MAX_QUEUE, timeout: float = GEMINI_TIMEOUT_SECONDS,
+                 max_background: int = GEMINI_BACKGROUND_MAX_CONCURRENCY):
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self.max_background = max(1, min(max_background, max_concurrency))
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._background = asyncio.Semaphore(self.max_background)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._models: Dict[str, "genai.GenerativeModel"] = {}
+        self._waiting = 0
+        self._running = 0
+        self._background_running = 0
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._rejected = 0
+
+    def model(self, name: Optional[str] = None) -> "genai.GenerativeModel":
+        name = name or self.model_name
+        model = self._models.get(name)
+        if model is None:
+            model = self._models[name] = _sdk().GenerativeModel(name)
+        return model
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Created on first use and again after shutdown, so a later app lifespan in the
+        # same process (tests, reloads) gets a working pool
+        if self._executor is None:
+            # Headroom for threads still unwinding after their caller's deadline fired
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency * 2, thread_name_prefix="gemini")
+        return self._executor
+
+    async def _acquire(self) -> bool:
+        """Take a pool slot; returns True if it was taken as a background call."""
+        priority = background_priority.get()
+        if priority is not None and not priority.promoted:
+            await self._acquire_background(priority)
+            return True
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise GeminiOverloaded(f"Gemini queue is full ({self._waiting} calls waiting)")
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._running += 1
+        return False
+
+    async def _acquire_background(self, priority: BackgroundPriority):
+        await self._background.acquire()
+        try:
+            # Semaphores are FIFO, so queueing behind interactive callers is not enough:
+            # stay out of the queue entirely until a slot is free and nobody is waiting
+            while (self._waiting or self._semaphore.locked()) and not priority.promoted:
+                await asyncio.sleep(_BACKGROUND_POLL_SECONDS)
+            self._waiting += 1
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self._waiting -= 1
+        except BaseException:
+            self._background.release()
+            raise
+        self._running += 1
+        self._background_running += 1
+
+    def _release(self, background: bool = False):
+        self._running -= 1
+        self._semaphore.release()
+        if background:
+            self._background_running -= 1
+            self._background.release()
+
+    async def generate(self, prompt: str, model_name: Optional[str] = None, timeout: Optional[float] = None) -> str:
+        timeout = timeout or self.timeout
+        model_name = model_name or self.model_name
+        model = self.model(model_name)
+        loop = asyncio.get_running_loop()
+
+        def sync_call():
+            response = model.generate_content(prompt, request_options={"timeout": timeout})
+            return response.text
+
+        with span("gemini.queue"):
+            background = await self._acquire()
+        started = time.perf_counter()
+        try:
+            with span("gemini.generate"):
+                text = await asyncio.wait_for(loop.run_in_executor(self._pool(), sync_call), timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            self._observe_failure(model_name, "generate", started, "timeout", "TimeoutError")
+            raise
+        except Exception as e:
+            self._failed += 1
+            self._observe_failure(model_name, "generate", started, "error", type(e).__name__)
+            raise
+        finally:
+            self._release(background)
+        self._completed += 1
+        gemini_call_seconds.observe(time.perf_counter() - started, model_name, "generate", "ok")
+        return text
+
+    def _observe_failure(self, model_name: str, mode: str, started: float, outcome: str, error: str):
+        gemini_call_seconds.observe(time.perf_counter() - started, model_name, mode, outcome)
+        gemini_errors_total.inc(model_name, error)
+
+    async def stream(self, prompt: str, model_name: Optional[str] = None,
+                     timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield text chunks as Gemini produces them; `timeout` bounds the whole stream."""
+        timeout = timeout or self.timeout
+        model_name = model_name or self.model_name
+        model = self.model(model_name)
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        end = object()
+        abandoned = False
+
+        def sync_stream():
+            try:
+                for chunk in model.generate_content(prompt, stream=True, request_options={"timeout": timeout}):
+                    if abandoned:
+                        break
+                    text = chunk.text
+                    if text:
+                        loop.call_soon_threadsafe(queue.put_nowait, text)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, end)
+
+        with span("gemini.queue"):
+            background = await self._acquire()
+        started = time.perf_counter()
+        deadline = loop.time() + timeout
+        try:
+            loop.run_in_executor(self._pool(), sync_stream)
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    self._timeouts += 1
+                    self._observe_failure(model_name, "stream", started, "timeout", "TimeoutError")
+                    raise
+                if item is end:
+                    break
+                if isinstance(item, Exception):
+                    self._failed += 1
+                    self._observe_failure(model_name, "stream", started, "error", type(item).__name__)
+                    raise item
+                yield item
+            self._completed += 1
+            gemini_call_seconds.observe(time.perf_counter() - started, model_name, "stream", "ok")
+        finally:
+            abandoned = True
+            self._release(background)
+            record_span("gemini.stream", started)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "background_running": self._background_running,
+            "max_background": self.max_background,
+            "queue_depth": self._waiting,
+            "max_queue": self.max_queue,
+            "completed": self._completed,
+            "failed": self._failed,
+            "timeouts": self._timeouts,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+gemini_client = GeminiClient()
@@ -1,30 +1,112 @@
 # app/services/gemini_service.py
 import os
-import google.generativeai as genai
+import re
 import asyncio
+import hashlib
+from typing import AsyncIterator, Collection, Dict, List, Optional
+from app.services.call_policy import CallPolicy, CircuitOpenError
+from app.services.gemini_client import gemini_client, GeminiOverloaded
+from app.services.survey_catalog import survey_catalog
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=GOOGLE_API_KEY)
 
 
-async def query_gemini(prompt: str) -> str:
-    """Query Gemini for a roadmap text.
+def _is_retryable(exc: BaseException) -> bool:
+    """Provider-side trouble (timeouts, 5xx, 429) is retried and trips the breaker;
+    local overload and request errors are not."""
+    if isinstance(exc, (GeminiOverloaded, CircuitOpenError)):
+        return False
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    from google.api_core import exceptions as google_exceptions
+
+    if isinstance(exc, google_exceptions.GoogleAPICallError):
+        return isinstance(exc, (google_exceptions.ServerError, google_exceptions.TooManyRequests))
+    return isinstance(exc, ConnectionError)
+
+
+def should_fall_back(exc: BaseException) -> bool:
+    """Whether another model is worth trying after `exc`: provider trouble and an open
+    breaker are; local overload (same pool) and request errors are not."""
+    if isinstance(exc, CircuitOpenError):
+        return True
+    return not isinstance(exc, GeminiOverloaded) and _is_retryable(exc)
+
+
+gemini_policy = CallPolicy("gemini", retryable=_is_retryable)
+# One breaker per model: a fallback model must stay callable while the primary's is open
+_model_policies: Dict[str, CallPolicy] = {gemini_client.model_name: gemini_policy}
+
+
+def model_policy(model_name: Optional[str] = None) -> CallPolicy:
+    model_name = model_name or gemini_client.model_name
+    policy = _model_policies.get(model_name)
+    if policy is None:
+        policy = _model_policies[model_name] = CallPolicy(f"gemini:{model_name}", retryable=_is_retryable)
+    return policy
+
+
+async def query_gemini(prompt: str, model_name: Optional[str] = None, timeout: Optional[float] = None) -> str:
+    """Query Gemini (GEMINI_MODEL unless `model_name` is given) for a text answer.
 
     Raises a clear error if GOOGLE_API_KEY is not configured to avoid opaque 500s.
     """
     if not GOOGLE_API_KEY:
         raise RuntimeError("GOOGLE_API_KEY is not set. Please configure it in your environment to enable roadmap generation.")
 
-    # Run the synchronous Gemini call in thread executor to avoid blocking async loop
-    loop = asyncio.get_running_loop()
-    model = genai.GenerativeModel("gemini-1.5-flash")
+    # Runs on the dedicated, bounded Gemini pool rather than the loop's default executor,
+    # with backoff/jitter retries, hedging and the circuit breaker of the model's policy
+    return await model_policy(model_name).call(lambda: gemini_client.generate(prompt, model_name, timeout))
 
-    def sync_call():
-        response = model.generate_content(prompt)
-        return response.text
 
-    response_text = await loop.run_in_executor(None, sync_call)
-    return response_text
+async def stream_gemini(prompt: str, model_name: Optional[str] = None,
+                        timeout: Optional[float] = None) -> AsyncIterator[str]:
+    """Query Gemini in streaming mode, yielding text chunks as they arrive."""
+    if not GOOGLE_API_KEY:
+        raise RuntimeError("GOOGLE_API_KEY is not set. Please configure it in your environment to enable roadmap generation.")
+
+    # Streams can't be retried once chunks are out, but they still honour the model's breaker
+    breaker = model_policy(model_name).breaker
+    breaker.before_call()
+    try:
+        async for chunk in gemini_client.stream(prompt, model_name, timeout):
+            yield chunk
+    except Exception as e:
+        if _is_retryable(e):
+            breaker.record_failure()
+        else:
+            breaker.release()
+        raise
+    except BaseException:
+        breaker.release()
+        raise
+    breaker.record_success()
+
+
+def sanitize_roadmap_text(text: str) -> str:
+    """Strip the stray '(sc)' / '(asc)' / '(xyz)' tokens Gemini sometimes emits."""
+    return re.sub(r"\((?:sc|asc|xyz)\)", "", text)
+
+
+def _response_lines(document: dict, question_ids: Optional[Collection[int]] = None) -> List[str]:
+    """Numbered Q/A lines for the prompt; `question_ids` keeps only those survey questions.
+
+    Compact responses (see survey_catalog) take their question text from the catalog.
+    """
+    lines = []
+    responses = document.get("responses", [])
+    catalog = survey_catalog.questions(document["catalog_version"]) if "catalog_version" in document else None
+    if question_ids is not None:
+        responses = [r for r in responses if r.get("id") is None or r.get("id") in question_ids]
+    for i, resp in enumerate(responses, 1):
+        if catalog is not None and "question" not in resp:
+            resp = survey_catalog.expand(catalog, resp)
+        question = resp.get("question", "").strip()
+        answer = resp.get("answer", "")
+        if isinstance(answer, list):
+            answer = ", ".join([str(a) for a in answer])
+        lines.append(f"{i}. Q: {question}\n   A: {answer}")
+    return lines
 
 
 def build_prompt_from_responses(document: dict) -> str:
@@ -93,14 +175,124 @@ def build_prompt_from_responses(document: dict) -> str:
     ]
 
     # Attach user responses
-    for i, resp in enumerate(document.get("responses", []), 1):
-        question = resp.get("question", "").strip()
-        answer = resp.get("answer", "")
-        if isinstance(answer, list):
-            answer = ", ".join([str(a) for a in answer])
-        prompt_lines.append(f"{i}. Q: {question}\n   A: {answer}")
+    prompt_lines.extend(_response_lines(document))
 
     prompt_lines.append(
         "\nOutput ONLY the JSON object now. Do not wrap in code fences. Do not prepend explanations."
     )
-    return "\n".join(prompt_lines)
\ No newline at end of file
+    return "\n".join(prompt_lines)
+
+
+# Fingerprint of the prompt template itself (everything except the founder's answers).
+# Content-cached roadmaps produced under a different template are treated as stale.
+PROMPT_TEMPLATE_VERSION = hashlib.sha256(build_prompt_from_responses({}).encode("utf-8")).hexdigest()[:16]
+
+
+# --------------- Sectioned roadmap prompts (ROADMAP_SECTIONED) ---------------
+# Each section asks for a subset of the single-shot schema's keys and is generated on its
+# own. `questions` lists the survey question ids the section reads (None: all of them),
+# so an edited answer only changes the prompts of the sections that depend on it.
+ROADMAP_SECTIONS: Dict[str, dict] = {
+    "overview": {
+        "keys": ("overview", "problem_identification"),
+        "questions": (1, 2, 3, 4, 5, 7, 9),
+        "schema": [
+            '  "overview": string,',
+            '  "problem_identification": string',
+        ],
+        "rules": [
+            "- 'overview' is a succinct executive summary of the startup and its opportunity.",
+            "- 'problem_identification' clearly articulates the core problems / gaps the founder faces.",
+        ],
+    },
+    "solutions": {
+        "keys": ("possible_solutions", "best_recommended_solution"),
+        "questions": None,
+        "schema": [
+            '  "possible_solutions": [',
+            '     { "title": string, "rationale": string, "risks": string, "bizowl_services": string }',
+            '  ],',
+            '  "best_recommended_solution": {',
+            '     "title": string,',
+            '     "why_best": string,',
+            '     "implementation_focus": string,',
+            '     "key_risks": string,',
+            '     "mitigation": string',
+            '  }',
+        ],
+        "rules": [
+            "- Offer at least 3 distinct solution approaches.",
+            "- 'rationale' should tie directly to the founder's context.",
+            "- 'risks' should be realistic and non-generic.",
+            "- 'bizowl_services' maps which Bizowl capabilities accelerate that option.",
+            "- Select ONE as 'best_recommended_solution' with a defendable reasoning in 'why_best'.",
+        ],
+    },
+    "roadmap": {
+        "keys": ("roadmap",),
+        "questions": None,
+        "schema": [
+            '  "roadmap": [',
+            '     { "sequence": number, "title": string, "description": string, "duration": string, "kpis": string, "dependencies": string, "bizowl_support": string }',
+            '  ]',
+        ],
+        "rules": [
+            "- Provide 6–10 sequential steps from zero (0→1 journey) to initial traction, built around the most promising approach the answers imply.",
+            "- Each step MUST have a unique increasing integer 'sequence' starting at 1.",
+            "- 'duration' should be realistic (e.g., '1 week', '2 weeks', '3-4 weeks').",
+            "- 'kpis' should list measurable leading indicators (comma-separated is fine).",
+            "- 'dependencies' should mention prior step numbers or 'None'.",
+            "- 'bizowl_support' must map the step to specific Bizowl service categories (e.g., 'Market Research', 'MVP Development', 'Brand & Digital Marketing', 'Fundraising Readiness', 'Growth Analytics').",
+        ],
+    },
+    "conclusion": {
+        "keys": ("conclusion",),
+        "questions": (4, 10),
+        "schema": [
+            '  "conclusion": string',
+        ],
+        "rules": [
+            "- 'conclusion' is a motivational closing with a call to disciplined execution.",
+        ],
+    },
+}
+
+_SECTION_STYLE = [
+    "- Be precise, actionable, founder-friendly.",
+    "- Avoid fluff, avoid repeating the questions.",
+    "- Never invent user context not implied by answers.",
+    "- Make it user product centric and much more personalized, do not be generic.",
+    "- DO NOT return markdown, only raw JSON. Escape internal quotes properly. Do not include trailing commas.",
+    "- Keep paragraphs concise (1–4 sentences each).",
+    "- Do NOT hallucinate or introduce unexplained acronyms or tokens like 'sc', 'asc', 'xyz'.",
+    "- If the underlying data is missing, write 'Not specified' instead of guessing.",
+    "- Any acronym you MUST use (rare) should be expanded on first use (e.g., Customer Acquisition Cost (CAC)).",
+]
+
+
+def build_section_prompts(document: dict) -> Dict[str, str]:
+    """One prompt per entry of ROADMAP_SECTIONS, each returning only that section's keys.
+
+    Merged, the answers cover the same schema as build_prompt_from_responses.
+    """
+    prompts = {}
+    for name, section in ROADMAP_SECTIONS.items():
+        prompt_lines = [
+            "You are a senior startup strategist at Bizowl (https://www.bizzowl.com/) providing deeply personalized, execution-focused guidance.",
+            "You are given structured assessment responses from a founder. Using ONLY that context, write ONE part of their startup roadmap as a SINGLE valid JSON object (UTF-8, no markdown fences, no commentary) with EXACTLY the keys below.",
+            "",
+            "Return JSON Schema (conceptual – do not include this text in output):",
+            "{",
+            *section["schema"],
+            "}",
+            "",
+            "Requirements:",
+            *section["rules"],
+            "Style guidelines:",
+            *_SECTION_STYLE,
+            "User assessment responses (ordered):",
+            *_response_lines(document, section["questions"]),
+            "\nOutput ONLY the JSON object now. Do not wrap in code fences. Do not prepend explanations.",
+        ]
+        prompts[name] = "\n".join(prompt_lines)
+    return prompts
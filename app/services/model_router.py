@@ -0,0 +1,204 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.metrics import model_fallbacks_total, model_served_total
+from app.services.gemini_client import GEMINI_MODEL
+from app.services.gemini_service import query_gemini, should_fall_back, stream_gemini
+
+# "gemini", or "fake" to run without network access or an API key (see FakeProvider)
+MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "gemini").lower()
+# Cheaper tier for short /recommend messages, and the model tried when the first one is late
+GEMINI_FAST_MODEL = os.getenv("GEMINI_FAST_MODEL", "gemini-1.5-flash-8b")
+GEMINI_FALLBACK_MODEL = os.getenv("GEMINI_FALLBACK_MODEL", "gemini-1.5-flash-8b")
+RECOMMEND_SHORT_MESSAGE_CHARS = int(os.getenv("RECOMMEND_SHORT_MESSAGE_CHARS", "280"))
+# Per-route latency budgets: the first model gets PRIMARY seconds, the fallback what is left of DEADLINE
+RECOMMEND_PRIMARY_SECONDS = float(os.getenv("RECOMMEND_PRIMARY_SECONDS", "8"))
+RECOMMEND_DEADLINE_SECONDS = float(os.getenv("RECOMMEND_DEADLINE_SECONDS", "15"))
+ROADMAP_PRIMARY_SECONDS = float(os.getenv("ROADMAP_PRIMARY_SECONDS", "60"))
+ROADMAP_DEADLINE_SECONDS = float(os.getenv("ROADMAP_DEADLINE_SECONDS", "90"))
+FAKE_MODEL_LATENCY_SECONDS = float(os.getenv("FAKE_MODEL_LATENCY_SECONDS", "0.05"))
+
+# served_by value when no model answered in time and a cached answer was used
+SERVED_FROM_CACHE = "cache"
+
+# (prompt, model, timeout) -> text
+Provider = Callable[[str, str, float], Awaitable[str]]
+# (prompt, model, timeout) -> text chunks; `timeout` bounds the whole stream
+StreamProvider = Callable[[str, str, float], AsyncIterator[str]]
+
+
+class Route:
+    """Models and latency budget of one endpoint.
+
+    Prompts up to `short_chars` characters go to `fast` when it is set, others to
+    `primary`. If that model fails or is still running after `primary_seconds`, the
+    next one (`fallback`, or `primary` when `fast` was tried) gets the rest of
+    `deadline_seconds`.
+    """
+
+    def __init__(self, primary: str, fallback: Optional[str], primary_seconds: float, deadline_seconds: float,
+                 fast: Optional[str] = None, short_chars: int = 0):
+        self.primary = primary
+        self.fallback = fallback
+        self.primary_seconds = primary_seconds
+        self.deadline_seconds = deadline_seconds
+        self.fast = fast
+        self.short_chars = short_chars
+
+    def models(self, prompt: str) -> List[str]:
+        first = self.fast if self.fast and len(prompt) <= self.short_chars else self.primary
+        second = self.fallback if self.fallback and self.fallback != first else self.primary
+        return [first] if second == first else [first, second]
+
+
+class ModelRouter:
+    """Sends each prompt to its route's models in turn within the route's latency budget."""
+
+    def __init__(self, provider: Provider, routes: Dict[str, Route], stream_provider: Optional[StreamProvider] = None):
+        self.provider = provider
+        self.stream_provider = stream_provider
+        self.routes = routes
+        self.served: Dict[str, Dict[str, int]] = {name: {} for name in routes}
+        self.misses: Dict[str, int] = {name: 0 for name in routes}
+
+    async def generate(self, route_name: str, prompt: str,
+                       cached: Optional[Callable[[], Optional[str]]] = None) -> Tuple[str, str]:
+        """(text, served_by) for `prompt`, within the route's deadline.
+
+        `served_by` is the model that answered, or SERVED_FROM_CACHE when every model
+        missed its budget and `cached()` returned an answer. Otherwise the last error
+        (asyncio.TimeoutError for a missed deadline) is raised.
+        """
+        route = self.routes[route_name]
+        deadline = time.monotonic() + route.deadline_seconds
+        error: BaseException = asyncio.TimeoutError()
+        for n, model in enumerate(route.models(prompt)):
+            remaining = deadline - time.monotonic()
+            budget = min(route.primary_seconds, remaining) if n == 0 else remaining
+            if budget <= 0:
+                break
+            try:
+                text = await asyncio.wait_for(self.provider(prompt, model, budget), budget)
+            except Exception as e:
+                if not should_fall_back(e):
+                    raise
+                error = e
+                self._missed(route_name, model, e)
+                continue
+            return text, self._served(route_name, model)
+        answer = cached() if cached is not None else None
+        if answer is not None:
+            return answer, self._served(route_name, SERVED_FROM_CACHE)
+        raise error
+
+    async def stream(self, route_name: str, prompt: str) -> Tuple[str, AsyncIterator[str]]:
+        """(model, chunks) for `prompt`, streamed within the route's deadline.
+
+        A model that fails or sends nothing within its budget (the same budgets as
+        `generate`) is abandoned for the next one. Once a model's first chunk has arrived
+        the stream is committed to it: those chunks may already be with the client, so a
+        later error is raised rather than retried on another model.
+        """
+        route = self.routes[route_name]
+        deadline = time.monotonic() + route.deadline_seconds
+        error: BaseException = asyncio.TimeoutError()
+        for n, model in enumerate(route.models(prompt)):
+            remaining = deadline - time.monotonic()
+            budget = min(route.primary_seconds, remaining) if n == 0 else remaining
+            if budget <= 0:
+                break
+            chunks = self.stream_provider(prompt, model, remaining)
+            try:
+                first = await asyncio.wait_for(_first(chunks), budget)
+            except Exception as e:
+                await chunks.aclose()
+                if not should_fall_back(e):
+                    raise
+                error = e
+                self._missed(route_name, model, e)
+                continue
+            return self._served(route_name, model), _chain(first, chunks)
+        raise error
+
+    def _missed(self, route_name: str, model: str, error: BaseException):
+        self.misses[route_name] += 1
+        model_fallbacks_total.inc(route_name, model, "deadline" if isinstance(error, asyncio.TimeoutError) else "error")
+
+    def _served(self, route_name: str, served_by: str) -> str:
+        counts = self.served[route_name]
+        counts[served_by] = counts.get(served_by, 0) + 1
+        model_served_total.inc(route_name, served_by)
+        return served_by
+
+    def stats(self) -> dict:
+        return {
+            name: {"primary": route.primary, "fast": route.fast, "fallback": route.fallback,
+                   "primary_seconds": route.primary_seconds, "deadline_seconds": route.deadline_seconds,
+                   "served": dict(self.served[name]), "fallbacks": self.misses[name]}
+            for name, route in self.routes.items()
+        }
+
+
+async def _first(chunks: AsyncIterator[str]) -> Optional[str]:
+    async for chunk in chunks:
+        return chunk
+    return None
+
+
+async def _chain(first: Optional[str], chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    try:
+        if first is not None:
+            yield first
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await chunks.aclose()
+
+
+class FakeProvider:
+    """Offline stand-in for Gemini (MODEL_PROVIDER=fake and tests).
+
+    Answers after `latency[model]` seconds (default `default_latency`), or raises
+    `failures[model]`. The latest calls are recorded as (model, prompt) in `calls`.
+    """
+
+    def __init__(self, latency: Optional[Dict[str, float]] = None, default_latency: float = FAKE_MODEL_LATENCY_SECONDS,
+                 failures: Optional[Dict[str, BaseException]] = None):
+        self.latency = latency or {}
+        self.default_latency = default_latency
+        self.failures = failures or {}
+        self.calls = deque(maxlen=1000)
+
+    async def __call__(self, prompt: str, model: str, timeout: float) -> str:
+        self.calls.append((model, prompt))
+        await asyncio.sleep(self.latency.get(model, self.default_latency))
+        if model in self.failures:
+            raise self.failures[model]
+        return f"[{model}] {prompt[:200]}"
+
+    async def stream(self, prompt: str, model: str, timeout: float) -> AsyncIterator[str]:
+        """The same answer as `__call__`, in a few chunks after the model's latency."""
+        text = await self(prompt, model, timeout)
+        for start in range(0, len(text), 64):
+            yield text[start:start + 64]
+
+
+def default_routes() -> Dict[str, Route]:
+    return {
+        "recommend": Route(GEMINI_MODEL, GEMINI_FALLBACK_MODEL, RECOMMEND_PRIMARY_SECONDS, RECOMMEND_DEADLINE_SECONDS,
+                           fast=GEMINI_FAST_MODEL, short_chars=RECOMMEND_SHORT_MESSAGE_CHARS),
+        "roadmap": Route(GEMINI_MODEL, GEMINI_FALLBACK_MODEL, ROADMAP_PRIMARY_SECONDS, ROADMAP_DEADLINE_SECONDS),
+    }
+
+
+def _default_router() -> ModelRouter:
+    if MODEL_PROVIDER == "fake":
+        fake = FakeProvider()
+        return ModelRouter(fake, default_routes(), stream_provider=fake.stream)
+    return ModelRouter(query_gemini, default_routes(), stream_provider=stream_gemini)
+
+
+model_router = _default_router()
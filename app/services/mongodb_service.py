@@ -1,65 +1,342 @@
-from typing import Any, Optional, List
-from datetime import datetime
+import os
+import asyncio
+from typing import Any, Optional, List, Tuple
+from datetime import datetime, timedelta
 import uuid
-from app.core.database import db
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.core.database import db, read_db
+from app.services.pagination import keyset_filter, page
+from app.services.survey_catalog import survey_catalog
 
 collection = db["user_responses"]  # user responses collection
 roadmap_cache = db["roadmaps"]     # cached generated roadmaps
+roadmap_content = db["roadmap_content"]  # roadmaps shared across users, keyed by prompt_hash
+roadmap_jobs = db["roadmap_jobs"]  # queued background roadmap generations
+roadmap_sections = db["roadmap_sections"]  # sectioned-generation answers, keyed by section_hash
+request_profiles = db["request_profiles"]  # capped: slow / requested request profiles (PROFILING_ENABLED)
+# Read-only endpoints may read from secondaries (MONGO_READONLY_READ_PREFERENCE)
+collection_reads = read_db["user_responses"]
+roadmap_cache_reads = read_db["roadmaps"]
 
-async def save_user_responses(user_id: str, responses: list, questions: list) -> str:
-    # Combine each response with its question text from questions list by matching id
-    enhanced_responses = []
-    questions_map = {q["id"]: q for q in questions}
-
-    for resp in responses:
-        q = questions_map.get(resp["id"])
-        question_text = q.get("question") if q else ""
-        enhanced_responses.append({
-            "id": resp["id"],
-            "type": resp["type"],
-            "question": question_text,
-            "answer": resp["answer"]
-        })
+# Cross-worker generation lease: how long a worker may hold it and how often others poll
+ROADMAP_LEASE_SECONDS = float(os.getenv("ROADMAP_LEASE_SECONDS", "60"))
+ROADMAP_LEASE_POLL_SECONDS = float(os.getenv("ROADMAP_LEASE_POLL_SECONDS", "0.5"))
+_LEASE_FIELDS = {"lease_owner": "", "lease_hash": "", "lease_until": ""}
 
+async def save_user_responses(user_id: str, responses: list) -> str:
+    # Question text lives in the versioned survey catalog; only ids and answers are stored,
+    # so the catalog version must be in Mongo before anything references it
+    await survey_catalog.publish()
+    version, compacted = survey_catalog.compact(responses)
     assessment_id = str(uuid.uuid4())
     document = {
         "userId": user_id,
         "assessmentId": assessment_id,
-        "responses": enhanced_responses,
+        "catalog_version": version,
+        "responses": compacted,
         "created_at": datetime.utcnow()
     }
     await collection.insert_one(document)
     return assessment_id
 
-async def get_latest_assessment(user_id: str):
-    return await collection.find_one({"userId": user_id}, sort=[("created_at", -1)])
+async def get_latest_assessment(user_id: str, allow_secondary: bool = False):
+    source = collection_reads if allow_secondary else collection
+    return await survey_catalog.rehydrate(await source.find_one({"userId": user_id}, sort=[("created_at", -1)]))
 
-async def get_assessment(user_id: str, assessment_id: str):
-    return await collection.find_one({"userId": user_id, "assessmentId": assessment_id})
+async def get_assessment(user_id: str, assessment_id: str, allow_secondary: bool = False):
+    source = collection_reads if allow_secondary else collection
+    return await survey_catalog.rehydrate(await source.find_one({"userId": user_id, "assessmentId": assessment_id}))
 
-async def list_assessments(user_id: str) -> List[dict]:
-    cursor = collection.find({"userId": user_id}).sort("created_at", -1)
-    results = []
-    async for doc in cursor:
-        results.append({
-            "assessmentId": doc.get("assessmentId"),
-            "created_at": doc.get("created_at"),
-            "responses_count": len(doc.get("responses", []))
-        })
-    return results
+async def list_assessments(user_id: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """One page of a user's assessments, newest first, without loading the answers."""
+    pipeline = [
+        {"$match": {"userId": user_id, **keyset_filter("created_at", cursor)}},
+        {"$sort": {"created_at": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$project": {
+            "assessmentId": 1,
+            "created_at": 1,
+            "responses_count": {"$size": {"$ifNull": ["$responses", []]}},
+        }},
+    ]
+    docs = await collection_reads.aggregate(pipeline).to_list(length=limit + 1)
+    docs, next_cursor = page(docs, limit, "created_at")
+    results = [
+        {"assessmentId": d.get("assessmentId"), "created_at": d.get("created_at"), "responses_count": d["responses_count"]}
+        for d in docs
+    ]
+    return results, next_cursor
+
+
+# --------------- Users & chats listings ---------------
+USER_LIST_PROJECTION = {"name": 1, "email": 1, "created_at": 1}
+
+async def list_users(limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    docs = await read_db.users.find(keyset_filter("created_at", cursor), USER_LIST_PROJECTION) \
+        .sort([("created_at", -1), ("_id", -1)]).limit(limit + 1).to_list(length=limit + 1)
+    return page(docs, limit, "created_at")
+
+async def list_chats(limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    docs = await read_db.chats.find(keyset_filter("timestamp", cursor), {"normalized_message": 0}) \
+        .sort([("timestamp", -1), ("_id", -1)]).limit(limit + 1).to_list(length=limit + 1)
+    return page(docs, limit, "timestamp")
+
+
+# --------------- Request profiles ---------------
+# Listings leave out the per-span detail and the loop stacks
+PROFILE_SUMMARY_PROJECTION = {"spans": 0, "loop.stacks": 0}
+
+async def list_request_profiles(limit: int, path: Optional[str] = None, min_ms: Optional[float] = None) -> List[dict]:
+    query = {}
+    if path:
+        query["path"] = path
+    if min_ms:
+        query["duration_ms"] = {"$gte": min_ms}
+    # Capped collection: reverse natural order is newest first, without an index
+    return await read_db.request_profiles.find(query, PROFILE_SUMMARY_PROJECTION) \
+        .sort("$natural", -1).limit(limit).to_list(length=limit)
+
+async def get_request_profile(profile_id: str) -> Optional[dict]:
+    try:
+        return await read_db.request_profiles.find_one({"_id": ObjectId(profile_id)})
+    except InvalidId:
+        return None
+
+
+# --------------- Recommendation cache (backed by chats) ---------------
+# Only answers Gemini produced; records served from the cache carry `cache_hit`
+_CACHE_SOURCE = {"cache_hit": None}
+_CACHE_PROJECTION = {"user_message": 1, "ai_response": 1, "model": 1, "_id": 0}
+
+async def find_recent_chat(normalized_message: str, since: datetime) -> Optional[dict]:
+    return await db.chats.find_one(
+        {"normalized_message": normalized_message, "timestamp": {"$gte": since}, **_CACHE_SOURCE},
+        _CACHE_PROJECTION,
+        sort=[("timestamp", -1)],
+    )
+
+async def list_recent_chats(since: datetime, limit: int) -> List[dict]:
+    """Newest first; older records without `normalized_message` are included too."""
+    return await db.chats.find({"timestamp": {"$gte": since}, **_CACHE_SOURCE}, _CACHE_PROJECTION) \
+        .sort([("timestamp", -1), ("_id", -1)]).limit(limit).to_list(length=limit)
 
 
 # --------------- Roadmap caching ---------------
 async def get_cached_roadmap(user_id: str, assessment_id: str) -> Optional[dict]:
     return await roadmap_cache.find_one({"userId": user_id, "assessmentId": assessment_id})
 
-async def save_cached_roadmap(user_id: str, assessment_id: str, prompt_hash: str, raw_text: str, structured_ok: bool):
+async def get_cached_roadmap_etag(user_id: str, assessment_id: str) -> Optional[dict]:
+    """Just the validators of a cached roadmap, for If-None-Match checks without the body."""
+    return await roadmap_cache.find_one(
+        {"userId": user_id, "assessmentId": assessment_id}, {"prompt_hash": 1, "etag": 1}
+    )
+
+async def save_cached_roadmap(user_id: str, assessment_id: str, prompt_hash: str, raw_text: str, structured_ok: bool,
+                              structured: Optional[dict] = None, payload: Optional[bytes] = None,
+                              payload_encoding: Optional[str] = None, encoded: Optional[dict] = None,
+                              etag: Optional[str] = None, model: Optional[str] = None):
     doc = {
         "userId": user_id,
         "assessmentId": assessment_id,
         "prompt_hash": prompt_hash,
         "raw": raw_text,
         "structured_ok": structured_ok,
+        "structured": structured,
+        "payload": payload,
+        "payload_encoding": payload_encoding,
+        "encoded": encoded,
+        "etag": etag,
+        "model": model,  # the model that generated the roadmap text
         "updated_at": datetime.utcnow()
     }
-    await roadmap_cache.update_one({"userId": user_id, "assessmentId": assessment_id}, {"$set": doc}, upsert=True)
+    await roadmap_cache.update_one(
+        {"userId": user_id, "assessmentId": assessment_id},
+        {"$set": doc, "$unset": _LEASE_FIELDS},
+        upsert=True,
+    )
+
+
+# --------------- Roadmap generation lease ---------------
+async def acquire_roadmap_lease(user_id: str, assessment_id: str, prompt_hash: str, owner: str,
+                                ttl_seconds: float = ROADMAP_LEASE_SECONDS) -> bool:
+    """Try to become the single worker generating this roadmap.
+
+    The lease lives on the cache document itself. The filter only matches when no live
+    lease exists; if another worker holds one, the upsert collides with the unique
+    (userId, assessmentId) index and we report that the lease is taken.
+    """
+    now = datetime.utcnow()
+    try:
+        await roadmap_cache.update_one(
+            {
+                "userId": user_id,
+                "assessmentId": assessment_id,
+                "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}],
+            },
+            {"$set": {
+                "lease_owner": owner,
+                "lease_hash": prompt_hash,
+                "lease_until": now + timedelta(seconds=ttl_seconds),
+            }},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+async def renew_roadmap_lease(user_id: str, assessment_id: str, owner: str,
+                              ttl_seconds: float = ROADMAP_LEASE_SECONDS) -> bool:
+    """Push out a held lease; False if `owner` no longer holds it."""
+    result = await roadmap_cache.update_one(
+        {"userId": user_id, "assessmentId": assessment_id, "lease_owner": owner},
+        {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=ttl_seconds)}},
+    )
+    return result.matched_count > 0
+
+async def release_roadmap_lease(user_id: str, assessment_id: str, owner: str):
+    await roadmap_cache.update_one(
+        {"userId": user_id, "assessmentId": assessment_id, "lease_owner": owner},
+        {"$unset": _LEASE_FIELDS},
+    )
+
+async def wait_for_cached_roadmap(user_id: str, assessment_id: str, prompt_hash: str,
+                                  since: Optional[datetime] = None,
+                                  poll_seconds: float = ROADMAP_LEASE_POLL_SECONDS) -> Optional[dict]:
+    """Wait while another worker holds the lease.
+
+    Returns the cache document once a roadmap for prompt_hash (written after `since`, if
+    given) is available, or None when the lease was released or expired without one,
+    in which case the caller should try to take the lease itself.
+    """
+    while True:
+        doc = await get_cached_roadmap(user_id, assessment_id)
+        if not doc:
+            return None
+        lease_until = doc.get("lease_until")
+        if not lease_until or lease_until < datetime.utcnow():
+            fresh = since is None or (doc.get("updated_at") is not None and doc["updated_at"] >= since)
+            if not lease_until and fresh and doc.get("prompt_hash") == prompt_hash and "raw" in doc:
+                return doc
+            return None
+        await asyncio.sleep(poll_seconds)
+
+
+# --------------- Content-addressed roadmap cache ---------------
+async def get_content_roadmap(prompt_hash: str, template_version: str) -> Optional[dict]:
+    return await roadmap_content.find_one({"prompt_hash": prompt_hash, "template_version": template_version})
+
+async def save_content_roadmap(prompt_hash: str, template_version: str, raw_text: str, structured_ok: bool,
+                               structured: Optional[dict] = None, payload: Optional[bytes] = None,
+                               payload_encoding: Optional[str] = None, encoded: Optional[dict] = None,
+                               etag: Optional[str] = None, model: Optional[str] = None):
+    doc = {
+        "prompt_hash": prompt_hash,
+        "template_version": template_version,
+        "raw": raw_text,
+        "structured_ok": structured_ok,
+        "structured": structured,
+        "payload": payload,
+        "payload_encoding": payload_encoding,
+        "encoded": encoded,
+        "etag": etag,
+        "model": model,  # the model that generated the roadmap text
+        "updated_at": datetime.utcnow()
+    }
+    await roadmap_content.update_one({"prompt_hash": prompt_hash}, {"$set": doc}, upsert=True)
+
+async def purge_stale_content_roadmaps(template_version: str) -> int:
+    result = await roadmap_content.delete_many({"template_version": {"$ne": template_version}})
+    return result.deleted_count
+
+
+# --------------- Sectioned roadmap cache ---------------
+async def get_roadmap_sections(section_hashes: List[str]) -> List[dict]:
+    return await roadmap_sections.find(
+        {"section_hash": {"$in": section_hashes}}, {"_id": 0, "section_hash": 1, "data": 1}
+    ).to_list(length=len(section_hashes))
+
+async def save_roadmap_section(section_hash: str, section: str, data: dict):
+    doc = {"section_hash": section_hash, "section": section, "data": data, "updated_at": datetime.utcnow()}
+    await roadmap_sections.update_one({"section_hash": section_hash}, {"$set": doc}, upsert=True)
+
+
+# --------------- Roadmap generation jobs ---------------
+async def create_roadmap_job(user_id: str, assessment_id: str, force: bool) -> dict:
+    now = datetime.utcnow()
+    doc = {
+        "_id": str(uuid.uuid4()),
+        "userId": user_id,
+        "assessmentId": assessment_id,
+        "force": force,
+        "status": "queued",
+        "attempts": 0,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+    await roadmap_jobs.insert_one(doc)
+    return doc
+
+async def get_roadmap_job(job_id: str) -> Optional[dict]:
+    return await roadmap_jobs.find_one({"_id": job_id})
+
+async def find_active_roadmap_job(user_id: str, assessment_id: str) -> Optional[dict]:
+    return await roadmap_jobs.find_one(
+        {"userId": user_id, "assessmentId": assessment_id, "status": {"$in": ["queued", "running"]}},
+        sort=[("created_at", -1)],
+    )
+
+async def claim_roadmap_job(worker_id: str, lease_seconds: float, max_attempts: int) -> Optional[dict]:
+    """Atomically take the oldest queued job, or a running one whose worker's lease expired.
+
+    Expired jobs that already used `max_attempts` are marked failed instead of being
+    taken again, so a job that keeps outliving its lease does not run forever.
+    """
+    now = datetime.utcnow()
+    await roadmap_jobs.update_many(
+        {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$gte": max_attempts}},
+        {
+            "$set": {"status": "failed", "error": "Lease expired", "updated_at": now, "finished_at": now},
+            "$unset": {"lease_until": ""},
+        },
+    )
+    return await roadmap_jobs.find_one_and_update(
+        {"$or": [
+            {"status": "queued"},
+            {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$lt": max_attempts}},
+        ]},
+        {
+            "$set": {
+                "status": "running",
+                "worker": worker_id,
+                "lease_until": now + timedelta(seconds=lease_seconds),
+                "started_at": now,
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+async def extend_roadmap_job_lease(job_id: str, worker_id: str, lease_seconds: float) -> bool:
+    """Push out a running job's lease; False if this worker no longer holds it."""
+    result = await roadmap_jobs.update_one(
+        {"_id": job_id, "worker": worker_id, "status": "running"},
+        {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=lease_seconds)}},
+    )
+    return result.matched_count > 0
+
+async def finish_roadmap_job(job_id: str, worker_id: str, status: str, error: Optional[str] = None):
+    """Record a job's outcome; status is "succeeded", "failed", or "queued" to retry it."""
+    now = datetime.utcnow()
+    fields = {"status": status, "error": error, "updated_at": now}
+    if status != "queued":
+        fields["finished_at"] = now
+    await roadmap_jobs.update_one(
+        {"_id": job_id, "worker": worker_id},
+        {"$set": fields, "$unset": {"lease_until": ""}},
+    )
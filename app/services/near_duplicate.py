@@ -0,0 +1,95 @@
+import re
+import random
+import hashlib
+import unicodedata
+from collections import defaultdict
+from typing import Dict, FrozenSet, Hashable, List, Set, Tuple
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 64) - 1
+
+
+def normalize_message(text: str) -> str:
+    """Fold case, Unicode forms, punctuation and whitespace: the exact-match cache key."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(_PUNCTUATION_RE.sub(" ", text).split())
+
+
+def shingles(normalized: str, size: int = 4) -> FrozenSet[str]:
+    """Character k-grams of already normalized text; short texts are a single shingle."""
+    if len(normalized) <= size:
+        return frozenset([normalized])
+    return frozenset(normalized[i:i + size] for i in range(len(normalized) - size + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """MinHash signatures from universal hashing of a stable 64-bit shingle digest.
+
+    The permutations come from a fixed seed, so signatures are comparable across
+    processes and restarts.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, items: FrozenSet[str]) -> Tuple[int, ...]:
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in items]
+        if not hashes:
+            return (_MAX_HASH,) * self.num_perm
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms)
+
+
+class LSHIndex:
+    """Banded locality-sensitive hashing over MinHash signatures.
+
+    A signature is split into `bands` bands of equal width; two keys become candidates
+    when any band matches exactly. With 16 bands of 4 rows, pairs at Jaccard 0.8 collide
+    with probability > 0.999, at 0.5 about 0.64. Candidates still need verifying.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[Hashable]] = defaultdict(set)
+        self._keys: Dict[Hashable, List[Tuple[int, Tuple[int, ...]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def keys(self) -> List[Hashable]:
+        return list(self._keys)
+
+    def _bands(self, signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def add(self, key: Hashable, signature: Tuple[int, ...]):
+        self.remove(key)
+        bands = self._bands(signature)
+        for band in bands:
+            self._buckets[band].add(key)
+        self._keys[key] = bands
+
+    def remove(self, key: Hashable):
+        for band in self._keys.pop(key, ()):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def candidates(self, signature: Tuple[int, ...]) -> Set[Hashable]:
+        found: Set[Hashable] = set()
+        for band in self._bands(signature):
+            found |= self._buckets.get(band, set())
+        return found
@@ -0,0 +1,61 @@
+import json
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def encode_cursor(value: datetime, _id: ObjectId) -> str:
+    """Opaque `next` token pointing just past (value, _id) in a descending listing."""
+    raw = json.dumps({"t": value.isoformat() if value else None, "id": str(_id)})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[Optional[datetime], ObjectId]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(data, dict):
+            raise InvalidCursor("Invalid pagination cursor")
+        value = datetime.fromisoformat(data["t"]) if data.get("t") else None
+        return value, ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursor("Invalid pagination cursor") from e
+
+
+def keyset_filter(field: str, cursor: Optional[str]) -> dict:
+    """Mongo filter selecting documents after `cursor` for a sort of (field desc, _id desc)."""
+    if not cursor:
+        return {}
+    value, _id = decode_cursor(cursor)
+    if value is None:
+        return {field: None, "_id": {"$lt": _id}}
+    return {"$or": [
+        {field: {"$lt": value}},
+        {field: value, "_id": {"$lt": _id}},
+        {field: None},
+    ]}
+
+
+def page(docs: List[dict], limit: int, field: str) -> Tuple[List[dict], Optional[str]]:
+    """Split a `limit + 1` fetch into the page and the `next` token (None on the last page)."""
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    last = docs[-1]
+    return docs, encode_cursor(last.get(field), last["_id"])
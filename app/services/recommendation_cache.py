@@ -0,0 +1,167 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional, Tuple
+
+from app.core.cache import TTLLRUCache
+from app.core.metrics import recommend_cache_total
+from app.services.mongodb_service import find_recent_chat, list_recent_chats
+from app.services.near_duplicate import LSHIndex, MinHasher, jaccard, normalize_message, shingles
+from app.services.singleflight import SingleFlight
+
+RECOMMEND_CACHE_ENABLED = os.getenv("RECOMMEND_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RECOMMEND_CACHE_TTL_SECONDS = float(os.getenv("RECOMMEND_CACHE_TTL_SECONDS", str(24 * 3600)))
+RECOMMEND_CACHE_MAX_ENTRIES = int(os.getenv("RECOMMEND_CACHE_MAX_ENTRIES", "10000"))
+# Minimum character-shingle Jaccard similarity for a near-duplicate hit; above 1 disables that stage
+RECOMMEND_SIMILARITY_THRESHOLD = float(os.getenv("RECOMMEND_SIMILARITY_THRESHOLD", "0.8"))
+RECOMMEND_SHINGLE_SIZE = int(os.getenv("RECOMMEND_SHINGLE_SIZE", "4"))
+RECOMMEND_MINHASH_PERMUTATIONS = int(os.getenv("RECOMMEND_MINHASH_PERMUTATIONS", "64"))
+RECOMMEND_LSH_BANDS = int(os.getenv("RECOMMEND_LSH_BANDS", "16"))
+# Longer messages only get exact matching; signatures cost ~25us per shingle
+RECOMMEND_SIMILARITY_MAX_CHARS = int(os.getenv("RECOMMEND_SIMILARITY_MAX_CHARS", "500"))
+RECOMMEND_CACHE_WARM_ENTRIES = int(os.getenv("RECOMMEND_CACHE_WARM_ENTRIES", "2000"))
+# Looser similarity accepted as a last resort when every model misses its deadline
+RECOMMEND_FALLBACK_SIMILARITY = float(os.getenv("RECOMMEND_FALLBACK_SIMILARITY", "0.5"))
+
+
+class RecommendationCache:
+    """Two-stage cache of /recommend answers in front of Gemini.
+
+    1. Exact: the normalized message (case, Unicode form, punctuation and whitespace
+       folded) in an in-process TTL/LRU map, then in `chats` via `normalized_message`.
+    2. Near-duplicate: MinHash signatures of character shingles in an LSH index; the
+       best candidate whose exact Jaccard similarity reaches `threshold` is served.
+
+    Only answers that came from Gemini are indexed, never answers served from the cache,
+    so a near-duplicate chain cannot drift away from the question that was answered.
+    Concurrent misses for the same normalized message share one Gemini call.
+    """
+
+    def __init__(self, enabled: bool = RECOMMEND_CACHE_ENABLED, ttl: float = RECOMMEND_CACHE_TTL_SECONDS,
+                 max_entries: int = RECOMMEND_CACHE_MAX_ENTRIES, threshold: float = RECOMMEND_SIMILARITY_THRESHOLD,
+                 shingle_size: int = RECOMMEND_SHINGLE_SIZE, num_perm: int = RECOMMEND_MINHASH_PERMUTATIONS,
+                 bands: int = RECOMMEND_LSH_BANDS, max_similarity_chars: int = RECOMMEND_SIMILARITY_MAX_CHARS):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.max_similarity_chars = max_similarity_chars
+        self.entries = TTLLRUCache(max_items=max_entries, ttl=ttl)
+        self.hasher = MinHasher(num_perm)
+        self.index = LSHIndex(num_perm, bands)
+        self.flights = SingleFlight()
+        self.counts = {"exact": 0, "stored": 0, "similar": 0, "miss": 0}
+
+    def add(self, message: str, response: str, model: Optional[str] = None):
+        key = normalize_message(message)
+        if not key:
+            return
+        if len(key) > self.max_similarity_chars:
+            self.entries.set(key, {"response": response, "message": message, "model": model, "shingles": None})
+            return
+        grams = shingles(key, self.shingle_size)
+        self.entries.set(key, {"response": response, "message": message, "model": model, "shingles": grams})
+        self.index.add(key, self.hasher.signature(grams))
+        if len(self.index) > 2 * self.entries.max_items:
+            # Entries evicted by the LRU leave their bands behind; drop them in one sweep
+            for stale in [k for k in self.index.keys() if k not in self.entries]:
+                self.index.remove(stale)
+
+    def _similar(self, key: str, threshold: float) -> Optional[Tuple[dict, float]]:
+        grams = shingles(key, self.shingle_size)
+        best, best_score = None, threshold
+        for candidate in self.index.candidates(self.hasher.signature(grams)):
+            entry = self.entries.get(candidate)
+            if entry is None or entry["shingles"] is None:
+                self.index.remove(candidate)
+                continue
+            score = jaccard(grams, entry["shingles"])
+            if score >= best_score:
+                best, best_score = entry, score
+        return (best, best_score) if best is not None else None
+
+    def _hit(self, match: str, entry: dict, similarity: float) -> dict:
+        self.counts[match] += 1
+        recommend_cache_total.inc(match)
+        return {"match": match, "response": entry["response"], "similarity": round(similarity, 3),
+                "matched_message": entry["message"], "model": entry.get("model")}
+
+    async def lookup(self, message: str) -> Optional[dict]:
+        """A cached answer as {match, response, similarity, matched_message, model}, or None."""
+        if not self.enabled:
+            return None
+        key = normalize_message(message)
+        if not key:
+            return None
+        entry = self.entries.get(key)
+        if entry is not None:
+            return self._hit("exact", entry, 1.0)
+        try:
+            doc = await find_recent_chat(key, datetime.utcnow() - timedelta(seconds=self.ttl))
+        except Exception as e:
+            print(f"Recommendation cache lookup error: {e}")
+            doc = None
+        if doc is not None:
+            self.add(doc["user_message"], doc["ai_response"], doc.get("model"))
+            return self._hit("stored", {"response": doc["ai_response"], "message": doc["user_message"],
+                                        "model": doc.get("model")}, 1.0)
+        if self.threshold <= 1 and len(key) <= self.max_similarity_chars:
+            similar = self._similar(key, self.threshold)
+            if similar is not None:
+                return self._hit("similar", *similar)
+        self.counts["miss"] += 1
+        recommend_cache_total.inc("miss")
+        return None
+
+    def closest(self, message: str, threshold: float = RECOMMEND_FALLBACK_SIMILARITY) -> Optional[str]:
+        """The in-process answer to the most similar message at a looser threshold, or None."""
+        key = normalize_message(message)
+        if not self.enabled or not key or len(key) > self.max_similarity_chars:
+            return None
+        similar = self._similar(key, threshold)
+        return similar[0]["response"] if similar is not None else None
+
+    async def get_or_generate(
+        self, message: str, generate: Callable[[], Awaitable[Tuple[str, str]]],
+        index: Callable[[str], bool] = lambda model: True,
+    ) -> Tuple[str, Optional[dict], Optional[str]]:
+        """Return (answer, hit, model); `hit` is None when the answer was generated for
+        this call. `generate` returns (answer, model); answers for which `index(model)` is
+        false (e.g. a fallback served from this cache) are not added."""
+        hit = await self.lookup(message)
+        if hit is not None:
+            return hit["response"], hit, hit["model"]
+
+        async def run() -> Tuple[str, str]:
+            response, model = await generate()
+            if self.enabled and index(model):
+                self.add(message, response, model)
+            return response, model
+
+        response, model = await self.flights.do(normalize_message(message) or message, run)
+        return response, None, model
+
+    async def warm(self, limit: int = RECOMMEND_CACHE_WARM_ENTRIES):
+        """Index the most recent Gemini answers from `chats`, yielding to the loop as it goes."""
+        if not self.enabled or limit <= 0:
+            return
+        try:
+            docs = await list_recent_chats(datetime.utcnow() - timedelta(seconds=self.ttl), limit)
+        except Exception as e:
+            print(f"Recommendation cache warm-up error: {e}")
+            return
+        # Oldest first, so the newest answer wins when normalized messages collide
+        for n, doc in enumerate(reversed(docs)):
+            self.add(doc["user_message"], doc["ai_response"], doc.get("model"))
+            if n % 10 == 9:
+                await asyncio.sleep(0)
+        print(f"Recommendation cache warmed with {len(self.entries)} answers")
+
+    def stats(self) -> dict:
+        lookups = sum(self.counts.values())
+        hits = lookups - self.counts["miss"]
+        return {"enabled": self.enabled, "entries": len(self.entries), **self.counts,
+                "hit_ratio": round(hits / lookups, 3) if lookups else None}
+
+
+recommendation_cache = RecommendationCache()
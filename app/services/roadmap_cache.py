@@ -0,0 +1,76 @@
+import os
+from typing import Optional
+
+from app.core.cache import TTLLRUCache
+from app.services.gemini_service import PROMPT_TEMPLATE_VERSION
+from app.services.roadmap_schema import entry_storage_fields, roadmap_entry_from_doc
+from app.services.mongodb_service import (
+    get_content_roadmap,
+    save_content_roadmap,
+    purge_stale_content_roadmaps,
+)
+
+ROADMAP_CACHE_MAX_BYTES = int(os.getenv("ROADMAP_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+ROADMAP_CACHE_TTL_SECONDS = float(os.getenv("ROADMAP_CACHE_TTL_SECONDS", "3600"))
+
+
+def _entry_size(entry: dict) -> int:
+    return len(entry["raw"]) + len(entry["payload"]) + sum(len(body) for body in entry["encoded"].values())
+
+
+class RoadmapContentCache:
+    """Roadmaps shared across users, addressed by the hash of the full prompt.
+
+    Identical answers produce an identical prompt, so whoever generated it first pays
+    for the Gemini call. The front tier is an in-process LRU bounded by bytes and TTL;
+    the back tier is the `roadmap_content` collection. Entries are tagged with the
+    prompt template version and ignored (and purged at startup) once it changes.
+    """
+
+    def __init__(self, template_version: str = PROMPT_TEMPLATE_VERSION,
+                 max_bytes: int = ROADMAP_CACHE_MAX_BYTES, ttl: float = ROADMAP_CACHE_TTL_SECONDS):
+        self.template_version = template_version
+        self.front = TTLLRUCache(max_bytes=max_bytes, ttl=ttl, sizeof=_entry_size)
+        self.front_hits = 0
+        self.back_hits = 0
+        self.misses = 0
+
+    async def get(self, prompt_hash: str) -> Optional[dict]:
+        entry = self.front.get(prompt_hash)
+        if entry is not None:
+            self.front_hits += 1
+            return entry
+        doc = await get_content_roadmap(prompt_hash, self.template_version)
+        if doc is None:
+            self.misses += 1
+            return None
+        self.back_hits += 1
+        entry = roadmap_entry_from_doc(doc, prompt_hash)
+        self.front.set(prompt_hash, entry)
+        return entry
+
+    async def put(self, prompt_hash: str, entry: dict):
+        self.front.set(prompt_hash, entry)
+        await save_content_roadmap(
+            prompt_hash, self.template_version, entry["raw"], entry["structured_ok"],
+            **entry_storage_fields(entry),
+        )
+
+    async def purge_stale(self) -> int:
+        self.front.clear()
+        return await purge_stale_content_roadmaps(self.template_version)
+
+    def stats(self) -> dict:
+        lookups = self.front_hits + self.back_hits + self.misses
+        hits = self.front_hits + self.back_hits
+        return {
+            "template_version": self.template_version,
+            "front_hits": self.front_hits,
+            "back_hits": self.back_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "front": self.front.stats(),
+        }
+
+
+roadmap_content_cache = RoadmapContentCache()
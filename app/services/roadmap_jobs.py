@@ -0,0 +1,146 @@
+import os
+import socket
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+from fastapi import HTTPException
+
+from app.services.mongodb_service import (
+    get_assessment,
+    create_roadmap_job,
+    find_active_roadmap_job,
+    claim_roadmap_job,
+    extend_roadmap_job_lease,
+    finish_roadmap_job,
+)
+from app.services.roadmap_service import generate_roadmap
+
+ROADMAP_JOB_WORKERS = int(os.getenv("ROADMAP_JOB_WORKERS", "2"))
+ROADMAP_JOB_POLL_SECONDS = float(os.getenv("ROADMAP_JOB_POLL_SECONDS", "1"))
+ROADMAP_JOB_LEASE_SECONDS = float(os.getenv("ROADMAP_JOB_LEASE_SECONDS", "300"))
+ROADMAP_JOB_MAX_ATTEMPTS = int(os.getenv("ROADMAP_JOB_MAX_ATTEMPTS", "3"))
+
+
+class RoadmapJobQueue:
+    """Mongo-backed roadmap generation queue drained by a pool of asyncio workers.
+
+    Jobs live in the `roadmap_jobs` collection, so they survive restarts and can be
+    processed by any process running workers (the API itself, or a dedicated
+    `python -m app.services.roadmap_jobs`). A worker claims a job atomically with a
+    lease, renewed every third of `lease_seconds` while the job runs; if the process dies
+    mid-job the lease expires and another worker picks it up, up to `max_attempts` times.
+    Results are written to the regular `roadmaps` cache by generate_roadmap.
+    """
+
+    def __init__(self, concurrency: int = ROADMAP_JOB_WORKERS, poll_seconds: float = ROADMAP_JOB_POLL_SECONDS,
+                 lease_seconds: float = ROADMAP_JOB_LEASE_SECONDS, max_attempts: int = ROADMAP_JOB_MAX_ATTEMPTS):
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def enqueue(self, user_id: str, assessment_id: str, force: bool = False,
+                      charge: Optional[Callable[[], Awaitable[None]]] = None) -> dict:
+        """Queue a generation, reusing a queued/running job for the same assessment unless forced.
+
+        `charge` (see rate_limit.gemini_charge) is awaited only when a new job is created.
+        """
+        if not force:
+            active = await find_active_roadmap_job(user_id, assessment_id)
+            if active:
+                return active
+        if charge is not None:
+            await charge()
+        job = await create_roadmap_job(user_id, assessment_id, force)
+        self._wakeup.set()
+        return job
+
+    def start(self):
+        if self._tasks:
+            return
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = [asyncio.ensure_future(self._worker(f"{prefix}:{n}")) for n in range(self.concurrency)]
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _worker(self, worker_id: str):
+        while True:
+            try:
+                job = await claim_roadmap_job(worker_id, self.lease_seconds, self.max_attempts)
+            except Exception as e:
+                print(f"Roadmap job claim error: {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job, worker_id)
+
+    async def _run(self, job: dict, worker_id: str):
+        job_id = job["_id"]
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_id, worker_id))
+        try:
+            doc = await get_assessment(job["userId"], job["assessmentId"])
+            if not doc:
+                await self._finish(job_id, worker_id, "failed", "Assessment not found")
+                return
+            await generate_roadmap(job["userId"], job["assessmentId"], doc, job.get("force", False))
+            await self._finish(job_id, worker_id, "succeeded")
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back instead of waiting for its lease to expire
+            await asyncio.shield(self._finish(job_id, worker_id, "queued", "Worker shut down"))
+            raise
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            status = "failed" if job.get("attempts", 1) >= self.max_attempts else "queued"
+            print(f"Roadmap job {job_id} attempt {job.get('attempts')} failed: {detail}")
+            await self._finish(job_id, worker_id, status, detail)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str, worker_id: str):
+        # Keeps a long generation from being re-claimed, and run twice, by another worker
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await extend_roadmap_job_lease(job_id, worker_id, self.lease_seconds):
+                    print(f"Roadmap job {job_id} lease lost")
+                    return
+            except Exception as e:
+                print(f"Roadmap job {job_id} lease renewal error: {e}")
+
+    @staticmethod
+    async def _finish(job_id: str, worker_id: str, status: str, error: Optional[str] = None):
+        # A failed status write must not kill the worker; the lease expiry recovers the job
+        try:
+            await finish_roadmap_job(job_id, worker_id, status, error)
+        except Exception as e:
+            print(f"Roadmap job {job_id} finish error ({status}): {e}")
+
+
+roadmap_job_queue = RoadmapJobQueue()
+
+
+async def _run_workers():
+    from app.core.database import ensure_indexes
+
+    await ensure_indexes()
+    roadmap_job_queue.start()
+    print(f"Roadmap job workers started ({roadmap_job_queue.concurrency})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await roadmap_job_queue.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(_run_workers())
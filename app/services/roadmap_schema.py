@@ -0,0 +1,155 @@
+import re
+import json
+import hashlib
+from typing import Any, Optional
+
+from app.core.compression import STORAGE_ENCODING, decompress, encode_variants
+
+# Mirrors the schema requested in build_prompt_from_responses
+SOLUTION_FIELDS = ("title", "rationale", "risks", "bizowl_services")
+BEST_SOLUTION_FIELDS = ("title", "why_best", "implementation_focus", "key_risks", "mitigation")
+STEP_FIELDS = ("title", "description", "duration", "kpis", "dependencies", "bizowl_support")
+
+NOT_SPECIFIED = "Not specified"
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+def _loads_lenient(text: str) -> Optional[Any]:
+    text = _FENCE_RE.sub("", text.strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    candidate = text[start:end + 1]
+    for attempt in (candidate, _TRAILING_COMMA_RE.sub(r"\1", candidate)):
+        try:
+            return json.loads(attempt, strict=False)
+        except ValueError:
+            continue
+    return None
+
+
+def _text(value: Any) -> str:
+    if value is None or value == "":
+        return NOT_SPECIFIED
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value).strip() or NOT_SPECIFIED
+
+
+def _record(value: Any, fields) -> dict:
+    value = value if isinstance(value, dict) else {}
+    return {field: _text(value.get(field)) for field in fields}
+
+
+def parse_roadmap(text: str) -> Optional[dict]:
+    """Parse Gemini's roadmap text and coerce it to the expected schema.
+
+    Tolerates code fences, leading/trailing chatter and trailing commas. Missing
+    fields become "Not specified", non-string values are flattened to text, and roadmap
+    steps are ordered and renumbered from 1. Returns None if no JSON object is found.
+    """
+    data = _loads_lenient(text)
+    if not isinstance(data, dict):
+        return None
+
+    solutions = data.get("possible_solutions")
+    steps = data.get("roadmap")
+    steps = [s for s in steps if isinstance(s, dict)] if isinstance(steps, list) else []
+
+    def order(indexed):
+        index, step = indexed
+        try:
+            return (0, float(step.get("sequence")), index)
+        except (TypeError, ValueError):
+            return (1, 0.0, index)
+
+    return {
+        "overview": _text(data.get("overview")),
+        "problem_identification": _text(data.get("problem_identification")),
+        "possible_solutions": [_record(s, SOLUTION_FIELDS) for s in solutions] if isinstance(solutions, list) else [],
+        "best_recommended_solution": _record(data.get("best_recommended_solution"), BEST_SOLUTION_FIELDS),
+        "roadmap": [
+            {"sequence": n, **_record(step, STEP_FIELDS)}
+            for n, (_, step) in enumerate(sorted(enumerate(steps), key=order), 1)
+        ],
+        "conclusion": _text(data.get("conclusion")),
+    }
+
+
+def parse_section(text: str, keys) -> Optional[dict]:
+    """The `keys` of one sectioned-generation answer, as returned (parse_roadmap coerces
+    the merged object). None if no JSON object is found or none of the keys is present."""
+    data = _loads_lenient(text)
+    if not isinstance(data, dict) or not any(key in data for key in keys):
+        return None
+    return {key: data[key] for key in keys if key in data}
+
+
+# --------------- Stored / served form ---------------
+ENTRY_FIELDS = ("raw", "structured", "structured_ok", "payload", "etag", "encoded", "model")
+
+
+def build_roadmap_entry(prompt_hash: str, raw_text: str) -> dict:
+    """Parse once and pre-serialize the response body served on every cache hit.
+
+    `encoded` holds the body pre-compressed per Content-Encoding (gzip, and br / zstd
+    when their codecs are installed), so cache hits never compress. The ETag combines
+    the prompt hash with a digest of the payload, so it changes when a forced
+    regeneration produces different text for the same answers.
+    """
+    structured = parse_roadmap(raw_text)
+    payload = json.dumps(
+        {"roadmap": raw_text, "structured": structured}, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+    etag = f'"{prompt_hash[:16]}-{hashlib.sha256(payload).hexdigest()[:16]}"'
+    return {
+        "raw": raw_text,
+        "structured": structured,
+        "structured_ok": structured is not None,
+        "payload": payload,
+        "etag": etag,
+        "encoded": encode_variants(payload),
+        "model": None,
+    }
+
+
+def entry_storage_fields(entry: dict) -> dict:
+    """Keyword arguments for the save_*_roadmap functions.
+
+    The payload is stored zstd-compressed when available, reusing the HTTP variant, and
+    the other variants are stored beside it.
+    """
+    encoded = dict(entry["encoded"])
+    payload = encoded.pop(STORAGE_ENCODING, None) if STORAGE_ENCODING else None
+    return {
+        "structured": entry["structured"],
+        "payload": payload if payload is not None else entry["payload"],
+        "payload_encoding": STORAGE_ENCODING if payload is not None else None,
+        "encoded": encoded,
+        "etag": entry["etag"],
+        "model": entry.get("model"),
+    }
+
+
+def roadmap_entry_from_doc(doc: dict, prompt_hash: str) -> dict:
+    """Entry from a cache document; documents saved before parse-once storage are upgraded."""
+    if not (doc.get("payload") and doc.get("etag")):
+        return build_roadmap_entry(prompt_hash, doc.get("raw", ""))
+    encoding = doc.get("payload_encoding")
+    payload = decompress(doc["payload"], encoding)
+    # Older documents are served uncompressed until regenerated: compressing here would
+    # cost CPU on every hit, as the per-user tier has no in-process front
+    encoded = dict(doc.get("encoded") or {}, **({encoding: doc["payload"]} if encoding else {}))
+    return {
+        "raw": doc.get("raw"),
+        "structured": doc.get("structured"),
+        "structured_ok": doc.get("structured_ok"),
+        "payload": payload,
+        "etag": doc["etag"],
+        "encoded": encoded,
+        "model": doc.get("model"),
+    }
@@ -0,0 +1,134 @@
+import os
+import json
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.cache import TTLLRUCache
+from app.core.metrics import roadmap_section_total
+from app.services.gemini_service import ROADMAP_SECTIONS, build_section_prompts, query_gemini, sanitize_roadmap_text
+from app.services.mongodb_service import get_roadmap_sections, save_roadmap_section
+from app.services.roadmap_schema import parse_section
+
+# Opt-in: generate roadmaps as independent section prompts run concurrently
+ROADMAP_SECTIONED = os.getenv("ROADMAP_SECTIONED", "false").lower() in ("1", "true", "yes")
+ROADMAP_SECTION_CACHE_MAX_BYTES = int(os.getenv("ROADMAP_SECTION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+ROADMAP_SECTION_CACHE_TTL_SECONDS = float(os.getenv("ROADMAP_SECTION_CACHE_TTL_SECONDS", "3600"))
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def section_hashes(assessment_doc: dict) -> Dict[str, str]:
+    """section name -> SHA-256 of its prompt."""
+    return {name: _hash(prompt) for name, prompt in build_section_prompts(assessment_doc).items()}
+
+
+def sectioned_prompt_hash(hashes: Dict[str, str]) -> str:
+    """Roadmap-level cache key of a sectioned generation.
+
+    Derived from the section hashes, so it changes with any section and never equals the
+    single-shot prompt hash of the same answers.
+    """
+    return _hash("sectioned:" + ",".join(f"{name}={hashes[name]}" for name in ROADMAP_SECTIONS))
+
+
+class RoadmapSectionCache:
+    """Parsed section answers keyed by the hash of their prompt.
+
+    A section's prompt covers its template and only the answers it reads, so editing one
+    answer or one section's instructions leaves the other sections' keys, and cached
+    answers, untouched. Same two tiers as the shared roadmap cache: an in-process LRU
+    bounded by bytes and TTL in front of the `roadmap_sections` collection.
+    """
+
+    def __init__(self, max_bytes: int = ROADMAP_SECTION_CACHE_MAX_BYTES, ttl: float = ROADMAP_SECTION_CACHE_TTL_SECONDS):
+        self.front = TTLLRUCache(max_bytes=max_bytes, ttl=ttl,
+                                 sizeof=lambda v: len(json.dumps(v, ensure_ascii=False)))
+        self.hits = 0
+        self.misses = 0
+
+    async def get_many(self, hashes: List[str]) -> Dict[str, dict]:
+        found = {h: self.front.get(h) for h in hashes}
+        found = {h: data for h, data in found.items() if data is not None}
+        missing = [h for h in hashes if h not in found]
+        if missing:
+            for doc in await get_roadmap_sections(missing):
+                found[doc["section_hash"]] = doc["data"]
+                self.front.set(doc["section_hash"], doc["data"])
+        self.hits += len(found)
+        self.misses += len(hashes) - len(found)
+        return found
+
+    async def put(self, section_hash: str, section: str, data: dict):
+        self.front.set(section_hash, data)
+        await save_roadmap_section(section_hash, section, data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": ROADMAP_SECTIONED,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "front": self.front.stats(),
+        }
+
+
+roadmap_section_cache = RoadmapSectionCache()
+
+
+class SectionParseError(ValueError):
+    """Raised when generated sections came back without any of their JSON keys."""
+
+    def __init__(self, sections: List[str]):
+        self.sections = sections
+        super().__init__(f"Roadmap sections did not parse: {', '.join(sections)}")
+
+
+async def generate_sections(assessment_doc: dict, generate: Callable[[str], Awaitable[str]] = query_gemini,
+                            cache: RoadmapSectionCache = roadmap_section_cache) -> Tuple[str, Dict[str, str]]:
+    """Roadmap text merged from the section answers, and where each section came from.
+
+    Cached sections are reused; the rest are generated concurrently. Sections that parse
+    are cached even when a sibling call fails or does not parse, so a retry only
+    regenerates what is missing. A failed call is re-raised; a section that does not
+    parse raises SectionParseError rather than merging into a roadmap with its fields
+    "Not specified", which the roadmap-level cache would then keep serving.
+    """
+    prompts = build_section_prompts(assessment_doc)
+    hashes = {name: _hash(prompt) for name, prompt in prompts.items()}
+    cached = await cache.get_many(list(hashes.values()))
+    missing = [name for name in prompts if hashes[name] not in cached]
+    results = await asyncio.gather(*(generate(prompts[name]) for name in missing), return_exceptions=True)
+
+    parts: Dict[str, dict] = {name: cached[hashes[name]] for name in prompts if hashes[name] in cached}
+    sources = {name: "cache" for name in parts}
+    error: Optional[BaseException] = None
+    unparsed = []
+    saves = []
+    for name, result in zip(missing, results):
+        if isinstance(result, BaseException):
+            error = error or result
+            continue
+        sources[name] = "gemini"
+        data = parse_section(sanitize_roadmap_text(result), ROADMAP_SECTIONS[name]["keys"])
+        if data is None:
+            unparsed.append(name)
+            continue
+        parts[name] = data
+        saves.append(cache.put(hashes[name], name, data))
+    if saves:
+        await asyncio.gather(*saves)
+    for name in prompts:
+        roadmap_section_total.inc(name, "hit" if sources.get(name) == "cache" else "miss")
+    if error is not None:
+        raise error
+    if unparsed:
+        raise SectionParseError(unparsed)
+
+    merged = {}
+    for name in ROADMAP_SECTIONS:
+        merged.update(parts.get(name, {}))
+    return json.dumps(merged, ensure_ascii=False, indent=2), sources
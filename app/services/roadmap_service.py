@@ -0,0 +1,268 @@
+import json
+import uuid
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.metrics import roadmap_cache_total
+from app.core.profiling import span
+from app.services.call_policy import CircuitOpenError
+from app.services.gemini_service import (
+    build_prompt_from_responses,
+    sanitize_roadmap_text,
+)
+from app.services.mongodb_service import (
+    ROADMAP_LEASE_SECONDS,
+    get_cached_roadmap,
+    save_cached_roadmap,
+    acquire_roadmap_lease,
+    renew_roadmap_lease,
+    release_roadmap_lease,
+    wait_for_cached_roadmap,
+)
+from app.services.model_router import model_router
+from app.services.roadmap_cache import roadmap_content_cache
+from app.services.roadmap_schema import build_roadmap_entry, entry_storage_fields, roadmap_entry_from_doc
+from app.services.roadmap_sections import ROADMAP_SECTIONED, generate_sections, section_hashes, sectioned_prompt_hash
+from app.services.roadmap_stream import RoadmapStreamParser
+from app.services.singleflight import SingleFlight
+
+# Concurrent generations for the same (userId, assessmentId, prompt_hash) share one Gemini call
+roadmap_flights = SingleFlight()
+
+
+def roadmap_prompt(assessment_doc: dict) -> Tuple[str, str]:
+    """Return the Gemini prompt for an assessment and its SHA-256 cache key.
+
+    With ROADMAP_SECTIONED the key is derived from the section prompts instead.
+    """
+    with span("roadmap.prompt"):
+        prompt = build_prompt_from_responses(assessment_doc)
+        if ROADMAP_SECTIONED:
+            return prompt, sectioned_prompt_hash(section_hashes(assessment_doc))
+        return prompt, hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+async def generate_roadmap(user_id: str, assessment_id: str, assessment_doc: dict, force: bool = False,
+                           charge: Optional[Callable[[], Awaitable[None]]] = None) -> dict:
+    """Return the roadmap entry for an assessment, from cache or a (shared) Gemini call.
+
+    `charge` (see rate_limit.gemini_charge) is awaited on a cache miss, before any
+    model call, and may raise 429. The entry holds the raw text, its parsed `structured` form, the pre-serialized
+    response `payload`, its pre-compressed `encoded` variants and its `etag`
+    (see roadmap_schema.build_roadmap_entry).
+    """
+    prompt, prompt_hash = roadmap_prompt(assessment_doc)
+
+    if not force:
+        cached = await cached_roadmap(user_id, assessment_id, prompt_hash)
+        if cached is not None:
+            return cached
+    if charge is not None:
+        await charge()
+
+    return await roadmap_flights.do(
+        (user_id, assessment_id, prompt_hash),
+        lambda: _generate_with_lease(
+            user_id, assessment_id, prompt_hash, force,
+            lambda: (_query_sections(user_id, assessment_id, assessment_doc, prompt_hash) if ROADMAP_SECTIONED
+                     else _query_roadmap(user_id, assessment_id, prompt, prompt_hash)),
+        ),
+    )
+
+
+async def cached_roadmap(user_id: str, assessment_id: str, prompt_hash: str) -> Optional[dict]:
+    """Look up this assessment's cached roadmap, then the shared content-addressed cache."""
+    cached = await get_cached_roadmap(user_id, assessment_id)
+    if cached and cached.get("prompt_hash") == prompt_hash and "raw" in cached:
+        roadmap_cache_total.inc("hit")
+        return roadmap_entry_from_doc(cached, prompt_hash)
+    shared = await roadmap_content_cache.get(prompt_hash)
+    if shared is not None:
+        roadmap_cache_total.inc("shared_hit")
+        await _store_entry(user_id, assessment_id, prompt_hash, shared)
+        return shared
+    roadmap_cache_total.inc("stale" if cached else "miss")
+    return None
+
+
+async def _store_entry(user_id: str, assessment_id: str, prompt_hash: str, entry: dict):
+    await save_cached_roadmap(
+        user_id, assessment_id, prompt_hash, entry["raw"], entry["structured_ok"],
+        **entry_storage_fields(entry),
+    )
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def roadmap_events(user_id: str, assessment_id: str, assessment_doc: dict, force: bool = False,
+                         charge: Optional[Callable[[], Awaitable[None]]] = None) -> AsyncIterator[str]:
+    """Server-sent events for one roadmap.
+
+    Emits a `section` / `item` event for every part of the JSON as soon as it is complete,
+    then a final `done` event carrying the full text (or `error`). Cache hits and requests
+    that join another in-flight generation replay the finished text through the same parser.
+    """
+    prompt, prompt_hash = roadmap_prompt(assessment_doc)
+    parser = RoadmapStreamParser(sanitize_roadmap_text)
+    source = "cache"
+    entry = None
+    if not force:
+        entry = await cached_roadmap(user_id, assessment_id, prompt_hash)
+
+    if entry is None:
+        source = "gemini"
+        if charge is not None:
+            # The stream has already started with 200, so a 429 arrives as an `error` event
+            try:
+                await charge()
+            except HTTPException as e:
+                yield _sse("error", {"detail": e.detail, "status": e.status_code,
+                                     "retry_after": int((e.headers or {}).get("Retry-After", 0))})
+                return
+        chunks: asyncio.Queue = asyncio.Queue()
+        flight = asyncio.ensure_future(roadmap_flights.do(
+            (user_id, assessment_id, prompt_hash),
+            lambda: _generate_with_lease(
+                user_id, assessment_id, prompt_hash, force,
+                # Sections arrive out of order; the merged text is replayed once it is saved
+                lambda: (_query_sections(user_id, assessment_id, assessment_doc, prompt_hash) if ROADMAP_SECTIONED
+                         else _stream_roadmap(user_id, assessment_id, prompt, prompt_hash, chunks.put_nowait)),
+            ),
+        ))
+        # The generation outlives a disconnected client; don't warn about its result
+        flight.add_done_callback(lambda f: f.cancelled() or f.exception())
+        getter = None
+        try:
+            while not flight.done() or not chunks.empty():
+                getter = asyncio.ensure_future(chunks.get())
+                await asyncio.wait({getter, flight}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    continue
+                for event in parser.feed(getter.result()):
+                    yield _sse(event["type"], event)
+        finally:
+            # A client disconnect cancels the wait above; don't leave the getter pending
+            if getter is not None and not getter.done():
+                getter.cancel()
+        try:
+            entry = flight.result()
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            yield _sse("error", {"detail": detail})
+            return
+
+    if not parser.text:
+        for event in parser.feed(entry["raw"]):
+            yield _sse(event["type"], event)
+    yield _sse("done", {
+        "source": source,
+        "complete": parser.done,
+        "roadmap": entry["raw"],
+        "structured": entry["structured"],
+        "model": entry.get("model"),
+    })
+
+
+async def _generate_with_lease(user_id: str, assessment_id: str, prompt_hash: str, force: bool,
+                               generate: Callable[[], Awaitable[dict]]) -> dict:
+    """Run `generate` under a cross-worker lease, or wait for the worker that already holds it.
+
+    The lease is renewed every third of ROADMAP_LEASE_SECONDS while `generate` runs, so a
+    generation outliving one lease period (slow model, fallback, retries) is not started
+    a second time by a waiting worker; only a dead holder's lease expires.
+    """
+    owner = uuid.uuid4().hex
+    since = datetime.utcnow() if force else None
+    while True:
+        if await acquire_roadmap_lease(user_id, assessment_id, prompt_hash, owner, ROADMAP_LEASE_SECONDS):
+            heartbeat = asyncio.ensure_future(_renew_lease(user_id, assessment_id, owner))
+            try:
+                return await generate()
+            except BaseException:
+                await asyncio.shield(release_roadmap_lease(user_id, assessment_id, owner))
+                raise
+            finally:
+                heartbeat.cancel()
+        cached = await wait_for_cached_roadmap(user_id, assessment_id, prompt_hash, since=since)
+        if cached:
+            return roadmap_entry_from_doc(cached, prompt_hash)
+
+
+async def _renew_lease(user_id: str, assessment_id: str, owner: str):
+    while True:
+        await asyncio.sleep(ROADMAP_LEASE_SECONDS / 3)
+        try:
+            if not await renew_roadmap_lease(user_id, assessment_id, owner, ROADMAP_LEASE_SECONDS):
+                print(f"Roadmap lease for assessment {assessment_id} lost")
+                return
+        except Exception as e:
+            print(f"Roadmap lease renewal error for assessment {assessment_id}: {e}")
+
+
+async def _save_roadmap(user_id: str, assessment_id: str, prompt_hash: str, roadmap_text: str,
+                        model: Optional[str]) -> dict:
+    # Validate/repair, serialize and compress once here, rather than on every read;
+    # max-level brotli/zstd take tens of milliseconds, so off the event loop
+    with span("roadmap.encode"):
+        entry = await asyncio.to_thread(build_roadmap_entry, prompt_hash, sanitize_roadmap_text(roadmap_text))
+    entry["model"] = model
+    await _store_entry(user_id, assessment_id, prompt_hash, entry)
+    await roadmap_content_cache.put(prompt_hash, entry)
+    return entry
+
+
+def _generation_error(assessment_id: str, e: Exception) -> HTTPException:
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(status_code=503, detail=str(e),
+                             headers={"Retry-After": str(max(1, int(e.retry_after)))})
+    print(f"Gemini generation failed for assessment {assessment_id}: {e}")
+    return HTTPException(status_code=500, detail=f"Gemini generation failed: {e}")
+
+
+async def _query_roadmap(user_id: str, assessment_id: str, prompt: str, prompt_hash: str) -> dict:
+    # Retries, backoff and the circuit breaker live in each model's call policy; the
+    # router falls back to the next model when one misses its latency budget
+    try:
+        roadmap_text, model = await model_router.generate("roadmap", prompt)
+    except Exception as e:
+        raise _generation_error(assessment_id, e)
+    return await _save_roadmap(user_id, assessment_id, prompt_hash, roadmap_text, model)
+
+
+async def _query_sections(user_id: str, assessment_id: str, assessment_doc: dict, prompt_hash: str) -> dict:
+    # Only sections whose prompt changed are sent to Gemini, concurrently
+    models = set()
+
+    async def generate(prompt: str) -> str:
+        text, model = await model_router.generate("roadmap", prompt)
+        models.add(model)
+        return text
+
+    try:
+        roadmap_text, _ = await generate_sections(assessment_doc, generate=generate)
+    except Exception as e:
+        raise _generation_error(assessment_id, e)
+    # Sections served from the section cache were generated earlier and are not counted
+    return await _save_roadmap(user_id, assessment_id, prompt_hash, roadmap_text, ",".join(sorted(models)) or None)
+
+
+async def _stream_roadmap(user_id: str, assessment_id: str, prompt: str, prompt_hash: str,
+                          on_chunk: Callable[[str], None]) -> dict:
+    # The router falls back to the next model until one sends its first chunk; after that
+    # the chunks may have reached the client, so the stream can't be retried transparently
+    parts = []
+    try:
+        model, chunks = await model_router.stream("roadmap", prompt)
+        async for chunk in chunks:
+            parts.append(chunk)
+            on_chunk(chunk)
+    except Exception as e:
+        raise _generation_error(assessment_id, e)
+    return await _save_roadmap(user_id, assessment_id, prompt_hash, "".join(parts), model)
@@ -0,0 +1,121 @@
+import os
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.cache import TTLLRUCache
+from app.core.metrics import roadmap_speculation_total
+from app.services.gemini_client import BackgroundPriority, background_priority
+from app.services.mongodb_service import get_assessment
+from app.services.roadmap_service import generate_roadmap
+
+# Opt-in: generate roadmaps right after /save-responses (one Gemini call per save)
+ROADMAP_SPECULATION_ENABLED = os.getenv("ROADMAP_SPECULATION_ENABLED", "false").lower() in ("1", "true", "yes")
+ROADMAP_SPECULATION_MAX_INFLIGHT = int(os.getenv("ROADMAP_SPECULATION_MAX_INFLIGHT", "4"))
+# How long a finished speculation still counts as used when its roadmap is requested
+ROADMAP_SPECULATION_TTL_SECONDS = float(os.getenv("ROADMAP_SPECULATION_TTL_SECONDS", "900"))
+
+
+class RoadmapSpeculator:
+    """Starts roadmap generation for a freshly saved assessment before anyone asks for it.
+
+    The run is an ordinary generate_roadmap call in a background task, so its result
+    lands in the `roadmaps` cache and a GET arriving mid-generation joins the same
+    single-flight (or, in another worker, waits on its lease). Its Gemini calls carry a
+    BackgroundPriority and yield the pool to interactive requests until a request for
+    the same assessment claims the run, which promotes it. Each run is charged to the
+    saving caller's Gemini rate limit before its model call and is dropped (`limited`)
+    when the bucket is empty, so /save-responses is not an unmetered way to call Gemini.
+
+    Counters are per process: `joined` and `hit` count roadmap requests served by an
+    in-flight or finished speculation; `succeeded` minus those is the wasted work.
+    """
+
+    def __init__(self, enabled: bool = ROADMAP_SPECULATION_ENABLED, max_inflight: int = ROADMAP_SPECULATION_MAX_INFLIGHT,
+                 ttl: float = ROADMAP_SPECULATION_TTL_SECONDS):
+        self.enabled = enabled
+        self.max_inflight = max_inflight
+        self._tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._priorities: Dict[Tuple[str, str], BackgroundPriority] = {}
+        self._finished = TTLLRUCache(max_items=10000, ttl=ttl)
+        self.counts = {"started": 0, "skipped": 0, "limited": 0, "succeeded": 0, "failed": 0,
+                       "joined": 0, "hit": 0}
+
+    def _count(self, outcome: str):
+        self.counts[outcome] += 1
+        roadmap_speculation_total.inc(outcome)
+
+    def speculate(self, user_id: str, assessment_id: str,
+                  charge: Optional[Callable[[], Awaitable[None]]] = None) -> bool:
+        """Start a background generation unless disabled, already running or at capacity.
+
+        `charge` (see rate_limit.gemini_charge) is awaited before the model call.
+        """
+        key = (user_id, assessment_id)
+        if not self.enabled or key in self._tasks:
+            return False
+        if len(self._tasks) >= self.max_inflight:
+            self._count("skipped")
+            return False
+        priority = BackgroundPriority()
+        self._priorities[key] = priority
+        self._tasks[key] = asyncio.ensure_future(self._run(key, priority, charge))
+        self._count("started")
+        return True
+
+    async def _run(self, key: Tuple[str, str], priority: BackgroundPriority,
+                   charge: Optional[Callable[[], Awaitable[None]]] = None):
+        # Copied into the tasks generate_roadmap spawns (single-flight, hedges, sections)
+        background_priority.set(priority)
+        user_id, assessment_id = key
+        try:
+            doc = await get_assessment(user_id, assessment_id)
+            if doc:
+                await generate_roadmap(user_id, assessment_id, doc, charge=charge)
+                if not priority.promoted:  # otherwise already counted as joined
+                    self._finished.set(key, True)
+                self._count("succeeded")
+        except asyncio.CancelledError:
+            raise
+        except HTTPException as e:
+            if e.status_code != 429:
+                print(f"Speculative roadmap for assessment {assessment_id} failed: {e.detail}")
+            self._count("limited" if e.status_code == 429 else "failed")
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            print(f"Speculative roadmap for assessment {assessment_id} failed: {detail}")
+            self._count("failed")
+        finally:
+            self._tasks.pop(key, None)
+            self._priorities.pop(key, None)
+
+    def claim(self, user_id: str, assessment_id: str) -> bool:
+        """Called by interactive roadmap requests: promote a matching run and count the use.
+
+        Returns True when a run was still in flight; the caller joins it and must not be
+        charged again, as the run already took its rate-limit token.
+        """
+        key = (user_id, assessment_id)
+        priority = self._priorities.get(key)
+        if priority is not None:
+            priority.promote()
+            self._count("joined")
+            return True
+        if self._finished.pop(key) is not None:
+            self._count("hit")
+        return False
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        used = self.counts["joined"] + self.counts["hit"]
+        return {"enabled": self.enabled, "in_flight": len(self._tasks), **self.counts,
+                "use_ratio": round(used / self.counts["started"], 3) if self.counts["started"] else None}
+
+
+roadmap_speculator = RoadmapSpeculator()
@@ -0,0 +1,150 @@
+import json
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Top-level keys whose value is an array; each element is emitted as its own event
+ARRAY_SECTIONS = ("possible_solutions", "roadmap")
+
+
+class RoadmapStreamParser:
+    """Incremental parser for the roadmap JSON schema from build_prompt_from_responses.
+
+    Text is fed chunk by chunk as it arrives from Gemini. Whenever a top-level section
+    (overview, best_recommended_solution, ...) or an element of one of the array
+    sections (each possible_solutions item, each roadmap step) is syntactically complete,
+    an event is produced:
+
+      {"type": "section", "key": "overview", "data": "..."}
+      {"type": "item", "key": "roadmap", "index": 0, "data": {...}}
+
+    Anything before the root "{" (e.g. a stray ```json fence) is ignored. The parser only
+    tracks string/escape state and container nesting, so each character is scanned once.
+    """
+
+    def __init__(self, transform: Optional[Callable[[str], str]] = None):
+        self._transform = transform or (lambda s: s)
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._item_index = 0
+        self._done = False
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str) -> Iterator[Dict]:
+        self._text += chunk
+        text = self._text
+        while self._pos < len(text) and not self._done:
+            i = self._pos
+            c = text[i]
+            self._pos += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    yield from self._string_closed(i)
+                continue
+            if not self._stack:
+                if c == "{":
+                    self._stack.append(c)
+                    self._expect_key = True
+                continue
+            if c == '"':
+                self._in_string = True
+                self._value_opened(i, is_string=True)
+            elif c in "{[":
+                self._value_opened(i)
+                self._stack.append(c)
+            elif c in "}]":
+                yield from self._scalar_closed(i)
+                self._stack.pop()
+                yield from self._container_closed(i)
+            elif c == ",":
+                yield from self._scalar_closed(i)
+                if len(self._stack) == 1:
+                    self._expect_key = True
+            elif c == ":" or c.isspace():
+                continue
+            else:
+                self._value_opened(i)
+
+    # --- value boundaries -------------------------------------------------
+    def _in_array_section(self) -> bool:
+        return len(self._stack) == 2 and self._stack[1] == "[" and self._key in ARRAY_SECTIONS
+
+    def _value_opened(self, i: int, is_string: bool = False):
+        depth = len(self._stack)
+        if depth == 1:
+            if self._expect_key and is_string:
+                self._key_start = i
+            elif self._value_start is None:
+                self._value_start = i
+        elif self._in_array_section() and self._item_start is None:
+            self._item_start = i
+
+    def _string_closed(self, i: int) -> Iterator[Dict]:
+        depth = len(self._stack)
+        if depth == 1 and self._key_start is not None:
+            self._key = json.loads(self._text[self._key_start:i + 1])
+            self._key_start = None
+            self._expect_key = False
+            self._item_index = 0
+        elif depth == 1 and self._value_start is not None:
+            yield from self._emit_section(i + 1)
+        elif self._in_array_section() and self._item_start is not None:
+            yield from self._emit_item(i + 1)
+
+    def _scalar_closed(self, i: int) -> Iterator[Dict]:
+        # Numbers/literals have no closing delimiter; they end at the next "," or "}"/"]"
+        depth = len(self._stack)
+        if depth == 1 and self._value_start is not None:
+            yield from self._emit_section(i)
+        elif self._in_array_section() and self._item_start is not None:
+            yield from self._emit_item(i)
+
+    def _container_closed(self, i: int) -> Iterator[Dict]:
+        depth = len(self._stack)
+        if depth == 0:
+            self._done = True
+        elif depth == 1 and self._value_start is not None:
+            yield from self._emit_section(i + 1)
+        elif self._in_array_section() and self._item_start is not None:
+            yield from self._emit_item(i + 1)
+
+    def _emit_section(self, end: int) -> Iterator[Dict]:
+        start, self._value_start = self._value_start, None
+        key = self._key
+        if key in ARRAY_SECTIONS:
+            return
+        data = self._loads(self._text[start:end])
+        if data is not None:
+            yield {"type": "section", "key": key, "data": data}
+
+    def _emit_item(self, end: int) -> Iterator[Dict]:
+        start, self._item_start = self._item_start, None
+        data = self._loads(self._text[start:end])
+        index = self._item_index
+        self._item_index += 1
+        if data is not None:
+            yield {"type": "item", "key": self._key, "index": index, "data": data}
+
+    def _loads(self, raw: str):
+        try:
+            return json.loads(self._transform(raw.strip()))
+        except ValueError:
+            return None
@@ -0,0 +1,113 @@
+import json
+import hashlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.database import db
+from app.services.survey_data import steps
+
+catalog_collection = db["survey_catalog"]  # question sets by version, never modified once written
+
+
+def catalog_version(questions: Iterable[dict]) -> str:
+    """Content address of a question set: the same questions always get the same version."""
+    canonical = json.dumps(sorted(questions, key=lambda q: q["id"]), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class SurveyCatalog:
+    """Versioned survey questions that assessments reference instead of copying them.
+
+    Assessments store `catalog_version` and compact responses: the question id, the
+    answer, and the type only where it differs from the catalog's. `rehydrate` restores
+    the full `{id, type, question, answer}` form on read. Versions are immutable and
+    content-addressed, so they are cached in memory forever once loaded; the current
+    version (from survey_data.steps) is always in memory and must be written to the
+    `survey_catalog` collection before any document references it (`publish`, tried at
+    startup and awaited again by every compact write until it succeeds).
+    """
+
+    def __init__(self, questions: List[dict] = steps):
+        self.current_version = catalog_version(questions)
+        self._versions: Dict[str, Dict[int, dict]] = {self.current_version: {q["id"]: q for q in questions}}
+        # Versions known to be stored in Mongo, so documents may reference them
+        self._persisted: Set[str] = set()
+
+    def questions(self, version: str) -> Optional[Dict[int, dict]]:
+        """Questions of a version already in memory, by id (None if not loaded)."""
+        return self._versions.get(version)
+
+    async def load(self, version: str) -> Optional[Dict[int, dict]]:
+        questions = self._versions.get(version)
+        if questions is None:
+            doc = await catalog_collection.find_one({"version": version})
+            if doc is None:
+                print(f"Survey catalog version {version} not found")
+                return None
+            questions = self._versions[version] = {q["id"]: q for q in doc["questions"]}
+            self._persisted.add(version)
+        return questions
+
+    async def register(self, questions: List[dict], persist: bool = True) -> str:
+        """Store a question set (no-op if that version exists) and return its version.
+
+        With `persist=False` it is only added to memory, e.g. for a migration dry run.
+        """
+        version = catalog_version(questions)
+        if version not in self._versions:
+            self._versions[version] = {q["id"]: q for q in questions}
+        if persist:
+            await self._persist(version)
+        return version
+
+    async def publish(self):
+        """Make sure the current version is in Mongo, for other processes and later deploys.
+
+        Cheap once it has succeeded; raises while Mongo cannot be written, so callers
+        never store documents referencing a version that only exists in memory.
+        """
+        await self._persist(self.current_version)
+
+    async def _persist(self, version: str):
+        if version in self._persisted:
+            return
+        await catalog_collection.update_one(
+            {"version": version},
+            {"$setOnInsert": {"version": version, "questions": list(self._versions[version].values()),
+                              "created_at": datetime.utcnow()}},
+            upsert=True,
+        )
+        self._persisted.add(version)
+
+    def compact(self, responses: List[dict], version: Optional[str] = None) -> Tuple[str, List[dict]]:
+        """(catalog version, compact responses) for submitted `{id, type, answer}` responses."""
+        version = version or self.current_version
+        questions = self._versions[version]
+        compacted = []
+        for resp in responses:
+            item = {"id": resp["id"], "answer": resp.get("answer")}
+            question = questions.get(resp["id"])
+            if question is None or resp.get("type") != question.get("type"):
+                item["type"] = resp.get("type")
+            compacted.append(item)
+        return version, compacted
+
+    @staticmethod
+    def expand(questions: Dict[int, dict], resp: dict) -> dict:
+        question = questions.get(resp["id"]) or {}
+        return {
+            "id": resp["id"],
+            "type": resp.get("type") or question.get("type", ""),
+            "question": resp.get("question") or question.get("question", ""),
+            "answer": resp.get("answer"),
+        }
+
+    async def rehydrate(self, document: Optional[dict]) -> Optional[dict]:
+        """The assessment with full question text; documents in the old form pass through."""
+        if not document or "catalog_version" not in document:
+            return document
+        questions = await self.load(document["catalog_version"]) or {}
+        return {**document, "responses": [self.expand(questions, r) for r in document.get("responses", [])]}
+
+
+survey_catalog = SurveyCatalog()
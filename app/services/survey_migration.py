@@ -0,0 +1,89 @@
+"""Convert assessments that embed question text into catalog-versioned compact responses.
+
+    python -m app.services.survey_migration [--batch-size 500] [--limit N] [--dry-run]
+
+Documents whose questions match the current survey point at the current catalog
+version; those saved under older question wording get a catalog version of their own,
+so rehydration (and the roadmap prompt hash) reproduces exactly what was stored. A
+document is only rewritten if its compact form rehydrates to the original responses.
+The tool is idempotent and can be stopped and rerun at any time.
+"""
+import argparse
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+import bson
+from pymongo import UpdateOne
+
+from app.services.mongodb_service import collection
+from app.services.survey_catalog import SurveyCatalog, survey_catalog
+
+_RESPONSE_FIELDS = {"id", "type", "question", "answer"}
+
+
+async def _compact_legacy(responses: List[dict], catalog: SurveyCatalog, dry_run: bool) -> Optional[Tuple[str, List[dict]]]:
+    if any(set(r) - _RESPONSE_FIELDS or "id" not in r for r in responses):
+        return None
+    asked = {r["id"]: {"id": r["id"], "type": r.get("type", ""), "question": r.get("question", "")} for r in responses}
+    current = catalog.questions(catalog.current_version)
+    if all(current.get(qid, {}).get("question", "") == q["question"] for qid, q in asked.items()):
+        version = catalog.current_version
+    else:
+        version = await catalog.register(list(asked.values()), persist=not dry_run)
+    version, compacted = catalog.compact(responses, version)
+    questions = catalog.questions(version)
+    if [catalog.expand(questions, r) for r in compacted] != [catalog.expand({}, r) for r in responses]:
+        return None
+    return version, compacted
+
+
+async def migrate_assessments(batch_size: int = 500, limit: Optional[int] = None, dry_run: bool = False,
+                              catalog: SurveyCatalog = survey_catalog) -> Dict[str, int]:
+    """Rewrite legacy assessments in bulk; returns counts and BSON sizes of `responses`."""
+    stats = {"scanned": 0, "migrated": 0, "skipped": 0, "versions": 0, "bytes_before": 0, "bytes_after": 0}
+    versions = set()
+    ops: List[UpdateOne] = []
+    cursor = collection.find({"catalog_version": {"$exists": False}}, {"responses": 1}).sort("_id", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    async for doc in cursor.batch_size(batch_size):
+        stats["scanned"] += 1
+        responses = doc.get("responses") or []
+        result = await _compact_legacy(responses, catalog, dry_run)
+        if result is None:
+            stats["skipped"] += 1
+            continue
+        version, compacted = result
+        versions.add(version)
+        stats["migrated"] += 1
+        stats["bytes_before"] += len(bson.encode({"responses": responses}))
+        stats["bytes_after"] += len(bson.encode({"catalog_version": version, "responses": compacted}))
+        # The filter makes a concurrent or repeated run a no-op for this document
+        ops.append(UpdateOne({"_id": doc["_id"], "catalog_version": {"$exists": False}},
+                             {"$set": {"catalog_version": version, "responses": compacted}}))
+        if len(ops) >= batch_size:
+            if not dry_run:
+                await collection.bulk_write(ops, ordered=False)
+            ops = []
+    if ops and not dry_run:
+        await collection.bulk_write(ops, ordered=False)
+    stats["versions"] = len(versions)
+    return stats
+
+
+async def _main(args):
+    if not args.dry_run:
+        await survey_catalog.publish()
+    stats = await migrate_assessments(args.batch_size, args.limit, args.dry_run)
+    saved = stats["bytes_before"] - stats["bytes_after"]
+    print(f"{'Would migrate' if args.dry_run else 'Migrated'} {stats['migrated']} of {stats['scanned']} assessments "
+          f"({stats['skipped']} skipped) across {stats['versions']} catalog versions; "
+          f"responses {stats['bytes_before']} -> {stats['bytes_after']} bytes ({saved} saved)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=None, help="migrate at most this many documents")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,124 @@
+import os
+import asyncio
+from typing import List, Optional
+
+from pymongo.errors import BulkWriteError
+
+CHAT_LOG_BATCH_SIZE = int(os.getenv("CHAT_LOG_BATCH_SIZE", "100"))
+CHAT_LOG_FLUSH_SECONDS = float(os.getenv("CHAT_LOG_FLUSH_SECONDS", "1"))
+CHAT_LOG_MAX_BUFFERED = int(os.getenv("CHAT_LOG_MAX_BUFFERED", "5000"))
+CHAT_LOG_PUT_TIMEOUT_SECONDS = float(os.getenv("CHAT_LOG_PUT_TIMEOUT_SECONDS", "2"))
+
+
+class WriteBehindBuffer:
+    """Buffers append-only documents and writes them with insert_many in the background.
+
+    A flush happens when `batch_size` documents are waiting or every `flush_seconds`,
+    whichever comes first. When `max_buffered` documents are pending, `put` waits up to
+    `put_timeout` for a flush to make room (backpressure) and then drops the document.
+    Failed batches are kept for the next flush while there is room. `close` flushes
+    whatever is left, so nothing buffered is lost on a clean shutdown; documents put
+    after `close` (until the next `start`) are dropped, as nothing would flush them.
+    """
+
+    def __init__(self, collection, name: str, batch_size: int = CHAT_LOG_BATCH_SIZE,
+                 flush_seconds: float = CHAT_LOG_FLUSH_SECONDS, max_buffered: int = CHAT_LOG_MAX_BUFFERED,
+                 put_timeout: float = CHAT_LOG_PUT_TIMEOUT_SECONDS):
+        self.collection = collection
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_buffered = max_buffered
+        self.put_timeout = put_timeout
+        self._buffer: List[dict] = []
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.flushed = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    async def put(self, doc: dict) -> bool:
+        """Queue a document; returns False if it had to be dropped."""
+        if self._closing:
+            self.dropped += 1
+            return False
+        if len(self._buffer) >= self.max_buffered:
+            self._wakeup.set()
+            try:
+                async with self._space:
+                    await asyncio.wait_for(
+                        self._space.wait_for(lambda: len(self._buffer) < self.max_buffered), self.put_timeout
+                    )
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                return False
+        self._buffer.append(doc)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def start(self):
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.ensure_future(self._run())
+
+    async def close(self):
+        # Let an in-progress flush finish rather than cancelling it with its batch in hand
+        task, self._task = self._task, None
+        self._closing = True
+        self._wakeup.set()
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+        while self._buffer:
+            if not await self.flush():
+                break
+        if self._buffer:
+            self.dropped += len(self._buffer)
+            print(f"{self.name}: dropped {len(self._buffer)} buffered records on shutdown")
+            self._buffer.clear()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._buffer:
+                if not await self.flush() or len(self._buffer) < self.batch_size:
+                    break
+
+    async def flush(self) -> bool:
+        batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+        if not batch:
+            return True
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+            retry = []
+        except BulkWriteError as e:
+            # Unordered: everything but the failed indexes went in; duplicates are retries that already landed
+            failed = {err["index"] for err in e.details.get("writeErrors", []) if err.get("code") != 11000}
+            retry = [doc for i, doc in enumerate(batch) if i in failed]
+            print(f"{self.name}: {len(retry)} of {len(batch)} records failed to flush")
+        except Exception as e:
+            print(f"{self.name}: flush of {len(batch)} records failed: {e}")
+            retry = batch
+        self.flushed += len(batch) - len(retry)
+        if retry:
+            self.failed_flushes += 1
+            room = max(self.max_buffered - len(self._buffer), 0)
+            self.dropped += max(len(retry) - room, 0)
+            self._buffer = retry[:room] + self._buffer
+        async with self._space:
+            self._space.notify_all()
+        return not retry
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+        }
@@ -0,0 +1,73 @@
+"""Event-loop lag while hashing passwords inline vs. on the PasswordHasher pool.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_password_hashing [--logins 20] [--rounds 12]
+
+A ticker task sleeps for 5 ms in a loop and records how late it wakes up; that delay
+is what every other request on the worker (including /health) experiences.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+
+async def _ticker(samples: list, stop: asyncio.Event, interval: float = 0.005):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append((loop.time() - start - interval) * 1000)
+
+
+async def _measure(label: str, work) -> dict:
+    samples: list = []
+    stop = asyncio.Event()
+    ticker = asyncio.ensure_future(_ticker(samples, stop))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    samples.sort()
+    result = {
+        "label": label,
+        "wall_s": round(elapsed, 3),
+        "lag_p50_ms": round(statistics.median(samples), 2),
+        "lag_p99_ms": round(samples[int(len(samples) * 0.99) - 1], 2),
+        "lag_max_ms": round(samples[-1], 2),
+    }
+    print(result)
+    return result
+
+
+async def main(logins: int):
+    from app.core.security import hash_password, verify_password, password_hasher
+
+    stored = hash_password("Password123!")
+
+    async def inline():
+        # What the handlers used to do: bcrypt directly in the coroutine
+        async def one():
+            verify_password("Password123!", stored)
+        await asyncio.gather(*(one() for _ in range(logins)))
+
+    async def pooled():
+        await asyncio.gather(*(password_hasher.verify("Password123!", stored) for _ in range(logins)))
+
+    await _measure("inline", inline)
+    await _measure("pooled", pooled)
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=None, help="override BCRYPT_ROUNDS")
+    args = parser.parse_args()
+    if args.rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    asyncio.run(main(args.logins))
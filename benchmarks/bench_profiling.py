@@ -0,0 +1,83 @@
+"""Overhead of request profiling, off, installed but not triggered, and triggered.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_profiling [--requests 2000]
+
+Requests go straight through the ASGI app (no sockets), to a handler that opens the
+same three spans a roadmap cache hit does, so the numbers are the framework and
+profiling cost alone. Reported per request:
+
+- off: PROFILING_ENABLED unset, middleware not installed, `span` is a no-op
+- installed, not triggered: sample rate 0 and no X-Profile header
+- triggered: every request profiled (spans, loop sampler thread, profile document)
+"""
+import argparse
+import asyncio
+import time
+
+
+def _app(mode: str, kept: list):
+    from fastapi import FastAPI
+
+    from app.core.profiling import ProfilingMiddleware, span
+
+    app = FastAPI()
+    if mode != "off":
+        async def sink(doc):
+            kept.append(doc)
+
+        app.add_middleware(ProfilingMiddleware, sink=sink, secret="bench",
+                           sample_rate=1.0 if mode == "triggered" else 0.0, slow_ms=0)
+
+    @app.get("/roadmap/{user_id}")
+    async def roadmap(user_id: str):
+        for name in ("roadmap.prompt", "mongo.find", "mongo.find"):
+            with span(name):
+                pass
+        return {"user_id": user_id}
+
+    return app
+
+
+async def _request(app, path: str):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "", "headers": [],
+             "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def _measure(app, requests: int) -> float:
+    for _ in range(100):
+        await _request(app, "/roadmap/u1")
+    started = time.perf_counter()
+    for _ in range(requests):
+        await _request(app, "/roadmap/u1")
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main(requests: int):
+    from app.core.profiling import span
+
+    for mode in ("off", "installed, not triggered", "triggered"):
+        kept = []
+        us = asyncio.run(_measure(_app(mode, kept), requests))
+        print(f"{mode:<26} {us:8.1f} us/request  ({len(kept)} profiles kept)")
+    started = time.perf_counter()
+    for _ in range(1_000_000):
+        with span("x"):
+            pass
+    print(f"{'span() outside a profile':<26} {(time.perf_counter() - started) * 1e3:8.1f} ns/call")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    main(parser.parse_args().requests)
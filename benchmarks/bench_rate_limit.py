@@ -0,0 +1,74 @@
+"""Tail latency of well-behaved users while one client hammers a Gemini-backed route.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_rate_limit [--seconds 20] [--abusers 40]
+
+The "Gemini" stage is modelled like the real pool: a semaphore of GEMINI_MAX_CONCURRENCY
+slots and a fixed call latency. Without admission control the abusive client keeps the
+slots busy and everyone else queues; with the token buckets it gets 429s instead.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+
+def _percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else float("nan")
+
+
+async def _scenario(limiter, seconds: float, abusers: int, users: int, slots: int, latency: float) -> dict:
+    semaphore = asyncio.Semaphore(slots)
+    latencies, rejected = {"user": [], "abuser": []}, {"user": 0, "abuser": 0}
+    deadline = time.perf_counter() + seconds
+
+    async def request(kind: str, key: str):
+        started = time.perf_counter()
+        if limiter is not None and await limiter.retry_after(key):
+            rejected[kind] += 1
+            return False
+        async with semaphore:
+            await asyncio.sleep(latency)
+        latencies[kind].append((time.perf_counter() - started) * 1000)
+        return True
+
+    async def abuser(n):
+        while time.perf_counter() < deadline:
+            if not await request("abuser", "abuser"):
+                await asyncio.sleep(0.01)
+
+    async def user(n):
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(random.expovariate(1 / 3.0))
+            await request("user", f"user-{n}")
+
+    await asyncio.gather(*(abuser(n) for n in range(abusers)), *(user(n) for n in range(users)))
+    return {
+        "user_requests": len(latencies["user"]),
+        "user_p50_ms": round(statistics.median(latencies["user"]), 1) if latencies["user"] else None,
+        "user_p99_ms": round(_percentile(latencies["user"], 0.99), 1),
+        "abuser_served": len(latencies["abuser"]),
+        "abuser_rejected": rejected["abuser"],
+        "user_rejected": rejected["user"],
+    }
+
+
+async def main(args):
+    from app.core.rate_limit import MemoryBuckets, RateLimiter
+
+    print("no limiter:", await _scenario(None, args.seconds, args.abusers, args.users, args.slots, args.latency))
+    limiter = RateLimiter(MemoryBuckets(), enabled=True)
+    print("token buckets:", await _scenario(limiter, args.seconds, args.abusers, args.users, args.slots, args.latency))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--abusers", type=int, default=40, help="concurrent loops of the abusive client")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--slots", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated Gemini call seconds")
+    asyncio.run(main(parser.parse_args()))
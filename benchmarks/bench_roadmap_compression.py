@@ -0,0 +1,93 @@
+"""Bandwidth, storage and CPU of pre-compressed roadmap payloads.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_roadmap_compression [--number 200] [--steps 8]
+
+The roadmap is synthetic but shaped like Gemini output (the prompt's vocabulary, a full
+schema with `--steps` steps). Reported:
+
+- wire size of the response body per Content-Encoding
+- per-request CPU of compressing on the fly (what a GZip middleware would do, at its
+  default level and at a cheaper one) against serving the stored variant
+- the one-time cost at save time, and the size of a `roadmaps` document before and after
+"""
+import argparse
+import gzip
+import json
+import random
+import timeit
+
+
+def _roadmap_text(steps: int) -> str:
+    from app.services.gemini_service import build_prompt_from_responses
+
+    vocabulary = sorted({w.strip(".,:;()'\"") for w in build_prompt_from_responses({}).split() if w.isalpha()})
+
+    def prose(words: int) -> str:
+        return " ".join(random.choices(vocabulary, k=words)).capitalize() + "."
+
+    return json.dumps({
+        "overview": prose(80),
+        "problem_identification": prose(80),
+        "possible_solutions": [
+            {"title": prose(4), "rationale": prose(45), "risks": prose(30), "bizowl_services": prose(6)}
+            for _ in range(4)
+        ],
+        "best_recommended_solution": {"title": prose(4), "why_best": prose(45), "implementation_focus": prose(35),
+                                      "key_risks": prose(25), "mitigation": prose(25)},
+        "roadmap": [
+            {"sequence": n, "title": prose(4), "description": prose(50), "duration": "2 weeks", "kpis": prose(8),
+             "dependencies": f"Step {n - 1}" if n > 1 else "None", "bizowl_support": prose(4)}
+            for n in range(1, steps + 1)
+        ],
+        "conclusion": prose(60),
+    }, indent=2)
+
+
+def _us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def main(number: int, steps: int):
+    from app.core import compression
+    from app.core.compression import encode_variants, negotiate
+    from app.services.roadmap_schema import build_roadmap_entry, entry_storage_fields
+
+    random.seed(1)
+    entry = build_roadmap_entry("0" * 64, _roadmap_text(steps))
+    payload = entry["payload"]
+
+    print(f"Response body ({', '.join(compression.available_encodings())} available):")
+    print(f"  {'identity':<10} {len(payload):8d} bytes")
+    for encoding, body in sorted(entry["encoded"].items(), key=lambda item: len(item[1])):
+        print(f"  {encoding:<10} {len(body):8d} bytes  {len(payload) / len(body):5.1f}x smaller")
+
+    print("Per-request CPU:")
+    paths = {
+        "gzip on the fly, level 9": lambda: gzip.compress(payload, compresslevel=9),
+        "gzip on the fly, level 6": lambda: gzip.compress(payload, compresslevel=6),
+    }
+    if "br" in entry["encoded"]:
+        import brotli
+
+        paths["br on the fly, quality 4"] = lambda: brotli.compress(payload, quality=4)
+    paths["pre-compressed"] = lambda: entry["encoded"][negotiate("gzip, deflate, br, zstd", entry["encoded"])]
+    for label, fn in paths.items():
+        print(f"  {label:<26} {_us(fn, number):9.1f} us")
+
+    print("At save time (once per roadmap, on a worker thread):")
+    print(f"  {'encode_variants':<26} {_us(lambda: encode_variants(payload), max(1, number // 20)):9.1f} us")
+    stored = entry_storage_fields(entry)
+    before = len(entry["raw"]) + len(payload)
+    after = len(entry["raw"]) + len(stored["payload"]) + sum(len(body) for body in stored["encoded"].values())
+    print(f"  roadmaps document: {before} bytes of text and payload before, {after} after "
+          f"(payload stored as {stored['payload_encoding'] or 'identity'})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--steps", type=int, default=8, help="roadmap steps in the synthetic roadmap")
+    args = parser.parse_args()
+    main(args.number, args.steps)
@@ -0,0 +1,172 @@
+"""Wall-clock cost of single-shot vs sectioned (ROADMAP_SECTIONED) roadmap generation.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sectioned_roadmap [--runs 3] [--chars-per-second 600] [--first-token 0.4]
+
+Gemini is replaced by a fake whose latency grows with the length of its answer (time to
+first token plus output at a fixed rate, with log-normal jitter), which is what makes
+one large JSON object slow. Calls still go through the real GeminiClient pool and call
+policy. The section cache is kept in memory, so no MongoDB is needed. Scenarios:
+
+- single-shot: one prompt for the whole schema (the default path)
+- sectioned cold: every section generated, concurrently
+- sectioned, one answer edited: only the sections whose prompt changed are regenerated
+- sectioned warm: all sections cached
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Dict, List
+
+from benchmarks.harness import LatencyProfile, _Response
+
+_WORDS = ("validate demand with pilot customers measure retention weekly and reinvest in the channel "
+          "that converts best while keeping burn low and the scope of the product narrow").split()
+
+
+def _prose(words: int, offset: int = 0) -> str:
+    return " ".join(_WORDS[(offset + n) % len(_WORDS)] for n in range(words)).capitalize() + "."
+
+
+ROADMAP = {
+    "overview": _prose(70),
+    "problem_identification": _prose(70, 3),
+    "possible_solutions": [
+        {"title": f"Approach {n}", "rationale": _prose(45, n), "risks": _prose(30, n + 1),
+         "bizowl_services": "Market Research, MVP Development"}
+        for n in range(1, 5)
+    ],
+    "best_recommended_solution": {
+        "title": "Approach 1", "why_best": _prose(45), "implementation_focus": _prose(35, 2),
+        "key_risks": _prose(25, 4), "mitigation": _prose(25, 6),
+    },
+    "roadmap": [
+        {"sequence": n, "title": f"Step {n}", "description": _prose(50, n), "duration": "2 weeks",
+         "kpis": "Signups, activation rate, weekly retention", "dependencies": f"Step {n - 1}" if n > 1 else "None",
+         "bizowl_support": "Growth Analytics"}
+        for n in range(1, 9)
+    ],
+    "conclusion": _prose(60, 5),
+}
+
+
+class SizedFakeModel:
+    """Fake `genai.GenerativeModel` answering the full or a section prompt with the matching
+    slice of ROADMAP, taking `first_token + len(answer) / chars_per_second` seconds."""
+
+    def __init__(self, model_name: str, first_token: float, chars_per_second: float, profile: LatencyProfile):
+        from app.services.gemini_service import ROADMAP_SECTIONS
+
+        self.model_name = model_name
+        self.first_token = first_token
+        self.chars_per_second = chars_per_second
+        self.profile = profile
+        self.sections = ROADMAP_SECTIONS
+        self.calls = 0
+        self.chars = 0
+
+    def _answer(self, prompt: str) -> str:
+        if "write ONE part" not in prompt:
+            return json.dumps(ROADMAP, indent=2)
+        schema = prompt.split("Requirements:")[0]
+        for section in self.sections.values():
+            if all(f'"{key}"' in schema for key in section["keys"]):
+                return json.dumps({key: ROADMAP[key] for key in section["keys"]}, indent=2)
+        raise ValueError("unrecognised section prompt")
+
+    def generate_content(self, prompt, stream: bool = False, request_options=None):
+        text = self._answer(prompt)
+        self.calls += 1
+        self.chars += len(text)
+        time.sleep((self.first_token + len(text) / self.chars_per_second) * self.profile.sample())
+        return _Response(text)
+
+
+def _assessment(run: int) -> dict:
+    from app.services.survey_data import steps
+
+    answers = {1: "Small businesses", 2: "Funding, Customer acquisition", 3: "Yes", 9: "A 2B USD market",
+               10: "Strong engineering; weak sales"}
+    return {"responses": [
+        {"id": q["id"], "type": q["type"], "question": q["question"],
+         "answer": answers.get(q["id"], f"Free-text answer to question {q['id']} for run {run}.")}
+        for q in steps
+    ]}
+
+
+async def _timed(fn) -> float:
+    started = time.perf_counter()
+    await fn()
+    return (time.perf_counter() - started) * 1000
+
+
+async def main(args):
+    from app.services.gemini_client import gemini_client
+    from app.services.gemini_service import build_prompt_from_responses, query_gemini
+    from app.services.roadmap_schema import parse_roadmap
+    from app.services.roadmap_sections import RoadmapSectionCache, generate_sections
+
+    class MemorySectionCache(RoadmapSectionCache):
+        async def get_many(self, hashes: List[str]) -> Dict[str, dict]:
+            return {h: self.front.get(h) for h in hashes if h in self.front}
+
+        async def put(self, section_hash: str, section: str, data: dict):
+            self.front.set(section_hash, data)
+
+    fake = SizedFakeModel(gemini_client.model_name, args.first_token, args.chars_per_second,
+                          LatencyProfile(1.0, args.sigma, seed=args.seed))
+    gemini_client._models[gemini_client.model_name] = fake
+    cache = MemorySectionCache()
+
+    results: Dict[str, List[float]] = {}
+    calls: Dict[str, int] = {}
+    chars: Dict[str, int] = {}
+
+    async def measure(name: str, fn):
+        before_calls, before_chars = fake.calls, fake.chars
+        results.setdefault(name, []).append(await _timed(fn))
+        calls[name] = calls.get(name, 0) + fake.calls - before_calls
+        chars[name] = chars.get(name, 0) + fake.chars - before_chars
+
+    async def single(doc):
+        assert parse_roadmap(await query_gemini(build_prompt_from_responses(doc))) is not None
+
+    async def sectioned(doc):
+        text, _ = await generate_sections(doc, cache=cache)
+        structured = parse_roadmap(text)
+        assert structured is not None and len(structured["roadmap"]) == len(ROADMAP["roadmap"])
+
+    for run in range(args.runs):
+        doc = _assessment(run)
+        edited = json.loads(json.dumps(doc))
+        edited["responses"][args.edit_question - 1]["answer"] += " (edited)"
+        await measure("single-shot", lambda: single(doc))
+        await measure("sectioned cold", lambda: sectioned(doc))
+        await measure(f"sectioned, q{args.edit_question} edited", lambda: sectioned(edited))
+        await measure("sectioned warm", lambda: sectioned(doc))
+
+    baseline = statistics.median(results["single-shot"])
+    print(f"runs={args.runs} first_token={args.first_token}s chars_per_second={args.chars_per_second} sigma={args.sigma}")
+    for name, samples in results.items():
+        median = statistics.median(samples)
+        print(f"  {name:<26} {median:9.1f} ms median  {baseline / max(median, 1e-3):6.1f}x  "
+              f"{calls[name] / args.runs:4.1f} calls  {chars[name] / args.runs:7.0f} chars generated")
+    gemini_client.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--first-token", type=float, default=0.4, help="fake time to first token, seconds")
+    parser.add_argument("--chars-per-second", type=float, default=600.0, help="fake output rate (~150 tokens/s)")
+    parser.add_argument("--sigma", type=float, default=0.2, help="log-normal jitter of each call")
+    parser.add_argument("--edit-question", type=int, default=8, help="survey question id edited between runs")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    asyncio.run(main(args))
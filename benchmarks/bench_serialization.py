@@ -0,0 +1,106 @@
+"""Response serialization cost for the listing and assessment endpoints.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_serialization [--number 200]
+
+Documents are shaped like the real collections (ObjectIds, datetimes, long free-text
+answers and AI responses). Compared paths, per response body:
+
+- before: stringify _id by hand, jsonable_encoder, json.dumps (the old handlers)
+- model + dump_json: validate into the response model and let pydantic-core write the
+  bytes, which is what FastAPI does for routes with a response_model
+- model + orjson: validate, dump to Python, then app.core.responses.ORJSONResponse
+- orjson only: ORJSONResponse on the raw Mongo document, no validation
+"""
+import argparse
+import json
+import random
+import string
+import timeit
+from datetime import datetime, timedelta
+
+
+def _text(words: int) -> str:
+    return " ".join("".join(random.choices(string.ascii_lowercase, k=random.randint(3, 9))) for _ in range(words))
+
+
+def _documents():
+    from bson import ObjectId
+
+    now = datetime.utcnow()
+    assessment = {
+        "_id": ObjectId(),
+        "userId": "user-123",
+        "assessmentId": "6f1c2d3e-0000-4000-8000-123456789abc",
+        "created_at": now,
+        "responses": [
+            {"id": n, "type": "textarea" if n % 3 == 0 else "options", "question": _text(12),
+             "answer": _text(120) if n % 3 == 0 else _text(3)}
+            for n in range(1, 31)
+        ],
+    }
+    chats = {
+        "chats": [
+            {"_id": ObjectId(), "user_message": _text(40), "ai_response": _text(400),
+             "timestamp": now - timedelta(minutes=n), "model": "gemini-1.5-flash"}
+            for n in range(50)
+        ],
+        "next": "eyJ0IjogIjIwMjQtMDEtMDFUMDA6MDA6MDAiLCAiaWQiOiAiNjVhIn0",
+    }
+    users = {
+        "users": [
+            {"_id": ObjectId(), "name": _text(2), "email": f"user{n}@example.com", "created_at": now - timedelta(days=n)}
+            for n in range(200)
+        ],
+        "next": None,
+    }
+    return {"assessment": assessment, "chat_page": chats, "user_page": users}
+
+
+def _before(doc):
+    from fastapi.encoders import jsonable_encoder
+
+    return json.dumps(jsonable_encoder(_stringify_ids(doc)), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def _stringify_ids(doc):
+    # What the handlers did before returning: copy, then str() every _id
+    if isinstance(doc, dict):
+        return {k: (str(v) if k == "_id" else _stringify_ids(v)) for k, v in doc.items()}
+    if isinstance(doc, list):
+        return [_stringify_ids(v) for v in doc]
+    return doc
+
+
+def main(number: int):
+    from pydantic import TypeAdapter
+
+    from app.core.responses import ORJSONResponse
+    from app.main import AssessmentDocument, ChatPage, UserPage
+
+    random.seed(1)
+    documents = _documents()
+    models = {"assessment": AssessmentDocument, "chat_page": ChatPage, "user_page": UserPage}
+    for name, doc in documents.items():
+        adapter = TypeAdapter(models[name])
+        paths = {
+            "before": lambda: _before(doc),
+            "model + dump_json": lambda: adapter.dump_json(adapter.validate_python(doc), by_alias=True),
+            "model + orjson": lambda: ORJSONResponse(
+                adapter.dump_python(adapter.validate_python(doc), mode="json", by_alias=True)).body,
+            "orjson only": lambda: ORJSONResponse(doc).body,
+        }
+        size = len(paths["model + dump_json"]())
+        baseline = None
+        print(f"{name} ({size / 1024:.0f} KiB):")
+        for label, fn in paths.items():
+            per_call = min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+            baseline = baseline or per_call
+            print(f"  {label:<18} {per_call:9.1f} us  {baseline / per_call:5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=200)
+    main(parser.parse_args().number)
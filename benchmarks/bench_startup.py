@@ -0,0 +1,75 @@
+"""Cold-start cost of the API: importing app.main and building the app.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup [--runs 5] [--top 15]
+
+Each run is a fresh interpreter started with `-X importtime` and without MONGO_URI, so
+it also checks that importing the app needs no credentials and opens no connections.
+Reports median wall time, whether heavy SDKs were imported eagerly, and the modules with
+the largest cumulative import time from the last run.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+app.main.create_app()
+built = time.perf_counter()
+from app.core import database
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (built - imported) * 1000,
+    "mongo_client_created": database._client is not None,
+    "heavy_modules_loaded": [m for m in ("google.generativeai", "grpc", "motor") if m in sys.modules],
+}))
+"""
+
+
+def _slowest_imports(importtime: str, top: int):
+    rows = []
+    for line in importtime.splitlines():
+        fields = line[len("import time:"):].split("|") if line.startswith("import time:") else []
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            rows.append((int(fields[1]), fields[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def run_once(env: dict):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr[-2000:])
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def main(runs: int, top: int):
+    env = {k: v for k, v in os.environ.items() if k not in ("MONGO_URI", "GOOGLE_API_KEY")}
+    results, importtime = [], ""
+    for _ in range(runs):
+        result, importtime = run_once(env)
+        results.append(result)
+    print({
+        "runs": runs,
+        "import_ms_median": round(statistics.median(r["import_ms"] for r in results), 1),
+        "create_app_ms_median": round(statistics.median(r["create_app_ms"] for r in results), 1),
+        "mongo_client_created": any(r["mongo_client_created"] for r in results),
+        "heavy_modules_loaded": results[-1]["heavy_modules_loaded"],
+    })
+    print("Slowest imports (cumulative ms, last run):")
+    for cumulative_us, name in _slowest_imports(importtime, top):
+        print(f"  {cumulative_us / 1000:8.1f}  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    main(args.runs, args.top)
@@ -0,0 +1,144 @@
+"""Shared pieces for the offline load tests: a fake Gemini model, latency summaries and baselines.
+
+Nothing here talks to Google. `FakeGeminiModel` stands in for `genai.GenerativeModel`
+inside the real `GeminiClient`, so calls still go through the bounded pool, deadlines,
+the retry/breaker policy and the metrics, only the provider is simulated.
+"""
+import os
+import json
+import math
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+
+ROADMAP_TEXT = json.dumps({
+    "overview": "A focused go-to-market plan for an early-stage startup.",
+    "problem_identification": "Customer acquisition is slow and unit economics are unproven.",
+    "possible_solutions": [
+        {"title": f"Option {n}", "rationale": "Cheap to test", "risks": "Low reach",
+         "bizowl_services": "Market research"}
+        for n in range(1, 4)
+    ],
+    "best_recommended_solution": {
+        "title": "Option 1", "why_best": "Fastest signal", "implementation_focus": "Pilot customers",
+        "key_risks": "Small sample", "mitigation": "Run two cohorts",
+    },
+    "roadmap": [
+        {"sequence": n, "title": f"Step {n}", "description": "Do the thing and measure it.", "duration": "2 weeks",
+         "kpis": "Signups, retention", "dependencies": "None", "bizowl_support": "Advisory"}
+        for n in range(1, 7)
+    ],
+    "conclusion": "Validate demand before scaling spend.",
+}, indent=2)
+
+
+class LatencyProfile:
+    """Log-normal call latency around `median` seconds, plus a failure probability.
+
+    `sigma` controls the tail: 0 gives a constant latency, 0.5 puts p99 at roughly 3x
+    the median, which is about what the real API shows under load.
+    """
+
+    def __init__(self, median: float = 1.5, sigma: float = 0.5, failure_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.median = median
+        self.sigma = sigma
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(self._random.gauss(0, self.sigma)) if self.sigma else self.median
+
+    def fails(self) -> bool:
+        return self._random.random() < self.failure_rate
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """Drop-in for `genai.GenerativeModel.generate_content`, blocking like the real SDK."""
+
+    def __init__(self, model_name: str, profile: LatencyProfile, text: str = ROADMAP_TEXT, chunks: int = 20):
+        self.model_name = model_name
+        self.profile = profile
+        self.text = text
+        self.chunks = chunks
+        self.calls = 0
+
+    def _fail(self):
+        from google.api_core import exceptions as google_exceptions
+
+        raise google_exceptions.ServiceUnavailable("fake Gemini failure")
+
+    def generate_content(self, prompt, stream: bool = False, request_options: Optional[dict] = None):
+        self.calls += 1
+        latency = self.profile.sample()
+        timeout = (request_options or {}).get("timeout")
+        failed = self.profile.fails()
+        if not stream:
+            time.sleep(min(latency, timeout) if timeout else latency)
+            if failed:
+                self._fail()
+            return _Response(self.text)
+        return self._stream(latency, failed)
+
+    def _stream(self, latency: float, failed: bool):
+        size = max(1, math.ceil(len(self.text) / self.chunks))
+        for start in range(0, len(self.text), size):
+            time.sleep(latency / self.chunks)
+            if failed and start >= len(self.text) // 2:
+                self._fail()
+            yield _Response(self.text[start:start + size])
+
+
+def percentile(samples: List[float], p: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else float("nan")
+
+
+def summarize(latencies_ms: List[float], errors: int, wall_seconds: float) -> Dict[str, float]:
+    done = len(latencies_ms) + errors
+    return {
+        "requests": done,
+        "errors": errors,
+        "throughput_rps": round(done / wall_seconds, 1) if wall_seconds > 0 else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 0.50), 1),
+        "p95_ms": round(percentile(latencies_ms, 0.95), 1),
+        "p99_ms": round(percentile(latencies_ms, 0.99), 1),
+    }
+
+
+def save_baseline(path: str, results: Dict[str, dict], meta: Optional[dict] = None):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta or {}, "scenarios": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_baseline(path: str) -> Dict[str, dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["scenarios"]
+
+
+def compare_to_baseline(results: Dict[str, dict], baseline: Dict[str, dict],
+                        tolerance: float = 0.2, metrics: Iterable[str] = ("p95_ms", "p99_ms")) -> List[str]:
+    """Return one line per regression: a latency above, or throughput below, baseline by more than `tolerance`."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in metrics:
+            if base.get(metric) and current[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {current[metric]} > baseline {base[metric]}")
+        if base.get("throughput_rps") and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput_rps {current['throughput_rps']} < baseline {base['throughput_rps']}")
+        if current["errors"] and not base.get("errors"):
+            regressions.append(f"{name}: {current['errors']} errors, baseline had none")
+    return regressions
@@ -0,0 +1,206 @@
+"""Offline load test of the API against a fake Gemini and a local MongoDB.
+
+Run from the repository root with a throwaway mongod listening (for example
+`docker run --rm -p 27017:27017 mongo:7`):
+
+    python -m benchmarks.load_test [--requests 200] [--concurrency 20] [--only login,roadmap_cold]
+    python -m benchmarks.load_test --save-baseline benchmarks/baselines/local.json
+    python -m benchmarks.load_test --baseline benchmarks/baselines/local.json   # exit 1 on regression
+
+The app is driven in-process through httpx's ASGI transport, so numbers include
+routing, validation, the handlers and MongoDB round trips but no network or uvicorn.
+Each run uses its own database (dropped afterwards unless --keep-db) and Gemini is
+replaced by benchmarks.harness.FakeGeminiModel with the requested latency profile.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List
+
+from benchmarks.harness import (
+    FakeGeminiModel,
+    LatencyProfile,
+    compare_to_baseline,
+    load_baseline,
+    save_baseline,
+    summarize,
+)
+
+SCENARIOS = ("signup", "login", "save_responses", "roadmap_cold", "roadmap_cached", "chat_history")
+PASSWORD = "Password123!"
+
+
+def _responses(token: str) -> List[dict]:
+    # Unique free text per assessment gives every assessment its own prompt_hash
+    return [
+        {"id": 1, "type": "options", "answer": "Small businesses"},
+        {"id": 2, "type": "checkbox", "answer": ["Funding", "Customer acquisition"]},
+        {"id": 3, "type": "options", "answer": "Yes"},
+        {"id": 4, "type": "textarea", "answer": f"A scheduling tool for clinics ({token})."},
+    ]
+
+
+async def _run(requests: int, concurrency: int, call: Callable[[int], Awaitable[int]]) -> dict:
+    """Closed loop: `concurrency` workers issue `requests` calls in total."""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for n in counter:
+            started = time.perf_counter()
+            try:
+                status = await call(n)
+            except Exception as e:
+                print(f"request {n} raised {e!r}")
+                status = 599
+            if status >= 400:
+                errors += 1
+            else:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def main(args) -> int:
+    import httpx
+
+    from app.main import app
+    from app.core.database import DB_NAME, db, get_client
+    from app.services.gemini_client import gemini_client
+    from app.services.model_router import model_router
+
+    profile = LatencyProfile(args.gemini_median, args.gemini_sigma, args.gemini_failure_rate, seed=args.seed)
+    fake = FakeGeminiModel(gemini_client.model_name, profile)
+    # Every model the router may pick or fall back to is the same fake
+    for route in model_router.routes.values():
+        for name in filter(None, (route.primary, route.fast, route.fallback)):
+            gemini_client._models[name] = fake
+
+    selected = args.only.split(",") if args.only else list(SCENARIOS)
+    results: Dict[str, dict] = {}
+    run_id = uuid.uuid4().hex[:8]
+    state = {"users": [], "assessments": []}
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+                # Fixtures shared by the scenarios that need existing data
+                login_email = f"bench-login-{run_id}@example.com"
+                await http.post("/auth/signup", json={"name": "Bench", "email": login_email, "password": PASSWORD})
+                for n in range(args.users):
+                    state["users"].append(f"bench-user-{run_id}-{n}")
+                if {"roadmap_cold", "roadmap_cached"} & set(selected) and "save_responses" not in selected:
+                    selected.insert(0, "save_responses")
+                if "chat_history" in selected:
+                    await db.chats.insert_many([
+                        {"user_message": f"question {n}", "ai_response": "answer " * 50, "model": "fake",
+                         "timestamp": datetime.utcnow()}
+                        for n in range(args.chats)
+                    ])
+
+                async def signup(n):
+                    r = await http.post("/auth/signup", json={
+                        "name": "Bench", "email": f"bench-{run_id}-{n}@example.com", "password": PASSWORD})
+                    return r.status_code
+
+                async def login(n):
+                    r = await http.post("/auth/login", json={"email": login_email, "password": PASSWORD})
+                    return r.status_code
+
+                async def save_responses(n):
+                    user_id = state["users"][n % len(state["users"])]
+                    r = await http.post("/save-responses", json={"userId": user_id, "responses": _responses(f"{run_id}-{n}")})
+                    if r.status_code == 200:
+                        state["assessments"].append((user_id, r.json()["assessmentId"]))
+                    return r.status_code
+
+                async def roadmap(n):
+                    user_id, assessment_id = state["assessments"][n % len(state["assessments"])]
+                    r = await http.get(f"/generate-roadmap/{user_id}/{assessment_id}")
+                    return r.status_code
+
+                async def chat_history(n):
+                    r = await http.get("/chat-history", params={"limit": 50})
+                    return r.status_code
+
+                calls = {
+                    "signup": (signup, args.requests),
+                    "login": (login, args.requests),
+                    "save_responses": (save_responses, args.requests),
+                    # One request per saved assessment; cold misses both cache tiers, cached repeats them
+                    "roadmap_cold": (roadmap, None),
+                    "roadmap_cached": (roadmap, None),
+                    "chat_history": (chat_history, args.requests),
+                }
+                for name in SCENARIOS:
+                    if name not in selected:
+                        continue
+                    call, requests = calls[name]
+                    if requests is None:
+                        requests = len(state["assessments"])
+                        if name == "roadmap_cached" and "roadmap_cold" not in selected:
+                            await _run(requests, args.concurrency, call)  # warm the caches first
+                    gemini_before = fake.calls
+                    results[name] = await _run(requests, args.concurrency, call)
+                    results[name]["gemini_calls"] = fake.calls - gemini_before
+                    print(f"{name}: {results[name]}")
+        finally:
+            if not args.keep_db:
+                await get_client().drop_database(DB_NAME)
+
+    meta = {"concurrency": args.concurrency, "requests": args.requests, "gemini_median": args.gemini_median,
+            "gemini_sigma": args.gemini_sigma, "gemini_failure_rate": args.gemini_failure_rate,
+            "python": sys.version.split()[0]}
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, meta)
+        print(f"Baseline written to {args.save_baseline}")
+    if args.baseline:
+        regressions = compare_to_baseline(results, load_baseline(args.baseline), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri", default=os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--keep-db", action="store_true", help="keep the per-run database for inspection")
+    parser.add_argument("--only", default="", help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=20, help="distinct userIds for save_responses")
+    parser.add_argument("--chats", type=int, default=2000, help="chat records seeded for chat_history")
+    parser.add_argument("--gemini-median", type=float, default=1.5, help="median fake Gemini latency, seconds")
+    parser.add_argument("--gemini-sigma", type=float, default=0.5, help="log-normal spread of that latency")
+    parser.add_argument("--gemini-failure-rate", type=float, default=0.0)
+    parser.add_argument("--speculation", action="store_true",
+                        help="keep speculative roadmap generation after save_responses (roadmap_cold is then warm)")
+    parser.add_argument("--bcrypt-rounds", type=int, default=None, help="override BCRYPT_ROUNDS")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", help="compare against this baseline file")
+    parser.add_argument("--save-baseline", help="write this run's results as a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before failing")
+    args = parser.parse_args()
+
+    # The app reads its configuration at import time
+    os.environ["MONGO_URI"] = args.mongo_uri
+    os.environ["DB_NAME"] = f"founders_ai_bench_{os.getpid()}"
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["ROADMAP_JOB_WORKERS"] = "0"
+    os.environ["ROADMAP_SPECULATION_ENABLED"] = "true" if args.speculation else "false"
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    sys.exit(asyncio.run(main(args)))
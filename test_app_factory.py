@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+
+PROBE = """
+import json, sys
+from app.main import create_app
+from app.core import database
+app = create_app()
+print(json.dumps({
+    "routes": sorted(app.openapi()["paths"]),
+    "mongo_client_created": database._client is not None,
+    "genai_imported": "google.generativeai" in sys.modules,
+}))
+"""
+
+
+def test_app_imports_without_credentials_or_connections():
+    env = {k: v for k, v in os.environ.items() if k not in ("MONGO_URI", "GOOGLE_API_KEY")}
+    # A fresh interpreter, so modules imported by other tests do not mask eager imports
+    proc = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, env=env,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert proc.returncode == 0, proc.stderr
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert "/health" in result["routes"] and "/auth/login" in result["routes"]
+    assert not result["mongo_client_created"]
+    assert not result["genai_imported"]
+
+
+def test_executors_survive_a_previous_lifespan():
+    import asyncio
+
+    from app.core.security import PasswordHasher
+
+    hasher = PasswordHasher(workers=1)
+    assert asyncio.run(hasher._run(len, "secret")) == 6
+    # What ServiceContainer.stop does at the end of a lifespan; the next one must still run
+    hasher.shutdown()
+    assert asyncio.run(hasher._run(len, "secret")) == 6
+
+
+def test_gemini_pool_survives_a_previous_lifespan():
+    import asyncio
+
+    from app.services.gemini_client import GeminiClient
+
+    class EchoModel:
+        def generate_content(self, prompt, stream=False, request_options=None):
+            return type("Response", (), {"text": prompt})()
+
+    client = GeminiClient("fake", max_concurrency=1, timeout=5)
+    client._models["fake"] = EchoModel()
+    assert asyncio.run(client.generate("first lifespan")) == "first lifespan"
+    client.shutdown()
+    assert asyncio.run(client.generate("second lifespan")) == "second lifespan"
+    client.shutdown()
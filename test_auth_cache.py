@@ -0,0 +1,100 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import jwt
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import app.api.auth as auth
+from app.core.security import create_access_token
+
+USER_ID = ObjectId()
+
+
+class Users:
+    def __init__(self):
+        self.doc = {"_id": USER_ID, "name": "Ada", "email": "ada@example.com", "created_at": "2024-01-01",
+                    "password_hash": "old-hash"}
+        self.finds = 0
+        self.updates = []
+
+    async def find_one(self, query, projection=None):
+        self.finds += 1
+        if "_id" in query and query["_id"] != USER_ID:
+            return None
+        return dict(self.doc)
+
+    async def update_one(self, query, update):
+        self.updates.append(update)
+        self.doc.update(update["$set"])
+
+
+class DB:
+    def __init__(self):
+        self.users = Users()
+
+
+@pytest.fixture
+def users(monkeypatch):
+    db = DB()
+    monkeypatch.setattr(auth, "db", db)
+    auth.token_cache.clear()
+    auth.user_cache.clear()
+    yield db.users
+    auth.token_cache.clear()
+    auth.user_cache.clear()
+
+
+def _current_user(token):
+    return asyncio.run(auth.get_current_user(f"Bearer {token}"))
+
+
+def test_cached_user_is_served_without_a_lookup(users):
+    token = create_access_token(str(USER_ID))
+    assert _current_user(token)["email"] == "ada@example.com"
+    assert _current_user(token)["email"] == "ada@example.com"
+    assert users.finds == 1
+
+
+def test_cached_token_expires_at_its_exp(users):
+    token = create_access_token(str(USER_ID), expires_delta=timedelta(seconds=2))
+    exp = jwt.decode(token, options={"verify_signature": False})["exp"]
+    assert _current_user(token)["_id"] == str(USER_ID)
+    # Well inside AUTH_CACHE_TTL_SECONDS, but past the token's own expiry
+    time.sleep(max(0.0, exp - time.time()) + 0.1)
+    with pytest.raises(HTTPException) as exc:
+        _current_user(token)
+    assert exc.value.status_code == 401
+    assert exc.value.detail == "Token has expired"
+
+
+def test_password_rehash_invalidates_cached_user(users, monkeypatch):
+    token = create_access_token(str(USER_ID))
+    _current_user(token)
+    assert str(USER_ID) in auth.user_cache
+
+    async def verify(password, stored_hash):
+        return True, "new-hash"
+
+    monkeypatch.setattr(auth.password_hasher, "verify", verify)
+    asyncio.run(auth.login(auth.LoginRequest(email="ada@example.com", password="Secret123!")))
+    assert users.updates == [{"$set": {"password_hash": "new-hash"}}]
+    assert str(USER_ID) not in auth.user_cache
+
+    finds = users.finds
+    _current_user(token)
+    assert users.finds == finds + 1
+
+
+def test_login_without_rehash_keeps_cached_user(users, monkeypatch):
+    _current_user(create_access_token(str(USER_ID)))
+
+    async def verify(password, stored_hash):
+        return True, None
+
+    monkeypatch.setattr(auth.password_hasher, "verify", verify)
+    asyncio.run(auth.login(auth.LoginRequest(email="ada@example.com", password="Secret123!")))
+    assert users.updates == []
+    assert str(USER_ID) in auth.user_cache
@@ -0,0 +1,27 @@
+import json
+
+from benchmarks.harness import (
+    FakeGeminiModel,
+    LatencyProfile,
+    ROADMAP_TEXT,
+    compare_to_baseline,
+    summarize,
+)
+
+
+def test_fake_model_returns_parseable_roadmap_in_both_modes():
+    model = FakeGeminiModel("fake", LatencyProfile(median=0))
+    assert json.loads(model.generate_content("prompt").text)["roadmap"]
+    assert "".join(chunk.text for chunk in model.generate_content("prompt", stream=True)) == ROADMAP_TEXT
+    assert model.calls == 2
+
+
+def test_compare_flags_only_changes_beyond_tolerance():
+    baseline = {"login": summarize([100.0] * 100, 0, 10)}
+    slightly_slower = {"login": summarize([110.0] * 100, 0, 10)}
+    much_slower = {"login": summarize([150.0] * 100, 0, 20)}
+
+    assert compare_to_baseline(slightly_slower, baseline, tolerance=0.2) == []
+    regressions = compare_to_baseline(much_slower, baseline, tolerance=0.2)
+    assert any("p95_ms" in line for line in regressions)
+    assert any("throughput_rps" in line for line in regressions)
@@ -0,0 +1,25 @@
+import time
+
+from app.core.cache import TTLLRUCache
+
+
+def test_evicts_least_recently_used_over_byte_budget():
+    cache = TTLLRUCache(max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    assert cache.get("a") == "xxxx"
+    cache.set("c", "xxxx")
+
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert cache.nbytes == 8
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLLRUCache(ttl=0.01)
+    cache.set("k", 1)
+    assert cache.get("k") == 1
+    time.sleep(0.02)
+    assert cache.get("k") is None
+    assert cache.stats()["hit_ratio"] == 0.5
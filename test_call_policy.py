@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from app.services.call_policy import CallPolicy, CircuitBreaker, CircuitOpenError
+
+
+class Flaky:
+    def __init__(self, failures, exc=ConnectionError):
+        self.failures = failures
+        self.exc = exc
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.exc("boom")
+        return "ok"
+
+
+def test_retries_with_backoff_until_success():
+    policy = CallPolicy("test", max_attempts=3, base_delay=0.001)
+    fn = Flaky(failures=2)
+    assert asyncio.run(policy.call(fn)) == "ok"
+    assert fn.calls == 3
+    assert policy.retries == 2
+    assert policy.breaker.state == "closed"
+
+
+def test_non_retryable_errors_are_raised_immediately():
+    policy = CallPolicy("test", retryable=lambda e: isinstance(e, ConnectionError), base_delay=0.001)
+    fn = Flaky(failures=1, exc=ValueError)
+    with pytest.raises(ValueError):
+        asyncio.run(policy.call(fn))
+    assert fn.calls == 1
+    assert policy.breaker.failures == 0
+
+
+def test_breaker_opens_then_half_opens_after_reset():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+    policy = CallPolicy("test", max_attempts=1, breaker=breaker)
+    fn = Flaky(failures=2)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await policy.call(fn)
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            await policy.call(fn)
+        assert fn.calls == 2
+        await asyncio.sleep(0.06)
+        assert await policy.call(fn) == "ok"
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_hedges_slow_attempt():
+    policy = CallPolicy("test", hedge_percentile=50, hedge_min_samples=1)
+    policy._latencies.append(0.01)
+    delays = iter([1.0, 0.0])
+
+    async def slow_then_fast():
+        await asyncio.sleep(next(delays))
+        return "done"
+
+    async def scenario():
+        return await asyncio.wait_for(policy.call(slow_then_fast), 0.5)
+
+    assert asyncio.run(scenario()) == "done"
+    assert policy.hedges == 1
@@ -0,0 +1,17 @@
+from app.core.compression import encoded_etag, negotiate
+
+VARIANTS = {"gzip": b"x" * 30, "br": b"x" * 20}
+
+
+def test_negotiation_prefers_highest_q_then_smallest_body():
+    assert negotiate("gzip, deflate, br", VARIANTS) == "br"
+    assert negotiate("gzip;q=1.0, br;q=0.5", VARIANTS) == "gzip"
+    assert negotiate("*", VARIANTS) == "br"
+    assert negotiate("br;q=0, gzip;q=0", VARIANTS) is None
+    assert negotiate("identity", VARIANTS) is None
+    assert negotiate(None, VARIANTS) is None
+
+
+def test_each_encoding_gets_its_own_etag():
+    assert encoded_etag('"abc-123"', "gzip") == '"abc-123-gzip"'
+    assert encoded_etag('"abc-123"', None) == '"abc-123"'
@@ -0,0 +1,79 @@
+import asyncio
+import gzip
+import json
+
+from bson import ObjectId
+
+import app.services.export as export
+from app.services.export import compressed, export_ndjson
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction):
+        self.docs = sorted(self.docs, key=lambda d: d[key], reverse=direction < 0)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for doc in self.docs:
+            yield dict(doc)
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        if "_id" in query:
+            return FakeCursor([d for d in self.docs if d["_id"] > query["_id"]["$gt"]])
+        if "$or" in query:
+            keys = [(k["userId"], k["assessmentId"]) for k in query["$or"]]
+            return FakeCursor([d for d in self.docs if (d["userId"], d["assessmentId"]) in keys])
+        return FakeCursor(self.docs)
+
+
+def _collect(chunks):
+    async def run():
+        return [chunk async for chunk in chunks]
+    return asyncio.run(run())
+
+
+def test_assessments_stream_in_batches_with_their_roadmaps(monkeypatch):
+    ids = [ObjectId() for _ in range(5)]
+    assessments = FakeCollection([
+        {"_id": _id, "userId": "u1", "assessmentId": f"a{n}", "responses": [{"id": 1, "answer": "x", "question": "Q"}]}
+        for n, _id in enumerate(ids)
+    ])
+    roadmaps = FakeCollection([{"userId": "u1", "assessmentId": "a1", "raw": "{}", "structured": None}])
+    monkeypatch.setattr(export, "collection_reads", assessments)
+    monkeypatch.setattr(export, "roadmap_cache_reads", roadmaps)
+
+    progress = {}
+    chunks = _collect(export_ndjson("assessments", batch_size=2, progress=progress))
+    lines = [json.loads(line) for line in b"".join(chunks).splitlines()]
+    assert len(chunks) == 3 and len(roadmaps.queries) == 3
+    assert [line["_id"] for line in lines] == [str(_id) for _id in ids]
+    assert [line["roadmap"] for line in lines][:2] == [None, {"raw": "{}", "structured": None}]
+    assert progress == {"count": 5, "last_id": str(ids[-1])}
+
+    resumed = _collect(export_ndjson("assessments", after=ids[2], batch_size=2))
+    assert [json.loads(line)["_id"] for line in b"".join(resumed).splitlines()] == [str(_id) for _id in ids[3:]]
+
+
+def test_compressed_export_is_one_gzip_stream():
+    async def chunks():
+        for n in range(3):
+            yield b'{"n":%d}\n' % n
+
+    body = b"".join(_collect(compressed(chunks(), "gzip")))
+    assert gzip.decompress(body) == b'{"n":0}\n{"n":1}\n{"n":2}\n'
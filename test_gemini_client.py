@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.gemini_client import GeminiClient, GeminiOverloaded
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class BlockingModel:
+    """Holds every call until `release` is set, like a hung Gemini request."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.timeouts = []
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        self.timeouts.append((request_options or {}).get("timeout"))
+        self.release.wait(5)
+        if stream:
+            return iter([_Response(prompt)])
+        return _Response(prompt)
+
+
+def _client(model, **kwargs):
+    client = GeminiClient("fake", **kwargs)
+    client._models["fake"] = model
+    return client
+
+
+def test_calls_beyond_the_queue_cap_are_rejected():
+    model = BlockingModel()
+    client = _client(model, max_concurrency=1, max_queue=1, timeout=5)
+
+    async def scenario():
+        running = asyncio.ensure_future(client.generate("running"))
+        await asyncio.sleep(0.05)
+        queued = asyncio.ensure_future(client.generate("queued"))
+        await asyncio.sleep(0.05)
+        assert client.stats()["queue_depth"] == 1
+        with pytest.raises(GeminiOverloaded):
+            await client.generate("rejected")
+        model.release.set()
+        return await asyncio.gather(running, queued)
+
+    try:
+        assert asyncio.run(scenario()) == ["running", "queued"]
+    finally:
+        model.release.set()
+        client.shutdown()
+    stats = client.stats()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["queue_depth"] == 0
+
+
+def test_call_past_its_deadline_times_out_and_frees_the_slot():
+    model = BlockingModel()
+    client = _client(model, max_concurrency=1, timeout=0.1)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await client.generate("hung")
+        assert client.stats()["running"] == 0
+        assert not client._semaphore.locked()
+        model.release.set()
+        return await client.generate("next", timeout=5)
+
+    try:
+        assert asyncio.run(scenario()) == "next"
+    finally:
+        model.release.set()
+        client.shutdown()
+    # The same deadline is handed to the SDK as its transport timeout
+    assert model.timeouts == [0.1, 5]
+    assert client.stats()["timeouts"] == 1
+
+
+def test_stream_past_its_deadline_times_out_and_frees_the_slot():
+    model = BlockingModel()
+    client = _client(model, max_concurrency=1, timeout=0.1)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            async for _ in client.stream("hung"):
+                pass
+        assert client.stats()["running"] == 0
+        assert not client._semaphore.locked()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        model.release.set()
+        client.shutdown()
+    assert client.stats()["timeouts"] == 1
@@ -0,0 +1,72 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.api.auth as auth
+import app.main as main
+from app.core.metrics import Histogram, MetricsMiddleware, Registry, http_request_seconds
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    hits = registry.counter("cache_total", "Cache lookups", ("result",))
+    depth = registry.gauge("queue_depth", "Queued jobs")
+    hits.inc("hit")
+    hits.inc("hit")
+    hits.inc('mi"ss', amount=0.5)
+    depth.set(3)
+    assert registry.render() == "\n".join([
+        "# HELP cache_total Cache lookups",
+        "# TYPE cache_total counter",
+        'cache_total{result="hit"} 2',
+        'cache_total{result="mi\\"ss"} 0.5',
+        "# HELP queue_depth Queued jobs",
+        "# TYPE queue_depth gauge",
+        "queue_depth 3",
+    ]) + "\n"
+
+
+def test_histogram_buckets_are_cumulative_and_upper_inclusive():
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(1, 0.1, 0.5))
+    for value in (0.05, 0.1, 0.3, 2):
+        histogram.observe(value, "/a")
+    assert histogram.count("/a") == 4
+    assert histogram.count("/b") == 0
+    assert histogram.render()[2:] == [
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="0.5"} 3',
+        'latency_seconds_bucket{route="/a",le="1"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 2.45',
+        'latency_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics-test/{item_id}")
+    async def item(item_id: str):
+        return {"item": item_id}
+
+    client = TestClient(app)
+    before = http_request_seconds.count("GET", "/metrics-test/{item_id}", "200")
+    unmatched = http_request_seconds.count("GET", "unmatched", "404")
+    for item_id in ("a", "b", "c"):
+        assert client.get(f"/metrics-test/{item_id}").status_code == 200
+    client.get("/no-such-route")
+    assert http_request_seconds.count("GET", "/metrics-test/{item_id}", "200") == before + 3
+    assert http_request_seconds.count("GET", "/metrics-test/a", "200") == 0
+    assert http_request_seconds.count("GET", "unmatched", "404") == unmatched + 1
+
+
+def test_metrics_endpoint_needs_the_admin_token(monkeypatch):
+    client = TestClient(main.app)
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", "")
+    assert client.get("/metrics").status_code == 404
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", "secret")
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    response = client.get("/metrics", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+import app.services.recommendation_cache as rc
+from app.services.model_router import SERVED_FROM_CACHE, FakeProvider, ModelRouter, Route
+from app.services.recommendation_cache import RecommendationCache
+
+
+def _router(provider):
+    return ModelRouter(provider, {
+        "recommend": Route("pro", "backup", primary_seconds=0.1, deadline_seconds=0.3, fast="fast", short_chars=20),
+    })
+
+
+def test_short_prompts_use_the_fast_tier():
+    provider = FakeProvider(default_latency=0)
+    router = _router(provider)
+    assert asyncio.run(router.generate("recommend", "hi")) == ("[fast] hi", "fast")
+    assert asyncio.run(router.generate("recommend", "x" * 50))[1] == "pro"
+    assert router.stats()["recommend"]["served"] == {"fast": 1, "pro": 1}
+
+
+def test_a_late_or_failing_model_falls_back_within_the_deadline():
+    provider = FakeProvider(latency={"pro": 1.0}, default_latency=0)
+    router = _router(provider)
+    assert asyncio.run(router.generate("recommend", "x" * 50))[1] == "backup"
+
+    provider = FakeProvider(default_latency=0, failures={"fast": ConnectionError("reset")})
+    assert asyncio.run(_router(provider).generate("recommend", "hi"))[1] == "backup"
+    # When the fast tier is also the fallback model, the primary is tried instead
+    assert Route("pro", "fast", 1, 2, fast="fast", short_chars=20).models("hi") == ["fast", "pro"]
+
+
+def test_a_cached_answer_is_the_last_resort():
+    provider = FakeProvider(default_latency=1.0)
+    router = _router(provider)
+    assert asyncio.run(router.generate("recommend", "hi", cached=lambda: "old answer")) == ("old answer", SERVED_FROM_CACHE)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(router.generate("recommend", "hi"))
+    assert router.stats()["recommend"]["fallbacks"] == 4
+
+
+def test_request_errors_do_not_fall_back():
+    provider = FakeProvider(default_latency=0, failures={"fast": ValueError("bad prompt")})
+    with pytest.raises(ValueError):
+        asyncio.run(_router(provider).generate("recommend", "hi"))
+    assert [model for model, _ in provider.calls] == ["fast"]
+
+
+def test_fallback_answers_are_not_cached_as_model_answers(monkeypatch):
+    async def no_stored_chat(*args):
+        return None
+
+    monkeypatch.setattr(rc, "find_recent_chat", no_stored_chat)
+    cache = RecommendationCache(enabled=True, threshold=0.8)
+    cache.add("How do I find my first customers?", "Talk to 20 potential customers.", "pro")
+    router = _router(FakeProvider(default_latency=1.0))
+    message = "Where can I find early adopters and first customers?"
+
+    async def ask():
+        return await cache.get_or_generate(
+            message,
+            lambda: router.generate("recommend", message, cached=lambda: cache.closest(message, threshold=0.3)),
+            index=lambda served_by: served_by != SERVED_FROM_CACHE,
+        )
+
+    answer, hit, model = asyncio.run(ask())
+    assert (answer, hit, model) == ("Talk to 20 potential customers.", None, SERVED_FROM_CACHE)
+    assert asyncio.run(cache.lookup(message)) is None
+
+
+async def _collect(router, prompt):
+    model, chunks = await router.stream("recommend", prompt)
+    return model, "".join([chunk async for chunk in chunks])
+
+
+def test_streams_fall_back_until_the_first_chunk():
+    provider = FakeProvider(latency={"pro": 1.0}, default_latency=0)
+    router = ModelRouter(provider, _router(provider).routes, stream_provider=provider.stream)
+    prompt = "x" * 50
+    assert asyncio.run(_collect(router, prompt)) == ("backup", f"[backup] {prompt}")
+    assert router.stats()["recommend"] == {**router.stats()["recommend"], "served": {"backup": 1}, "fallbacks": 1}
+
+
+def test_streams_are_committed_once_a_chunk_is_out():
+    async def flaky(prompt, model, timeout):
+        yield f"[{model}] first"
+        raise ConnectionError("reset mid-stream")
+
+    router = ModelRouter(FakeProvider(), _router(FakeProvider()).routes, stream_provider=flaky)
+    with pytest.raises(ConnectionError):
+        asyncio.run(_collect(router, "x" * 50))
+    assert router.stats()["recommend"]["served"] == {"pro": 1}
@@ -0,0 +1,27 @@
+from pymongo import MongoClient
+
+from app.core.database import MongoSettings
+
+
+def _client(uri, settings):
+    return MongoClient(uri, connect=False, **settings.client_kwargs(uri))
+
+
+def test_uri_options_win_over_settings():
+    uri = "mongodb://localhost/?maxPoolSize=7&serverSelectionTimeoutMS=1234&compressors=zlib"
+    client = _client(uri, MongoSettings(max_pool_size=50, server_selection_timeout_ms=500, connect_timeout_ms=2000))
+    assert client.options.pool_options.max_pool_size == 7
+    assert client.options.server_selection_timeout == 1.234
+    assert client.options.pool_options.connect_timeout == 2.0
+    assert MongoSettings().client_kwargs(uri) == {}
+    client.close()
+
+
+def test_unset_options_keep_driver_defaults():
+    kwargs = MongoSettings(compressors=()).client_kwargs("mongodb://localhost/")
+    assert kwargs == {}
+    client = _client("mongodb://localhost/", MongoSettings(compressors=()))
+    assert client.options.pool_options.max_pool_size == 100
+    assert client.options.server_selection_timeout == 30
+    assert client.options.pool_options.connect_timeout == 20
+    client.close()
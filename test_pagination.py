@@ -0,0 +1,23 @@
+import base64
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.services.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def _token(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    at, _id = datetime(2024, 5, 1, 12, 30), ObjectId()
+    assert decode_cursor(encode_cursor(at, _id)) == (at, _id)
+
+
+@pytest.mark.parametrize("token", ["not base64!", _token("[1]"), _token('"x"'), _token("null"),
+                                   _token('{"t": 5, "id": "x"}'), _token('{"id": "zz"}')])
+def test_malformed_cursors_are_rejected(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token)
@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.profiling import ProfilingMiddleware, profile_token, span, verify_token
+
+SECRET = "test-secret"
+
+
+def _app(kept, sample_rate=0.0, slow_ms=1000.0):
+    app = FastAPI()
+
+    async def sink(doc):
+        kept.append(doc)
+
+    app.add_middleware(ProfilingMiddleware, sink=sink, sample_rate=sample_rate, slow_ms=slow_ms, secret=SECRET)
+
+    @app.get("/work/{item}")
+    async def work(item: str):
+        with span("db"):
+            await asyncio.sleep(0.01)
+        with span("cpu"):
+            time.sleep(0.05)  # blocks the loop, so the sampler sees this frame
+        return {"item": item}
+
+    return app
+
+
+def test_tokens_expire_and_need_the_secret():
+    assert verify_token(profile_token(60, SECRET), SECRET)
+    assert not verify_token(profile_token(-1, SECRET), SECRET)
+    assert not verify_token(profile_token(60, "other"), SECRET)
+    assert not verify_token("garbage", SECRET)
+
+
+def test_signed_requests_are_profiled_and_kept():
+    kept = []
+    client = TestClient(_app(kept))
+    assert client.get("/work/a").headers.get("x-profile-id") is None
+    assert client.get("/work/a", headers={"X-Profile": "1.bad"}).headers.get("x-profile-id") is None
+    assert kept == []
+
+    response = client.get("/work/a", headers={"X-Profile": profile_token(60, SECRET)})
+    assert response.json() == {"item": "a"}
+    [doc] = kept
+    assert str(doc["_id"]) == response.headers["x-profile-id"]
+    assert (doc["path"], doc["url"], doc["status"], doc["trigger"]) == ("/work/{item}", "/work/a", 200, "header")
+    assert [s["name"] for s in doc["spans"]] == ["db", "cpu"]
+    assert doc["span_totals"][0]["name"] == "cpu" and doc["span_totals"][0]["ms"] >= 50
+    assert doc["loop"]["samples"] > 0
+    assert any("test_profiling.py:work" in s["stack"] for s in doc["loop"]["stacks"])
+
+
+def test_sampled_requests_are_kept_only_when_slow():
+    kept = []
+    TestClient(_app(kept, sample_rate=1.0, slow_ms=10_000)).get("/work/a")
+    assert kept == []
+    TestClient(_app(kept, sample_rate=1.0, slow_ms=10)).get("/work/a")
+    assert [doc["trigger"] for doc in kept] == ["sample"]
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import app.services.roadmap_service as roadmap_service
+from app.core.rate_limit import MemoryBuckets, RateLimiter, rate_limit_key
+from app.core.security import create_access_token
+
+
+def _request(headers=(), user_id="victim"):
+    return Request({"type": "http", "method": "GET", "path": f"/generate-roadmap/{user_id}", "headers": list(headers),
+                    "path_params": {"user_id": user_id}, "client": ("10.0.0.7", 1234)})
+
+
+def test_key_ignores_path_parameters():
+    assert rate_limit_key(_request()) == "ip:10.0.0.7"
+    token = create_access_token("user-1").encode()
+    assert rate_limit_key(_request([(b"authorization", b"Bearer " + token)])) == "user-1"
+
+
+def test_only_cache_misses_are_charged(monkeypatch):
+    limiter = RateLimiter(MemoryBuckets(), enabled=True, user_rate=0, user_burst=1)
+    charges = []
+
+    async def charge():
+        charges.append(1)
+        await limiter.check("ip:10.0.0.7")
+
+    async def cached_roadmap(user_id, assessment_id, prompt_hash):
+        return {"raw": "cached"}
+
+    monkeypatch.setattr(roadmap_service, "cached_roadmap", cached_roadmap)
+    doc = {"responses": [{"id": 1, "type": "text", "question": "Idea?", "answer": "Clinics"}]}
+    for _ in range(3):
+        assert asyncio.run(roadmap_service.generate_roadmap("u", "a", doc, charge=charge))["raw"] == "cached"
+    assert charges == []
+
+    async def generated(*args):
+        return {"raw": "generated"}
+
+    monkeypatch.setattr(roadmap_service, "_generate_with_lease", generated)
+    assert asyncio.run(roadmap_service.generate_roadmap("u", "a", doc, force=True, charge=charge))["raw"] == "generated"
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(roadmap_service.generate_roadmap("u", "a", doc, force=True, charge=charge))
+    assert raised.value.status_code == 429
+
+
+def test_client_ip_comes_from_trusted_proxies_only():
+    from ipaddress import ip_network
+
+    from app.core.rate_limit import client_ip
+
+    proxies = [ip_network("10.0.0.0/8")]
+    forwarded = [(b"x-forwarded-for", b"6.6.6.6, 203.0.113.9, 10.1.2.3")]
+    # From a trusted proxy: the right-most address that is not a proxy (6.6.6.6 is client-supplied)
+    assert client_ip(_request(forwarded), proxies) == "203.0.113.9"
+    # Without trusted proxies, or from an untrusted peer, the header is ignored
+    assert client_ip(_request(forwarded), []) == "10.0.0.7"
+    assert client_ip(_request(forwarded), [ip_network("192.168.0.0/16")]) == "10.0.0.7"
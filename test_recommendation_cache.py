@@ -0,0 +1,45 @@
+import asyncio
+
+import app.services.recommendation_cache as rc
+from app.services.near_duplicate import LSHIndex, MinHasher, normalize_message, shingles
+from app.services.recommendation_cache import RecommendationCache
+
+
+def test_normalization_folds_case_punctuation_and_whitespace():
+    assert normalize_message("  How do I find my FIRST customers?! ") == "how do i find my first customers"
+
+
+def test_lsh_finds_near_duplicates():
+    hasher, index = MinHasher(64), LSHIndex(64, 16)
+    for key in ("how do i find my first customers", "what pricing model should a saas startup use"):
+        index.add(key, hasher.signature(shingles(key)))
+    query = hasher.signature(shingles(normalize_message("How do I find my very first customers?")))
+    assert "how do i find my first customers" in index.candidates(query)
+
+
+def test_exact_and_similar_hits_are_marked(monkeypatch):
+    async def no_stored_chat(*args):
+        return None
+
+    monkeypatch.setattr(rc, "find_recent_chat", no_stored_chat)
+    cache = RecommendationCache(enabled=True, threshold=0.8)
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        return "Talk to 20 potential customers this week.", "fake-model"
+
+    async def scenario():
+        first = await cache.get_or_generate("How do I find my first customers?", generate)
+        exact = await cache.get_or_generate("how do i find my first customers", generate)
+        similar = await cache.get_or_generate("How do I find my very first customers?", generate)
+        different = await cache.get_or_generate("How do I find my first investors?", generate)
+        return first, exact, similar, different
+
+    first, exact, similar, different = asyncio.run(scenario())
+    assert first[1] is None and first[2] == "fake-model"
+    assert exact[1]["match"] == "exact" and exact[2] == "fake-model"
+    assert similar[1]["match"] == "similar" and 0.8 <= similar[1]["similarity"] < 1
+    assert similar[1]["matched_message"] == "How do I find my first customers?"
+    assert different[1] is None
+    assert len(calls) == 2
@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+import app.main as main
+from app.core.responses import ORJSONResponse
+from app.main import AssessmentDocument, AssessmentPage, ChatPage, UserPage
+
+NOW = datetime(2024, 5, 1, 12, 30, 15, 123000)
+
+
+def _served(monkeypatch, route_path, url, loader, result):
+    """GET `url` with `loader` returning `result`; returns the body and the route's
+    declared response_model, as published in the OpenAPI schema."""
+    async def load(*args, **kwargs):
+        return result
+
+    monkeypatch.setattr(main, loader, load)
+    route = next(r for r in main.router.routes if r.path == route_path)
+    return TestClient(main.app).get(url).json(), route.response_model
+
+
+def _expected(model, content):
+    adapter = TypeAdapter(model)
+    return json.loads(adapter.dump_json(adapter.validate_python(content), by_alias=True))
+
+
+def test_listings_are_served_as_their_response_models(monkeypatch):
+    user = {"_id": ObjectId(), "name": "Ada", "email": "ada@example.com", "created_at": NOW}
+    body, model = _served(monkeypatch, "/users", "/users", "list_users", ([user], "abc"))
+    assert model is UserPage and body == _expected(UserPage, {"users": [user], "next": "abc"})
+
+    chat = {"_id": ObjectId(), "user_message": "hi", "ai_response": "hello", "timestamp": NOW,
+            "model": "gemini-1.5-flash", "internal": "not documented"}
+    body, model = _served(monkeypatch, "/chat-history", "/chat-history", "list_chats", ([chat], None))
+    assert model is ChatPage and body == _expected(ChatPage, {"chats": [chat], "next": None})
+    # Documented optional fields are present (null), undocumented ones dropped
+    assert body["chats"][0]["cache_hit"] is None and "internal" not in body["chats"][0]
+
+    summary = {"assessmentId": "a1", "created_at": NOW, "responses_count": 3}
+    body, model = _served(monkeypatch, "/assessments/{user_id}", "/assessments/u1", "list_assessments",
+                          ([summary], None))
+    assert model is AssessmentPage and body == _expected(AssessmentPage, {"assessments": [summary], "next": None})
+
+
+def test_assessment_document_is_served_as_its_response_model(monkeypatch):
+    document = {
+        "_id": ObjectId(), "userId": "u1", "assessmentId": "a1", "created_at": NOW,
+        "responses": [{"id": 1, "type": "checkbox", "question": "Challenges?", "answer": ["Funding", "Hiring"]}],
+    }
+    body, model = _served(monkeypatch, "/get-responses/{user_id}/{assessment_id}", "/get-responses/u1/a1",
+                          "get_assessment", document)
+    assert model is AssessmentDocument and body == _expected(AssessmentDocument, document)
+    assert body["catalog_version"] is None
+
+
+def test_object_ids_and_datetimes_are_encoded_natively():
+    _id = ObjectId()
+    assert json.loads(ORJSONResponse({"_id": _id, "at": NOW}).body) == {"_id": str(_id), "at": "2024-05-01T12:30:15.123000"}
+
+
+def test_plain_routes_use_orjson_by_default():
+    assert main.app.router.default_response_class is ORJSONResponse
@@ -0,0 +1,53 @@
+import asyncio
+
+import app.services.roadmap_jobs as rj
+from app.services.roadmap_jobs import RoadmapJobQueue
+
+
+def test_worker_survives_status_write_errors_and_renews_its_lease(monkeypatch):
+    renewals, finished = [], []
+
+    async def get_assessment(user_id, assessment_id):
+        return {"responses": []}
+
+    async def generate_roadmap(user_id, assessment_id, doc, force):
+        await asyncio.sleep(0.2)
+        raise RuntimeError("model down")
+
+    async def extend_roadmap_job_lease(job_id, worker_id, lease_seconds):
+        renewals.append(job_id)
+        return True
+
+    async def finish_roadmap_job(job_id, worker_id, status, error=None):
+        finished.append((job_id, status))
+        raise ConnectionError("mongo down")
+
+    for name, fn in [("get_assessment", get_assessment), ("generate_roadmap", generate_roadmap),
+                     ("extend_roadmap_job_lease", extend_roadmap_job_lease), ("finish_roadmap_job", finish_roadmap_job)]:
+        monkeypatch.setattr(rj, name, fn)
+
+    queue = RoadmapJobQueue(concurrency=1, lease_seconds=0.15, max_attempts=3)
+    asyncio.run(queue._run({"_id": "j1", "userId": "u", "assessmentId": "a", "attempts": 3}, "w"))
+    assert finished == [("j1", "failed")]
+    assert len(renewals) >= 2
+
+
+def test_only_new_jobs_are_charged(monkeypatch):
+    charges = []
+
+    async def charge():
+        charges.append(1)
+
+    async def find_active_roadmap_job(user_id, assessment_id):
+        return {"_id": "active"} if assessment_id == "busy" else None
+
+    async def create_roadmap_job(user_id, assessment_id, force):
+        return {"_id": "new"}
+
+    monkeypatch.setattr(rj, "find_active_roadmap_job", find_active_roadmap_job)
+    monkeypatch.setattr(rj, "create_roadmap_job", create_roadmap_job)
+    queue = RoadmapJobQueue(concurrency=0)
+    assert asyncio.run(queue.enqueue("u", "busy", charge=charge))["_id"] == "active"
+    assert charges == []
+    assert asyncio.run(queue.enqueue("u", "idle", charge=charge))["_id"] == "new"
+    assert charges == [1]
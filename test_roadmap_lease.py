@@ -0,0 +1,122 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import app.services.roadmap_service as roadmap_service
+from app.services.model_router import FakeProvider, ModelRouter, Route
+
+
+class Leases:
+    """The roadmaps document's lease fields and saved roadmap, as seen by every worker."""
+
+    def __init__(self):
+        self.owner = None
+        self.until = None
+        self.saved = None
+
+    def live(self):
+        return self.owner is not None and self.until > datetime.utcnow()
+
+    async def acquire(self, user_id, assessment_id, prompt_hash, owner, ttl_seconds):
+        if self.live():
+            return False
+        self.owner, self.until = owner, datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        return True
+
+    async def renew(self, user_id, assessment_id, owner, ttl_seconds):
+        if self.owner != owner:
+            return False
+        self.until = datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        return True
+
+    async def release(self, user_id, assessment_id, owner):
+        if self.owner == owner:
+            self.owner = None
+
+    async def wait(self, user_id, assessment_id, prompt_hash, since=None):
+        while self.live():
+            await asyncio.sleep(0.01)
+        return self.saved
+
+
+@pytest.fixture
+def leases(monkeypatch):
+    store = Leases()
+    monkeypatch.setattr(roadmap_service, "ROADMAP_LEASE_SECONDS", 0.1)
+    monkeypatch.setattr(roadmap_service, "acquire_roadmap_lease", store.acquire)
+    monkeypatch.setattr(roadmap_service, "renew_roadmap_lease", store.renew)
+    monkeypatch.setattr(roadmap_service, "release_roadmap_lease", store.release)
+    monkeypatch.setattr(roadmap_service, "wait_for_cached_roadmap", store.wait)
+    monkeypatch.setattr(roadmap_service, "roadmap_entry_from_doc", lambda doc, prompt_hash: doc)
+    return store
+
+
+def _generator(store, calls, seconds):
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(seconds)
+        store.saved = {"raw": "roadmap"}
+        store.owner = None  # saving the roadmap clears the lease
+        return store.saved
+    return generate
+
+
+def test_concurrent_callers_share_one_provider_call(monkeypatch, leases):
+    provider = FakeProvider(default_latency=0.05)
+    monkeypatch.setattr(roadmap_service, "model_router", ModelRouter(provider, {"roadmap": Route("pro", None, 5, 5)}))
+
+    async def cache_miss(*args):
+        return None
+
+    async def save(user_id, assessment_id, prompt_hash, text, model):
+        return {"raw": text, "model": model}
+
+    monkeypatch.setattr(roadmap_service, "cached_roadmap", cache_miss)
+    monkeypatch.setattr(roadmap_service, "_save_roadmap", save)
+    doc = {"responses": [{"id": 1, "type": "text", "question": "Idea?", "answer": "Clinics"}]}
+
+    async def scenario():
+        return await asyncio.gather(*(roadmap_service.generate_roadmap("u", "a", doc) for _ in range(10)))
+
+    entries = asyncio.run(scenario())
+    assert len(provider.calls) == 1
+    assert {entry["model"] for entry in entries} == {"pro"}
+
+
+def test_a_generation_longer_than_the_lease_is_not_duplicated(leases):
+    calls = []
+    generate = _generator(leases, calls, seconds=0.35)  # over three lease periods
+
+    async def scenario():
+        # Two workers: separate single-flights, one shared lease
+        return await asyncio.gather(
+            roadmap_service._generate_with_lease("u", "a", "h", False, generate),
+            roadmap_service._generate_with_lease("u", "a", "h", False, generate),
+        )
+
+    assert asyncio.run(scenario()) == [{"raw": "roadmap"}] * 2
+    assert len(calls) == 1
+
+
+def test_expired_or_released_leases_are_taken_over(leases):
+    calls = []
+
+    async def scenario():
+        # A worker that died holding the lease: it expires and is taken over
+        assert await leases.acquire("u", "a", "h", "dead-worker", 0.05)
+        await roadmap_service._generate_with_lease("u", "a", "h", False, _generator(leases, calls, 0))
+        assert len(calls) == 1
+
+        # A holder whose generation failed releases the lease for the next worker
+        async def fail():
+            raise ConnectionError("provider down")
+
+        leases.saved = None
+        with pytest.raises(ConnectionError):
+            await roadmap_service._generate_with_lease("u", "a", "h", False, fail)
+        assert leases.owner is None
+        await roadmap_service._generate_with_lease("u", "a", "h", False, _generator(leases, calls, 0))
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,42 @@
+import json
+
+from app.services.roadmap_schema import NOT_SPECIFIED, build_roadmap_entry, parse_roadmap
+
+
+def test_repairs_fences_trailing_commas_and_missing_fields():
+    text = '```json\n{"overview": "o", "possible_solutions": [{"title": "a", "risks": ["x", "y"]},],' \
+           ' "roadmap": [{"sequence": 2, "title": "second"}, {"sequence": "1", "title": "first"}],}\n```'
+    roadmap = parse_roadmap(text)
+
+    assert roadmap["overview"] == "o"
+    assert roadmap["problem_identification"] == NOT_SPECIFIED
+    assert roadmap["possible_solutions"][0]["risks"] == "x, y"
+    assert roadmap["best_recommended_solution"]["why_best"] == NOT_SPECIFIED
+    assert [(s["sequence"], s["title"]) for s in roadmap["roadmap"]] == [(1, "first"), (2, "second")]
+
+
+def test_unparseable_text_is_kept_raw():
+    entry = build_roadmap_entry("a" * 64, "Sorry, I can't help with that.")
+    assert entry["structured"] is None and not entry["structured_ok"]
+    assert json.loads(entry["payload"]) == {"roadmap": "Sorry, I can't help with that.", "structured": None}
+    assert entry["etag"].startswith('"aaaaaaaaaaaaaaaa-')
+
+
+def test_stored_form_round_trips_with_precompressed_variants():
+    import gzip
+
+    from app.services.roadmap_schema import entry_storage_fields, roadmap_entry_from_doc
+
+    text = json.dumps({"overview": "Validate demand with pilot customers. " * 40, "roadmap": []})
+    entry = build_roadmap_entry("b" * 64, text)
+    assert gzip.decompress(entry["encoded"]["gzip"]) == entry["payload"]
+
+    stored = entry_storage_fields(entry)
+    assert len(stored["payload"]) < len(entry["payload"]) or stored["payload_encoding"] is None
+    doc = {"raw": entry["raw"], "structured": entry["structured"], "structured_ok": True, **stored}
+    assert roadmap_entry_from_doc(doc, "b" * 64) == entry
+
+    # Documents saved before pre-compression are served as identity, not compressed per hit
+    legacy = {"raw": entry["raw"], "structured": entry["structured"], "structured_ok": True,
+              "payload": entry["payload"], "etag": entry["etag"]}
+    assert roadmap_entry_from_doc(legacy, "b" * 64) == dict(entry, encoded={})
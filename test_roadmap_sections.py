@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+
+import app.services.roadmap_sections as rs
+from app.services.gemini_service import ROADMAP_SECTIONS, build_section_prompts
+from app.services.roadmap_schema import parse_roadmap
+from app.services.roadmap_sections import RoadmapSectionCache, SectionParseError, generate_sections
+
+ANSWERS = {
+    "overview": {"overview": "Clinic scheduling.", "problem_identification": "No-shows."},
+    "solutions": {"possible_solutions": [{"title": "SMS reminders"}], "best_recommended_solution": {"title": "SMS reminders"}},
+    "roadmap": {"roadmap": [{"sequence": 2, "title": "Pilot"}, {"sequence": 1, "title": "Interviews"}]},
+    "conclusion": {"conclusion": "Ship the pilot."},
+}
+
+
+def _assessment(**answers):
+    return {"responses": [
+        {"id": n, "type": "textarea", "question": f"Question {n}?", "answer": answers.get(f"q{n}", f"answer {n}")}
+        for n in range(1, 11)
+    ]}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    store = {}
+
+    async def get_roadmap_sections(hashes):
+        return [{"section_hash": h, "data": store[h]} for h in hashes if h in store]
+
+    async def save_roadmap_section(section_hash, section, data):
+        store[section_hash] = data
+
+    monkeypatch.setattr(rs, "get_roadmap_sections", get_roadmap_sections)
+    monkeypatch.setattr(rs, "save_roadmap_section", save_roadmap_section)
+    return RoadmapSectionCache()
+
+
+def _fake_gemini(doc, calls, fail=(), garble=()):
+    prompts = build_section_prompts(doc)
+
+    async def generate(prompt):
+        name = next(n for n in ROADMAP_SECTIONS if prompt == prompts[n])
+        calls.append(name)
+        if name in fail:
+            raise ConnectionError("provider down")
+        if name in garble:
+            return "Sorry, I can't help with that."
+        return json.dumps(ANSWERS[name])
+    return generate
+
+
+def test_section_prompts_only_carry_their_answers():
+    prompts = build_section_prompts(_assessment(q5="SECRET-PROBLEM"))
+    assert "SECRET-PROBLEM" in prompts["overview"] and "SECRET-PROBLEM" in prompts["roadmap"]
+    assert "SECRET-PROBLEM" not in prompts["conclusion"]
+
+
+def test_sections_merge_into_the_single_shot_schema(cache):
+    doc = _assessment()
+    calls = []
+    text, sources = asyncio.run(generate_sections(doc, _fake_gemini(doc, calls), cache))
+    structured = parse_roadmap(text)
+    assert sorted(calls) == sorted(ROADMAP_SECTIONS)
+    assert set(sources.values()) == {"gemini"}
+    assert structured["overview"] == "Clinic scheduling."
+    assert [s["title"] for s in structured["roadmap"]] == ["Interviews", "Pilot"]
+    assert structured["best_recommended_solution"]["title"] == "SMS reminders"
+
+
+def test_only_sections_whose_inputs_changed_are_regenerated(cache):
+    doc, edited = _assessment(), _assessment(q8="new risks")
+    asyncio.run(generate_sections(doc, _fake_gemini(doc, []), cache))
+
+    calls = []
+    _, sources = asyncio.run(generate_sections(edited, _fake_gemini(edited, calls), cache))
+    assert sorted(calls) == ["roadmap", "solutions"]
+    assert sources["overview"] == sources["conclusion"] == "cache"
+
+
+def test_failed_section_does_not_discard_its_siblings(cache):
+    doc = _assessment()
+    with pytest.raises(ConnectionError):
+        asyncio.run(generate_sections(doc, _fake_gemini(doc, [], fail={"roadmap"}), cache))
+    calls = []
+    asyncio.run(generate_sections(doc, _fake_gemini(doc, calls), cache))
+    assert calls == ["roadmap"]
+
+
+def test_unparseable_section_fails_the_roadmap(cache):
+    doc = _assessment()
+    with pytest.raises(SectionParseError) as raised:
+        asyncio.run(generate_sections(doc, _fake_gemini(doc, [], garble={"roadmap"}), cache))
+    assert raised.value.sections == ["roadmap"]
+    calls = []
+    text, _ = asyncio.run(generate_sections(doc, _fake_gemini(doc, calls), cache))
+    assert calls == ["roadmap"]
+    assert [s["title"] for s in parse_roadmap(text)["roadmap"]] == ["Interviews", "Pilot"]
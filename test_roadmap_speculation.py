@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+import app.services.roadmap_speculation as spec
+from app.services.gemini_client import BackgroundPriority, GeminiClient, background_priority
+from app.services.roadmap_speculation import RoadmapSpeculator
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class SleepyModel:
+    def generate_content(self, prompt, stream=False, request_options=None):
+        time.sleep(0.1)
+        return _Response(prompt)
+
+
+def test_background_calls_yield_to_interactive_callers():
+    client = GeminiClient("fake", max_concurrency=1, max_background=1, timeout=5)
+    client._models["fake"] = SleepyModel()
+    order = []
+
+    async def call(name, background=False):
+        if background:
+            background_priority.set(BackgroundPriority())
+        order.append(await client.generate(name))
+
+    async def scenario():
+        first = asyncio.ensure_future(call("interactive-1"))
+        await asyncio.sleep(0.02)
+        speculative = asyncio.ensure_future(call("background", background=True))
+        await asyncio.sleep(0.02)
+        second = asyncio.ensure_future(call("interactive-2"))
+        await asyncio.gather(first, speculative, second)
+
+    asyncio.run(scenario())
+    client.shutdown()
+    assert order == ["interactive-1", "interactive-2", "background"]
+
+
+def test_claims_promote_running_speculation_and_count_uses(monkeypatch):
+    release = None
+    seen = []
+
+    async def get_assessment(user_id, assessment_id):
+        return {"assessmentId": assessment_id, "responses": []}
+
+    async def generate_roadmap(user_id, assessment_id, doc, charge=None):
+        seen.append(background_priority.get())
+        await release.wait()
+
+    monkeypatch.setattr(spec, "get_assessment", get_assessment)
+    monkeypatch.setattr(spec, "generate_roadmap", generate_roadmap)
+    speculator = RoadmapSpeculator(enabled=True, max_inflight=1)
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        assert speculator.speculate("u1", "a1")
+        assert not speculator.speculate("u1", "a2")  # at capacity
+        await asyncio.sleep(0)
+        assert speculator.claim("u1", "a1")
+        assert seen[0].promoted
+        release.set()
+        await asyncio.sleep(0.01)
+        assert not speculator.claim("u1", "a1")  # already consumed by the join above
+        assert speculator.speculate("u1", "a3")
+        await asyncio.sleep(0.01)
+        assert not speculator.claim("u1", "a3")
+
+    asyncio.run(scenario())
+    stats = speculator.stats()
+    assert (stats["started"], stats["skipped"], stats["succeeded"]) == (2, 1, 2)
+    assert (stats["joined"], stats["hit"], stats["use_ratio"]) == (1, 1, 1.0)
+    assert not RoadmapSpeculator(enabled=False).speculate("u1", "a1")
+
+
+def test_speculation_is_off_by_default_and_skipped_when_rate_limited(monkeypatch):
+    from fastapi import HTTPException
+
+    async def get_assessment(user_id, assessment_id):
+        return {"assessmentId": assessment_id, "responses": []}
+
+    async def generate_roadmap(user_id, assessment_id, doc, charge=None):
+        await charge()
+
+    async def empty_bucket():
+        raise HTTPException(status_code=429, detail="Rate limit exceeded, retry later")
+
+    monkeypatch.setattr(spec, "get_assessment", get_assessment)
+    monkeypatch.setattr(spec, "generate_roadmap", generate_roadmap)
+    assert not spec.ROADMAP_SPECULATION_ENABLED
+    speculator = RoadmapSpeculator(enabled=True)
+
+    async def scenario():
+        assert speculator.speculate("u1", "a1", charge=empty_bucket)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert (speculator.counts["limited"], speculator.counts["failed"]) == (1, 0)
+
+
+def test_request_joining_a_running_speculation_is_not_charged(monkeypatch):
+    import app.main as main
+    from starlette.requests import Request
+
+    release = None
+    charges = []
+
+    async def get_assessment(user_id, assessment_id):
+        return {"assessmentId": assessment_id, "responses": []}
+
+    async def speculative_generate(user_id, assessment_id, doc, charge=None):
+        await release.wait()
+
+    async def generate_roadmap(user_id, assessment_id, doc, force, charge=None):
+        charges.append(charge)
+        raise LookupError("stop after the charge decision")
+
+    monkeypatch.setattr(spec, "get_assessment", get_assessment)
+    monkeypatch.setattr(spec, "generate_roadmap", speculative_generate)
+    monkeypatch.setattr(main, "generate_roadmap", generate_roadmap)
+    speculator = RoadmapSpeculator(enabled=True)
+    monkeypatch.setattr(main, "roadmap_speculator", speculator)
+    request = Request({"type": "http", "method": "GET", "path": "/generate-roadmap/u1", "headers": [],
+                       "client": ("10.0.0.7", 1234)})
+
+    async def generate(assessment_id):
+        try:
+            await main._generate_for_assessment(request, "u1", assessment_id, {}, force=False)
+        except LookupError:
+            pass
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        assert speculator.speculate("u1", "a1")
+        await asyncio.sleep(0)
+        await generate("a1")  # joins the run in flight
+        await generate("a2")  # nothing to join
+        release.set()
+
+    asyncio.run(scenario())
+    assert charges[0] is None
+    assert charges[1] is not None
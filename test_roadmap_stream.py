@@ -0,0 +1,88 @@
+import json
+
+from app.services.roadmap_stream import RoadmapStreamParser
+
+
+ROADMAP = {
+    "overview": "Build a \"niche\" marketplace (sc)",
+    "problem_identification": "Buyers can't find vetted suppliers.",
+    "possible_solutions": [
+        {"title": "Curated directory", "rationale": "r", "risks": "x", "bizowl_services": "Market Research"},
+        {"title": "Managed marketplace", "rationale": "r", "risks": "y", "bizowl_services": "MVP Development"},
+    ],
+    "best_recommended_solution": {"title": "Managed marketplace", "why_best": "w"},
+    "roadmap": [
+        {"sequence": 1, "title": "Interview buyers", "kpis": "20 interviews, 5 LOIs"},
+        {"sequence": 2, "title": "Concierge MVP", "dependencies": "1"},
+    ],
+    "conclusion": "Execute with discipline.",
+}
+
+
+def _feed_in_chunks(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events
+
+
+def test_emits_each_section_and_item_as_it_completes():
+    text = "```json\n" + json.dumps(ROADMAP, indent=2) + "\n```"
+    parser = RoadmapStreamParser(lambda s: s.replace("(sc)", ""))
+    events = _feed_in_chunks(parser, text, 5)
+
+    assert [(e["type"], e["key"], e.get("index")) for e in events] == [
+        ("section", "overview", None),
+        ("section", "problem_identification", None),
+        ("item", "possible_solutions", 0),
+        ("item", "possible_solutions", 1),
+        ("section", "best_recommended_solution", None),
+        ("item", "roadmap", 0),
+        ("item", "roadmap", 1),
+        ("section", "conclusion", None),
+    ]
+    assert events[0]["data"] == 'Build a "niche" marketplace '
+    assert events[5]["data"] == ROADMAP["roadmap"][0]
+    assert parser.done
+
+
+def test_section_is_not_emitted_until_complete():
+    parser = RoadmapStreamParser()
+    assert list(parser.feed('{"overview": "half of it')) == []
+    events = list(parser.feed(' done", "roadmap": [{"sequence": 1'))
+    assert events == [{"type": "section", "key": "overview", "data": "half of it done"}]
+    assert not parser.done
+
+
+def test_disconnect_cancels_the_pending_chunk_getter(monkeypatch):
+    import asyncio
+
+    import app.services.roadmap_service as roadmap_service
+
+    async def cached_roadmap(user_id, assessment_id, prompt_hash):
+        return None
+
+    async def generate_with_lease(user_id, assessment_id, prompt_hash, force, generate):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(roadmap_service, "cached_roadmap", cached_roadmap)
+    monkeypatch.setattr(roadmap_service, "_generate_with_lease", generate_with_lease)
+    doc = {"responses": [{"id": 1, "type": "text", "question": "Idea?", "answer": "Clinics"}]}
+
+    def getters():
+        return [t for t in asyncio.all_tasks() if t.get_coro().__qualname__ == "Queue.get" and not t.done()]
+
+    async def scenario():
+        async def consume():
+            async for _ in roadmap_service.roadmap_events("u", "a", doc):
+                pass
+
+        client = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.05)
+        assert len(getters()) == 1
+        client.cancel()  # what Starlette does when the SSE client goes away
+        await asyncio.gather(client, return_exceptions=True)
+        await asyncio.sleep(0)
+        return getters()
+
+    assert asyncio.run(scenario()) == []
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app.services.gemini_service import build_prompt_from_responses
+from app.services.survey_catalog import SurveyCatalog, catalog_version
+from app.services.survey_migration import _compact_legacy
+
+QUESTIONS = [
+    {"id": 1, "type": "text", "question": "What is your startup called?"},
+    {"id": 2, "type": "checkbox", "question": "Biggest challenges?"},
+]
+SUBMITTED = [{"id": 1, "type": "text", "answer": "Acme"}, {"id": 2, "type": "checkbox", "answer": ["Funding"]}]
+LEGACY = [{**r, "question": q["question"]} for r, q in zip(SUBMITTED, QUESTIONS)]
+
+
+def test_compact_responses_rehydrate_to_the_legacy_form():
+    catalog = SurveyCatalog(QUESTIONS)
+    version, compacted = catalog.compact(SUBMITTED)
+    assert version == catalog.current_version == catalog_version(reversed(QUESTIONS))
+    assert compacted == [{"id": 1, "answer": "Acme"}, {"id": 2, "answer": ["Funding"]}]
+
+    stored = {"userId": "u1", "catalog_version": version, "responses": compacted}
+    rehydrated = asyncio.run(catalog.rehydrate(stored))
+    assert rehydrated["responses"] == LEGACY
+    # Legacy documents pass through untouched and prompt the same way
+    assert asyncio.run(catalog.rehydrate({"responses": LEGACY})) == {"responses": LEGACY}
+    assert build_prompt_from_responses(rehydrated) == build_prompt_from_responses({"responses": LEGACY})
+
+
+def test_migration_keeps_old_question_wording_in_its_own_version():
+    catalog = SurveyCatalog(QUESTIONS)
+    current = asyncio.run(_compact_legacy(LEGACY, catalog, dry_run=True))
+    assert current == (catalog.current_version, [{"id": 1, "answer": "Acme"}, {"id": 2, "answer": ["Funding"]}])
+
+    reworded = [dict(LEGACY[0], question="Company name?"), LEGACY[1]]
+    version, compacted = asyncio.run(_compact_legacy(reworded, catalog, dry_run=True))
+    assert version != catalog.current_version
+    assert [catalog.expand(catalog.questions(version), r) for r in compacted] == reworded
+
+    assert asyncio.run(_compact_legacy([dict(LEGACY[0], note="extra field")], catalog, dry_run=True)) is None
+
+
+def test_current_version_is_persisted_before_any_compact_write(monkeypatch):
+    import app.services.mongodb_service as mongodb_service
+    import app.services.survey_catalog as sc
+
+    writes = []
+
+    class Collection:
+        def __init__(self, fail):
+            self.fail = fail
+
+        async def update_one(self, filter, update, upsert=False):
+            if self.fail:
+                raise ConnectionError("mongo down")
+            writes.append(filter["version"])
+
+        async def insert_one(self, doc):
+            writes.append(doc["catalog_version"])
+
+    catalog = SurveyCatalog(QUESTIONS)
+    monkeypatch.setattr(mongodb_service, "survey_catalog", catalog)
+    monkeypatch.setattr(mongodb_service, "collection", Collection(fail=False))
+    monkeypatch.setattr(sc, "catalog_collection", Collection(fail=True))
+    with pytest.raises(ConnectionError):
+        asyncio.run(mongodb_service.save_user_responses("u1", SUBMITTED))
+    assert writes == []
+
+    monkeypatch.setattr(sc, "catalog_collection", Collection(fail=False))
+    asyncio.run(mongodb_service.save_user_responses("u1", SUBMITTED))
+    asyncio.run(mongodb_service.save_user_responses("u1", SUBMITTED))
+    assert writes == [catalog.current_version] * 3
@@ -0,0 +1,92 @@
+import asyncio
+
+from app.services.write_behind import WriteBehindBuffer
+
+
+class Collection:
+    def __init__(self, failures=0, delay=0.0):
+        self.name = "records"
+        self.batches = []
+        self.failures = failures
+        self.delay = delay
+
+    async def insert_many(self, docs, ordered=False):
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("mongo down")
+        self.batches.append([doc["n"] for doc in docs])
+
+
+def _buffer(collection, **kwargs):
+    options = {"batch_size": 3, "flush_seconds": 10, "max_buffered": 100, "put_timeout": 1}
+    return WriteBehindBuffer(collection, "test", **{**options, **kwargs})
+
+
+def test_full_batches_flush_at_once_and_partial_ones_on_the_timer():
+    collection = Collection()
+    buffer = _buffer(collection, flush_seconds=0.05)
+
+    async def scenario():
+        buffer.start()
+        for n in range(3):
+            await buffer.put({"n": n})
+        await asyncio.sleep(0.01)
+        assert collection.batches == [[0, 1, 2]]  # batch_size reached, no waiting for the timer
+        await buffer.put({"n": 3})
+        await asyncio.sleep(0.01)
+        assert collection.batches == [[0, 1, 2]]
+        await asyncio.sleep(0.1)
+        assert collection.batches == [[0, 1, 2], [3]]
+        await buffer.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_flushes_are_retried():
+    collection = Collection(failures=1)
+    buffer = _buffer(collection, flush_seconds=0.02)
+
+    async def scenario():
+        buffer.start()
+        await buffer.put({"n": 0})
+        await asyncio.sleep(0.1)
+        await buffer.close()
+
+    asyncio.run(scenario())
+    assert collection.batches == [[0]]
+    assert (buffer.failed_flushes, buffer.flushed, buffer.dropped) == (1, 1, 0)
+
+
+def test_backpressure_waits_for_room_then_drops():
+    collection = Collection(delay=0.05)
+    buffer = _buffer(collection, batch_size=2, max_buffered=2, put_timeout=0.5)
+
+    async def scenario():
+        buffer.start()
+        assert await buffer.put({"n": 0}) and await buffer.put({"n": 1})
+        assert await buffer.put({"n": 2})  # waits for the flush that makes room
+        await buffer.close()
+
+        stalled = _buffer(Collection(), max_buffered=1, put_timeout=0.05)  # never started: nothing flushes
+        assert await stalled.put({"n": 0})
+        assert not await stalled.put({"n": 1})
+        assert stalled.dropped == 1
+
+    asyncio.run(scenario())
+    assert collection.batches == [[0, 1], [2]]
+
+
+def test_close_flushes_what_is_left_and_later_puts_are_refused():
+    collection = Collection()
+    buffer = _buffer(collection)
+
+    async def scenario():
+        buffer.start()
+        await buffer.put({"n": 0})
+        await buffer.close()
+        assert collection.batches == [[0]]
+        assert not await buffer.put({"n": 1})
+        assert buffer.stats()["buffered"] == 0 and buffer.dropped == 1
+
+    asyncio.run(scenario())